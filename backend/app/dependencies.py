@@ -0,0 +1,57 @@
+"""
+Общие dependency для авторизации в роутерах.
+
+Использование:
+    user: Principal = Depends(get_current_user)
+    admin: Principal = Depends(require_role(Role.ADMIN))
+"""
+
+from fastapi import Depends, HTTPException, Header
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+
+from app.database import get_async_db
+from app.models.user import User
+from app.schemas.auth import Role
+from app.services.tokens import (
+    Principal, InvalidTokenError, decode_access_token, principal_cache
+)
+
+
+async def get_current_user(
+    authorization: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+) -> Principal:
+    """
+    Текущий пользователь по подписанному токену.
+    На горячем пути - проверка подписи и чтение из кэша, без запросов к БД.
+    """
+    if not authorization:
+        raise HTTPException(status_code=401, detail="Требуется авторизация")
+
+    try:
+        user_id = decode_access_token(authorization.replace("Bearer ", ""))
+    except InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Неверный токен")
+
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        generation = principal_cache.generation(user_id)
+        user = await db.get(User, user_id)
+        if not user:
+            raise HTTPException(status_code=401, detail="Пользователь не найден")
+        principal = Principal(id=user.id, email=user.email, name=user.name, role=user.role)
+        principal_cache.set(principal, generation)
+
+    return principal
+
+
+def require_role(*roles: Role):
+    """Dependency, пропускающая только пользователей с одной из ролей."""
+
+    async def dependency(user: Principal = Depends(get_current_user)) -> Principal:
+        if user.role not in roles:
+            raise HTTPException(status_code=403, detail="Доступ запрещён. Недостаточно прав")
+        return user
+
+    return dependency
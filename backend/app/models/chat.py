@@ -0,0 +1,41 @@
+"""
+SQLAlchemy модели истории чата.
+
+Сообщения только добавляются. Очистка истории - это увеличение версии
+диалога пользователя в chat_threads: сообщения старых версий больше не
+выбираются, и удалять их построчно не нужно.
+"""
+
+from sqlalchemy import Column, Integer, Text, Boolean, DateTime, ForeignKey, JSON, Index
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class ChatThread(Base):
+    """Текущая версия диалога пользователя."""
+
+    __tablename__ = "chat_threads"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class ChatMessageRecord(Base):
+    """Сообщение чата в БД."""
+
+    __tablename__ = "chat_messages"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    version = Column(Integer, nullable=False, default=0)
+    is_user = Column(Boolean, nullable=False)
+    text = Column(Text, nullable=False)
+    places = Column(JSON, nullable=True)
+    # Оценка длины в токенах для окна контекста LLM
+    tokens = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # История и окно контекста: сообщения текущей версии по убыванию id
+        Index("ix_chat_messages_user_version_id", "user_id", "version", "id"),
+    )
@@ -0,0 +1,19 @@
+"""
+SQLAlchemy модель счётчиков.
+"""
+
+from sqlalchemy import Column, Integer, String
+from app.database import Base
+
+
+class Counter(Base):
+    """
+    Именованный счётчик (например, число отзывов в очереди модерации).
+    Меняется в тех же транзакциях, что и подсчитываемые строки, поэтому
+    чтение - одна строка вместо COUNT(*) по таблице.
+    """
+
+    __tablename__ = "counters"
+
+    name = Column(String(50), primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,33 @@
+"""
+SQLAlchemy модели загрузки мест из внешних источников.
+"""
+
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class PlaceSource(Base):
+    """Соответствие записи внешнего источника месту в каталоге."""
+
+    __tablename__ = "place_sources"
+
+    source = Column(String(100), primary_key=True)
+    external_id = Column(String(255), primary_key=True)
+    place_id = Column(Integer, ForeignKey("places.id", ondelete="CASCADE"), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_place_sources_place_id", "place_id"),
+    )
+
+
+class IngestionCheckpoint(Base):
+    """Позиция, до которой источник загружен (для продолжения прерванной загрузки)."""
+
+    __tablename__ = "ingestion_checkpoints"
+
+    source = Column(String(100), primary_key=True)
+    document = Column(String(500), nullable=False)
+    record = Column(Integer, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
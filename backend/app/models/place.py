@@ -0,0 +1,41 @@
+"""
+SQLAlchemy модель места отдыха.
+"""
+
+from sqlalchemy import Column, Integer, String, Text, Float, DateTime, JSON
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class Place(Base):
+    """Модель места в БД."""
+
+    __tablename__ = "places"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(255), nullable=False)
+    category = Column(String(100), index=True, nullable=False)
+    description = Column(Text, nullable=False, default="")
+    image = Column(String(500), nullable=False, default="")
+    # Загруженное изображение: имя оригинала <sha256>.<ext> (см. app.services.images)
+    image_file = Column(String(80), nullable=True)
+    tags = Column(JSON, nullable=True)
+    # Координаты в градусах WGS 84; поиск по области - in-memory индекс
+    # (см. app.services.geo_index)
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    # Агрегаты по одобренным отзывам, обновляются вместе с модерацией
+    # (см. app.services.place_stats)
+    rating = Column(Float, nullable=False, default=0.0)
+    reviews_count = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(Integer, nullable=False, default=0)
+    rating_1 = Column(Integer, nullable=False, default=0)
+    rating_2 = Column(Integer, nullable=False, default=0)
+    rating_3 = Column(Integer, nullable=False, default=0)
+    rating_4 = Column(Integer, nullable=False, default=0)
+    rating_5 = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<Place(id={self.id}, name='{self.name}', category='{self.category}')>"
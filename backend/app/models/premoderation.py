@@ -0,0 +1,31 @@
+"""
+SQLAlchemy модель решений автоматической премодерации отзывов.
+"""
+
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON, Index
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class PremoderationDecision(Base):
+    """
+    Решение премодерации по отзыву. human_status - итоговое решение
+    модератора, если он потом рассматривал отзыв: по парам
+    (action, human_status) считаются точность и полнота автомата.
+    """
+
+    __tablename__ = "premoderation_decisions"
+
+    review_id = Column(Integer, ForeignKey("reviews.id", ondelete="CASCADE"), primary_key=True)
+    action = Column(String(20), nullable=False)  # approve | reject | escalate
+    score = Column(Float, nullable=False)
+    reasons = Column(JSON, nullable=True)
+    # Режим и версия набора правил, с которыми принято решение
+    mode = Column(String(20), nullable=False)
+    version = Column(String(32), nullable=False)
+    human_status = Column(String(20), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_premoderation_decisions_action", "action", "human_status"),
+    )
@@ -0,0 +1,46 @@
+"""
+SQLAlchemy модели жалоб на отзывы.
+"""
+
+import enum
+
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, JSON, Index, Enum as SQLEnum
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class ReportStatus(str, enum.Enum):
+    OPEN = "open"
+    RESOLVED = "resolved"
+
+
+class ReviewReport(Base):
+    """
+    Жалоба на отзыв: все жалобы на один отзыв сведены в одну запись
+    с числом жалоб и списком различных причин.
+    """
+
+    __tablename__ = "review_reports"
+
+    id = Column(Integer, primary_key=True)
+    review_id = Column(Integer, ForeignKey("reviews.id", ondelete="CASCADE"), nullable=False, unique=True)
+    count = Column(Integer, nullable=False, default=1)
+    reasons = Column(JSON, nullable=False, default=list)
+    status = Column(SQLEnum(ReportStatus), default=ReportStatus.OPEN, nullable=False)
+    first_reporter_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        # Список открытых жалоб: больше жалоб - выше
+        Index("ix_review_reports_status_count_id", "status", "count", "id"),
+    )
+
+
+class ReviewReportAuthor(Base):
+    """Кто уже жаловался на отзыв: повторная жалоба того же пользователя не считается."""
+
+    __tablename__ = "review_report_authors"
+
+    review_id = Column(Integer, ForeignKey("reviews.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
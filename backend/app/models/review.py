@@ -0,0 +1,46 @@
+"""
+SQLAlchemy модель отзыва о месте.
+"""
+
+import enum
+
+from sqlalchemy import Column, Integer, Text, DateTime, ForeignKey, Index, Enum as SQLEnum
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class ReviewStatus(str, enum.Enum):
+    PENDING = "pending"
+    APPROVED = "approved"
+    REJECTED = "rejected"
+
+
+class Review(Base):
+    """Модель отзыва в БД."""
+
+    __tablename__ = "reviews"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    place_id = Column(Integer, ForeignKey("places.id", ondelete="CASCADE"), nullable=False)
+    rating = Column(Integer, nullable=False)
+    text = Column(Text, nullable=False)
+    status = Column(SQLEnum(ReviewStatus), default=ReviewStatus.PENDING, nullable=False)
+    # Число жалоб - приоритет в очереди модерации
+    reports_count = Column(Integer, nullable=False, default=0)
+    # Аренда отзыва модератором: до lease_expires_at его не выдают другим
+    claimed_by = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    __table_args__ = (
+        # Отзывы места с фильтром по статусу
+        Index("ix_reviews_place_status", "place_id", "status"),
+        Index("ix_reviews_user_id", "user_id"),
+        # Очередь модерации: статус, затем жалобы по убыванию и возраст
+        Index("ix_reviews_queue", "status", reports_count.desc(), "id"),
+    )
+
+    def __repr__(self):
+        return f"<Review(id={self.id}, place_id={self.place_id}, status='{self.status}')>"
@@ -0,0 +1,27 @@
+"""
+SQLAlchemy модель суммаризации отзывов о месте.
+"""
+
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class PlaceSummary(Base):
+    """
+    Сводка одобренных отзывов места, построенная LLM.
+    content_hash - отпечаток набора отзывов, по которому построена сводка;
+    last_review_id - самый поздний учтённый отзыв (новее него - дельта).
+    """
+
+    __tablename__ = "place_summaries"
+
+    place_id = Column(Integer, ForeignKey("places.id", ondelete="CASCADE"), primary_key=True)
+    text = Column(Text, nullable=False)
+    content_hash = Column(String(32), nullable=False)
+    last_review_id = Column(Integer, nullable=False, default=0)
+    reviews_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<PlaceSummary(place_id={self.place_id}, reviews_count={self.reviews_count})>"
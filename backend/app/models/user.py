@@ -2,7 +2,7 @@
 SQLAlchemy модель пользователя.
 """
 
-from sqlalchemy import Column, Integer, String, DateTime, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, DateTime, Index, Enum as SQLEnum
 from sqlalchemy.sql import func
 from app.database import Base
 from app.schemas.auth import Role
@@ -21,5 +21,8 @@ class User(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    # Keyset-пагинация списка пользователей с фильтром по роли
+    __table_args__ = (Index("ix_users_role_id", "role", "id"),)
+
     def __repr__(self):
         return f"<User(id={self.id}, email='{self.email}', role='{self.role}')>"
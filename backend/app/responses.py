@@ -0,0 +1,219 @@
+"""
+Быстрый путь сериализации ответов API.
+
+- ORJSONResponse - класс ответа по умолчанию (см. main.py): итоговый
+  JSON кодируется orjson вместо json.dumps.
+- trusted() строит схему ответа из ORM-объекта или строки результата
+  без валидации (model_construct): данные уже проверены при записи в БД.
+- model_response() сериализует схемы сразу в байты JSON через
+  TypeAdapter.dump_json и возвращает готовый Response. FastAPI не
+  проверяет такой ответ по response_model повторно (response_model
+  остаётся в декораторе для документации OpenAPI).
+- ReleasingStreamingResponse освобождает ресурс (место в семафоре
+  LLM) после отправки потока, в том числе при обрыве соединения.
+- ImmutableFileResponse раздаёт неизменяемый файл (изображения мест):
+  Range-запросы, If-None-Match и zero-copy отправка, если её
+  поддерживает сервер.
+- Большие ответы сжимаются (brotli, если установлен пакет brotli и
+  клиент его принимает, иначе gzip) - только при RESPONSE_COMPRESSION=1.
+"""
+
+import gzip
+import os
+import re
+from email.utils import formatdate
+from functools import lru_cache
+from operator import attrgetter
+from typing import Any, Dict, Optional, Tuple, Type, TypeVar
+
+import anyio
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, TypeAdapter
+
+from app.services.response_cache import etag_matches
+
+try:
+    import brotli
+except ImportError:  # brotli - необязательная зависимость
+    brotli = None
+
+COMPRESSION_ENABLED = os.getenv("RESPONSE_COMPRESSION", "0") == "1"
+# Ответы меньше порога не сжимаются: выигрыш меньше затрат CPU
+COMPRESS_MIN_SIZE = int(os.getenv("RESPONSE_COMPRESS_MIN_SIZE", str(16 * 1024)))
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+# Файлы с именем по хэшу содержимого не меняются - кэшируются на год
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+FILE_CHUNK_SIZE = 256 * 1024
+# Расширение ASGI для отправки файла без копирования (sendfile)
+ZEROCOPY_EXTENSION = "http.response.zerocopysend"
+BYTE_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+M = TypeVar("M", bound=BaseModel)
+
+
+def trusted(model: Type[M], obj: Any, **values: Any) -> M:
+    """
+    Схема из атрибутов obj (ORM-объект, строка Row) без валидации.
+    values задают поля, которых нет среди атрибутов или которые
+    называются иначе.
+    """
+    names, getter = field_getter(model, tuple(values))
+    fields = dict(zip(names, getter(obj))) if names else {}
+    return model.model_construct(**fields, **values)
+
+
+@lru_cache(maxsize=None)
+def field_getter(model: Type[BaseModel], skip: Tuple[str, ...]):
+    """Имена полей схемы (кроме skip) и их чтение одним attrgetter."""
+    names = tuple(name for name in model.model_fields if name not in skip)
+    if len(names) == 1:
+        single = attrgetter(names[0])
+        return names, lambda obj: (single(obj),)
+    return names, attrgetter(*names)
+
+
+def accepted_encoding(request: Request) -> Optional[str]:
+    accept = request.headers.get("accept-encoding", "")
+    if brotli is not None and "br" in accept:
+        return "br"
+    if "gzip" in accept:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def model_response(
+    content: Any,
+    adapter: TypeAdapter,
+    request: Optional[Request] = None,
+    status_code: int = 200
+) -> Response:
+    """
+    Готовый JSON-ответ из схем без повторной валидации.
+    С request большой ответ сжимается, если сжатие включено.
+    """
+    body = adapter.dump_json(content)
+    headers: Dict[str, str] = {}
+    if request is not None and COMPRESSION_ENABLED and len(body) >= COMPRESS_MIN_SIZE:
+        headers["Vary"] = "Accept-Encoding"
+        encoding = accepted_encoding(request)
+        if encoding:
+            body = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+    return Response(body, status_code=status_code, media_type="application/json", headers=headers)
+
+
+class ReleasingStreamingResponse(StreamingResponse):
+    """
+    Потоковый ответ, который вызывает release() после отправки.
+    Финализатор генератора для этого не годится: если клиент ушёл
+    до начала потока, генератор не запускается и не закрывается.
+    """
+
+    def __init__(self, content, resource, **kwargs):
+        super().__init__(content, **kwargs)
+        self.resource = resource
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.resource.release()
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Диапазон "bytes=start-end" как (start, end) включительно.
+    None - заголовка нет или он не разобран (отдаётся весь файл, в том
+    числе для нескольких диапазонов); ValueError - диапазон вне файла.
+    """
+    match = BYTE_RANGE.match(header.strip()) if header else None
+    if match is None or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if not first:
+        # Суффикс: последние N байт
+        start, end = max(0, size - int(last)), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("range not satisfiable")
+    return start, end
+
+
+class ImmutableFileResponse(Response):
+    """
+    Раздача неизменяемого файла с сильным ETag.
+    - If-None-Match -> 304; Range -> 206 (If-Range учитывается), диапазон
+      вне файла -> 416;
+    - если сервер поддерживает расширение ASGI zerocopysend, тело
+      отправляется им (sendfile без копирования в память процесса),
+      иначе читается пачками в пуле потоков.
+    """
+
+    def __init__(self, path: str, request: Request, etag: str, media_type: str):
+        self.path = path
+        self.background = None
+        self.media_type = media_type
+        self.status_code = 200
+        stat_result = os.stat(path)
+        size = stat_result.st_size
+        self.offset, self.count = 0, size
+        headers = {
+            "accept-ranges": "bytes",
+            "cache-control": IMMUTABLE_CACHE_CONTROL,
+            "etag": etag,
+            "last-modified": formatdate(stat_result.st_mtime, usegmt=True),
+        }
+
+        if etag_matches(request.headers.get("if-none-match", ""), etag):
+            self.status_code, self.count = 304, 0
+        elif request.headers.get("if-range", etag) == etag:
+            try:
+                byte_range = parse_range(request.headers.get("range", ""), size)
+            except ValueError:
+                byte_range = None
+                self.status_code, self.count = 416, 0
+                headers["content-range"] = f"bytes */{size}"
+            if byte_range is not None:
+                start, end = byte_range
+                self.status_code, self.offset, self.count = 206, start, end - start + 1
+                headers["content-range"] = f"bytes {start}-{end}/{size}"
+        if self.status_code != 304:
+            headers["content-length"] = str(self.count)
+        self.init_headers(headers)
+
+    async def __call__(self, scope, receive, send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"] == "HEAD" or not self.count:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        if ZEROCOPY_EXTENSION in scope.get("extensions", {}):
+            with open(self.path, "rb") as file:
+                await send({
+                    "type": ZEROCOPY_EXTENSION, "file": file.fileno(),
+                    "offset": self.offset, "count": self.count, "more_body": False,
+                })
+            return
+
+        async with await anyio.open_file(self.path, "rb") as file:
+            await file.seek(self.offset)
+            remaining = self.count
+            while remaining:
+                chunk = await file.read(min(FILE_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
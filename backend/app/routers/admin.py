@@ -1,104 +1,183 @@
 """
-Роутер администрирования пользователей.
+Роутер администрирования пользователей и массовой загрузки данных.
 Доступен только для пользователей с ролью ADMIN.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Header
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import TypeAdapter
 from typing import Optional
+from tempfile import SpooledTemporaryFile
+import csv
+import io
+import json
 
-from app.database import get_db
+from app.database import get_async_db, AsyncSessionLocal, SessionLocal
+from app.dependencies import require_role
 from app.models.user import User
+from app.responses import model_response, trusted
 from app.schemas.auth import (
     Role, UserResponse, UserUpdate, UserListResponse
 )
+from app.services.bulk import ENTITIES, BulkReport, csv_header, encode_rows, export_query, import_rows
+from app.services.catalog_index import catalog_index
+from app.services.response_cache import USERS, response_cache
+from app.services.semantic_index import semantic_index
+from app.services.tokens import Principal, principal_cache
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
 
-def get_current_admin(
-    authorization: Optional[str] = Header(None),
-    db: Session = Depends(get_db)
-) -> User:
+# Проверка роли администратора (см. app.dependencies)
+get_current_admin = require_role(Role.ADMIN)
+
+
+# Максимальный размер страницы списка пользователей
+MAX_PAGE_SIZE = 500
+# Размер пачки строк при потоковой выгрузке
+EXPORT_CHUNK_SIZE = 1000
+USER_COLUMNS = (User.id, User.email, User.name, User.role)
+USER_LIST = TypeAdapter(UserListResponse)
+# Тело загрузки до этого размера держится в памяти, дальше - во временном файле
+BULK_SPOOL_BYTES = 16 * 1024 * 1024
+BULK_FORMAT = Query("jsonl", alias="format", pattern="^(jsonl|csv)$")
+
+
+def filter_users(query, role: Optional[Role], email_prefix: Optional[str]):
     """
-    Проверка роли текущего пользователя.
+    Фильтры списка пользователей.
+    Префикс email превращается в диапазон, чтобы работал индекс по email
+    (email хранится в нижнем регистре).
     """
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Требуется авторизация")
-
-    try:
-        # Токен формата: "token_1_admin"
-        token = authorization.replace("Bearer ", "")
-        parts = token.split("_")
-        user_id = int(parts[1])
-    except (IndexError, ValueError):
-        raise HTTPException(status_code=401, detail="Неверный токен")
-
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=401, detail="Пользователь не найден")
+    if role is not None:
+        query = query.where(User.role == role)
+    if email_prefix:
+        prefix = email_prefix.lower()
+        query = query.where(User.email >= prefix, User.email < prefix + "\uffff")
+    return query
 
-    if user.role != Role.ADMIN:
-        raise HTTPException(status_code=403, detail="Доступ запрещён. Требуется роль администратора")
 
-    return user
+def users_page_query(after_id: Optional[int], limit: int, role: Optional[Role], email_prefix: Optional[str]):
+    """Keyset-страница пользователей: только нужные колонки, по возрастанию id."""
+    query = filter_users(select(*USER_COLUMNS), role, email_prefix)
+    if after_id is not None:
+        query = query.where(User.id > after_id)
+    return query.order_by(User.id).limit(limit)
 
 
 @router.get("/users", response_model=UserListResponse)
-def get_all_users(
-    db: Session = Depends(get_db),
-    admin: User = Depends(get_current_admin)
+async def get_all_users(
+    request: Request,
+    after_id: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    role: Optional[Role] = None,
+    email_prefix: Optional[str] = None,
+    include_total: bool = True,
+    db: AsyncSession = Depends(get_async_db),
+    admin: Principal = Depends(get_current_admin)
 ):
     """
-    Получить список всех пользователей.
+    Получить список пользователей постранично.
+    Следующая страница запрашивается с after_id = next_after_id.
     """
-    users = db.query(User).all()
+    rows = (await db.execute(users_page_query(after_id, limit, role, email_prefix))).all()
+
+    total = None
+    if include_total:
+        count_query = filter_users(select(func.count(User.id)), role, email_prefix)
+        total = (await db.execute(count_query)).scalar_one()
 
-    return UserListResponse(
-        users=[
-            UserResponse(
-                id=u.id,
-                email=u.email,
-                name=u.name,
-                role=u.role
-            ) for u in users
-        ],
-        total=len(users)
+    page = UserListResponse.model_construct(
+        users=[trusted(UserResponse, row) for row in rows],
+        total=total,
+        next_after_id=rows[-1].id if len(rows) == limit else None
     )
+    return model_response(page, USER_LIST, request)
+
+
+@router.get("/users/export")
+async def export_users(
+    fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    role: Optional[Role] = None,
+    email_prefix: Optional[str] = None,
+    admin: Principal = Depends(get_current_admin)
+):
+    """
+    Потоковая выгрузка пользователей в NDJSON или CSV.
+    Строки читаются пачками по id, память не зависит от числа пользователей.
+    """
+
+    async def rows():
+        # Сессия открывается внутри генератора: dependency закрываются
+        # до того, как начнётся отправка тела ответа
+        async with AsyncSessionLocal() as db:
+            after_id = None
+            while True:
+                query = users_page_query(after_id, EXPORT_CHUNK_SIZE, role, email_prefix)
+                chunk = (await db.execute(query)).all()
+                if not chunk:
+                    break
+                yield chunk
+                after_id = chunk[-1].id
+
+    async def ndjson():
+        async for chunk in rows():
+            yield "".join(
+                json.dumps({"id": r.id, "email": r.email, "name": r.name, "role": r.role.value},
+                           ensure_ascii=False) + "\n"
+                for r in chunk
+            )
+
+    async def csv_lines():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(["id", "email", "name", "role"])
+        async for chunk in rows():
+            writer.writerows((r.id, r.email, r.name, r.role.value) for r in chunk)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+
+    if fmt == "csv":
+        return StreamingResponse(
+            csv_lines(),
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": "attachment; filename=users.csv"}
+        )
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
 
 
 @router.get("/users/{user_id}", response_model=UserResponse)
-def get_user(
+async def get_user(
     user_id: int,
-    db: Session = Depends(get_db),
-    admin: User = Depends(get_current_admin)
+    db: AsyncSession = Depends(get_async_db),
+    admin: Principal = Depends(get_current_admin)
 ):
     """
     Получить данные конкретного пользователя.
     """
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
 
-    return UserResponse(
-        id=user.id,
-        email=user.email,
-        name=user.name,
-        role=user.role
-    )
+    return trusted(UserResponse, user)
 
 
 @router.patch("/users/{user_id}", response_model=UserResponse)
-def update_user(
+async def update_user(
     user_id: int,
     data: UserUpdate,
-    db: Session = Depends(get_db),
-    admin: User = Depends(get_current_admin)
+    db: AsyncSession = Depends(get_async_db),
+    admin: Principal = Depends(get_current_admin)
 ):
     """
     Обновить данные пользователя (email, name, role).
     """
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
 
@@ -112,10 +191,10 @@ def update_user(
     # Обновляем только переданные поля
     if data.email is not None:
         # Проверяем уникальность email
-        existing = db.query(User).filter(
+        existing = (await db.execute(select(User).where(
             User.email == data.email.lower(),
             User.id != user_id
-        ).first()
+        ))).scalar_one_or_none()
         if existing:
             raise HTTPException(status_code=400, detail="Email уже занят")
         user.email = data.email.lower()
@@ -126,22 +205,21 @@ def update_user(
     if data.role is not None:
         user.role = data.role
 
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
 
-    return UserResponse(
-        id=user.id,
-        email=user.email,
-        name=user.name,
-        role=user.role
-    )
+    # Новая роль и данные действуют со следующего запроса
+    principal_cache.invalidate(user.id)
+    response_cache.invalidate(USERS)
+
+    return trusted(UserResponse, user)
 
 
 @router.delete("/users/{user_id}")
-def delete_user(
+async def delete_user(
     user_id: int,
-    db: Session = Depends(get_db),
-    admin: User = Depends(get_current_admin)
+    db: AsyncSession = Depends(get_async_db),
+    admin: Principal = Depends(get_current_admin)
 ):
     """
     Удалить пользователя.
@@ -149,11 +227,104 @@ def delete_user(
     if user_id == admin.id:
         raise HTTPException(status_code=400, detail="Нельзя удалить собственный аккаунт")
 
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
 
-    db.delete(user)
-    db.commit()
+    await db.delete(user)
+    await db.commit()
+
+    principal_cache.invalidate(user_id)
+    response_cache.invalidate(USERS)
 
     return {"success": True, "message": f"Пользователь {user.email} удалён"}
+
+
+@router.get("/response-cache/stats")
+def get_response_cache_stats(admin: Principal = Depends(get_current_admin)):
+    """
+    Статистика кэша ответов: число записей, доля попаданий, 304.
+    """
+    return response_cache.stats()
+
+
+def bulk_entity(entity: str):
+    if entity not in ENTITIES:
+        raise HTTPException(status_code=404, detail=f"Неизвестная сущность: {entity}")
+    return ENTITIES[entity]
+
+
+def import_spooled(entity: str, body: SpooledTemporaryFile, fmt: str) -> BulkReport:
+    """
+    Загрузка в потоке пула: синхронная сессия, после неё - пересборка
+    индексов процесса (строятся в стороне и подменяются целиком).
+    """
+    db = SessionLocal()
+    try:
+        with io.TextIOWrapper(body, encoding="utf-8-sig", newline="") as stream:
+            report = import_rows(db, entity, stream, fmt)
+        if entity in ("places", "reviews"):
+            catalog_index.rebuild(db)
+    finally:
+        db.close()
+    if entity == "places":
+        semantic_index.open(catalog_index.all())
+    return report
+
+
+@router.post("/bulk/{entity}/import")
+async def bulk_import(
+    entity: str,
+    request: Request,
+    fmt: str = BULK_FORMAT,
+    admin: Principal = Depends(get_current_admin)
+):
+    """
+    Массовая загрузка мест, отзывов или пользователей из тела запроса (JSONL или CSV).
+    Строки с id обновляют существующие записи, пользователи сопоставляются по email.
+    Возвращает отчёт: число строк, записанных, некорректных и первые ошибки.
+    """
+    bulk_entity(entity)
+    body = SpooledTemporaryFile(max_size=BULK_SPOOL_BYTES)
+    async for data in request.stream():
+        body.write(data)
+    body.seek(0)
+
+    report = await run_in_threadpool(import_spooled, entity, body, fmt)
+
+    if entity == "users":
+        principal_cache.clear()
+    response_cache.clear()
+    return report.as_dict()
+
+
+@router.get("/bulk/{entity}/export")
+async def bulk_export(
+    entity: str,
+    fmt: str = BULK_FORMAT,
+    admin: Principal = Depends(get_current_admin)
+):
+    """
+    Потоковая выгрузка сущности в формате загрузки (JSONL или CSV).
+    Хэши паролей пользователей через API не выгружаются.
+    """
+    target = bulk_entity(entity)
+
+    async def lines():
+        if fmt == "csv":
+            yield csv_header(target)
+        async with AsyncSessionLocal() as db:
+            after_id = None
+            while True:
+                chunk = (await db.execute(export_query(target, after_id, EXPORT_CHUNK_SIZE))).all()
+                if not chunk:
+                    break
+                yield encode_rows(target, chunk, fmt)
+                after_id = chunk[-1].id
+
+    media_type = "text/csv; charset=utf-8" if fmt == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        lines(),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={entity}.{fmt}"}
+    )
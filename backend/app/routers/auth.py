@@ -3,33 +3,33 @@
 """
 
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from passlib.context import CryptContext
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
+from app.database import get_async_db
 from app.models.user import User
 from app.schemas.auth import (
     UserCreate, UserLogin, LoginResponse, RegisterResponse, UserResponse, Role
 )
+from app.services.passwords import password_hasher, PasswordHasherBusy, RETRY_AFTER_SECONDS
+from app.responses import trusted
+from app.services.tokens import create_access_token
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
-# Хэширование паролей через bcrypt
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Проверка пароля."""
-    return pwd_context.verify(plain_password, hashed_password)
-
-
-def hash_password(password: str) -> str:
-    """Хэширование пароля."""
-    return pwd_context.hash(password)
+def hasher_busy_response(response_cls):
+    """Ответ при насыщенном пуле хэширования паролей."""
+    return JSONResponse(
+        status_code=503,
+        content=response_cls(success=False, error="Сервис перегружен, повторите попытку").model_dump(),
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+    )
 
 
 @router.post("/login", response_model=LoginResponse)
-def login(data: UserLogin, db: Session = Depends(get_db)):
+async def login(data: UserLogin, db: AsyncSession = Depends(get_async_db)):
     """
     Авторизация пользователя.
     UGC: событие входа пользователя в систему.
@@ -37,18 +37,27 @@ def login(data: UserLogin, db: Session = Depends(get_db)):
     email = data.email.lower()
 
     # Ищем пользователя в БД
-    user = db.query(User).filter(User.email == email).first()
+    user = (await db.execute(select(User).where(User.email == email))).scalar_one_or_none()
+
+    if user:
+        # bcrypt выполняется в пуле процессов, а не в event loop
+        try:
+            valid, new_hash = await password_hasher.verify(data.password, user.hashed_password)
+        except PasswordHasherBusy:
+            return hasher_busy_response(LoginResponse)
+    else:
+        valid, new_hash = False, None
+
+    if valid:
+        # Хэш со старыми параметрами bcrypt заменяется прозрачно для пользователя
+        if new_hash:
+            user.hashed_password = new_hash
+            await db.commit()
 
-    if user and verify_password(data.password, user.hashed_password):
         return LoginResponse(
             success=True,
-            token=f"token_{user.id}_{user.role.value}",
-            user=UserResponse(
-                id=user.id,
-                email=user.email,
-                name=user.name,
-                role=user.role
-            )
+            token=create_access_token(user.id, user.role),
+            user=trusted(UserResponse, user)
         )
 
     return LoginResponse(
@@ -58,7 +67,7 @@ def login(data: UserLogin, db: Session = Depends(get_db)):
 
 
 @router.post("/register", response_model=RegisterResponse)
-def register(data: UserCreate, db: Session = Depends(get_db)):
+async def register(data: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """
     Регистрация нового пользователя.
     UGC: событие создания нового пользователя.
@@ -66,7 +75,7 @@ def register(data: UserCreate, db: Session = Depends(get_db)):
     email = data.email.lower()
 
     # Проверяем, не занят ли email
-    existing_user = db.query(User).filter(User.email == email).first()
+    existing_user = (await db.execute(select(User).where(User.email == email))).scalar_one_or_none()
     if existing_user:
         return RegisterResponse(
             success=False,
@@ -74,25 +83,25 @@ def register(data: UserCreate, db: Session = Depends(get_db)):
         )
 
     # Создаём нового пользователя с хэшированным паролем
+    try:
+        hashed_password = await password_hasher.hash(data.password)
+    except PasswordHasherBusy:
+        return hasher_busy_response(RegisterResponse)
+
     new_user = User(
         email=email,
         name=data.name,
-        hashed_password=hash_password(data.password),
+        hashed_password=hashed_password,
         role=Role.USER
     )
 
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
 
     return RegisterResponse(
         success=True,
-        user=UserResponse(
-            id=new_user.id,
-            email=new_user.email,
-            name=new_user.name,
-            role=new_user.role
-        )
+        user=trusted(UserResponse, new_user)
     )
 
 
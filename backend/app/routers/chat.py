@@ -1,38 +1,296 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
-from app.schemas.chat import ChatRequest, ChatResponse, ChatMessage
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import AsyncIterator, List, Optional, Tuple
+import json
+import time
+
+from app.database import get_async_db, AsyncSessionLocal
+from app.dependencies import get_current_user
+from app.models.chat import ChatMessageRecord
+from app.routers.admin import get_current_admin
+from app.schemas.chat import ChatRequest, ChatResponse, ChatMessage, Place
+from app.schemas.places import PlaceResponse
+from app.responses import ReleasingStreamingResponse
+from app.services.admission import admission, AdmissionRejected
+from app.services.catalog_index import catalog_index
+from app.services import chat_history
+from app.services.chat_history import estimate_tokens
+from app.services.llm import llm_client, ChatTurn
+from app.services.llm_cache import llm_cache, make_key
+from app.services.metrics import observe_llm
+from app.services.recommender import recommender
+from app.services.semantic_index import semantic_index
+from app.services.tokens import Principal
 
 router = APIRouter(prefix="/api/chat", tags=["chat"])
 
+# Сколько карточек мест прикладывать к ответу
+PLACES_IN_ANSWER = 3
+# Минимальная косинусная близость места к сообщению
+MIN_SIMILARITY = 0.1
+# С местоположением места выбираются среди стольких ближайших в радиусе
+NEARBY_CANDIDATES = 50
+NEARBY_RADIUS_KM = 50.0
+
+
+def find_places(
+    message: str,
+    limit: int = PLACES_IN_ANSWER,
+    location: Optional[Tuple[float, float]] = None
+) -> List[PlaceResponse]:
+    """
+    Подбор мест под сообщение: семантический поиск по каталогу,
+    если близких мест нет - движок рекомендаций.
+    С местоположением - движок рекомендаций среди ближайших мест
+    (если рядом ничего нет - как без местоположения).
+    """
+    if location is not None:
+        nearby = {p.id: p for p in catalog_index.nearest(*location, k=NEARBY_CANDIDATES, max_km=NEARBY_RADIUS_KM)}
+        if nearby:
+            preferences = recommender.preferences_from_text(message)
+            ranked = recommender.recommend(preferences, k=limit, place_ids=list(nearby))
+            return [nearby[p.id] for p in ranked]
+
+    found = []
+    for hit in semantic_index.search(message, k=limit):
+        place = catalog_index.get(hit.place_id)
+        if place is not None and hit.score >= MIN_SIMILARITY:
+            found.append(place)
+    if found:
+        return found
+    return recommender.recommend(recommender.preferences_from_text(message), k=limit)
+
+
+def prompt_tokens(message: str, history: List[ChatTurn]) -> int:
+    """Оценка токенов промпта: сообщение и окно истории."""
+    return estimate_tokens(message) + sum(estimate_tokens(turn.text) for turn in history)
+
+
+def to_chat_place(place: PlaceResponse) -> Place:
+    return Place(**place.model_dump(exclude={"id"}))
+
+
+def answer_key(message: str, location: Optional[Tuple[float, float]], history: List[ChatTurn]) -> str:
+    """Ключ кэша ответов с учётом окна истории диалога."""
+    return make_key(message, catalog_index.content_version, location, [(turn.is_user, turn.text) for turn in history])
+
+
+def get_cached_answer(key: str) -> Optional[Tuple[str, List[Place]]]:
+    cached = llm_cache.get(key)
+    if cached is None:
+        return None
+    payload = json.loads(cached)
+    return payload["text"], [Place(**p) for p in payload["places"]]
+
+
+def store_answer(key: str, text: str, places: List[Place]) -> None:
+    llm_cache.set(key, json.dumps({
+        "text": text,
+        "places": [p.model_dump() for p in places]
+    }, ensure_ascii=False))
+
+
+def record_to_message(record: ChatMessageRecord) -> ChatMessage:
+    return ChatMessage(
+        id=record.id,
+        text=record.text,
+        isUser=record.is_user,
+        time=record.created_at.strftime("%H:%M") if record.created_at else "",
+        places=[Place(**p) for p in record.places] if record.places else None
+    )
+
+
+async def answer_message(
+    db: AsyncSession,
+    user_id: int,
+    message: str,
+    location: Optional[Tuple[float, float]] = None
+) -> Tuple[Optional[Tuple[str, List[Place]]], List[PlaceResponse], List[ChatTurn]]:
+    """
+    Общая часть обычного и потокового ответа: окно контекста диалога,
+    поиск в кэше и подбор мест. Ничего не пишет: сообщение пользователя
+    сохраняется вместе с ответом (save_exchange), чтобы транзакция
+    записи не держала блокировку БД, пока отвечает LLM.
+    Возвращает (ответ из кэша или None, найденные места, контекст).
+    """
+    history = await chat_history.get_context(db, user_id)
+    # Транзакция чтения закрывается до ожидания очереди и вызова LLM
+    await db.rollback()
+
+    cached = get_cached_answer(answer_key(message, location, history))
+    found = [] if cached is not None else find_places(message, location=location)
+    return cached, found, history
+
+
+async def save_exchange(
+    db: AsyncSession,
+    user_id: int,
+    message: str,
+    text: str,
+    places: List[Place]
+) -> ChatMessage:
+    """Сообщение пользователя и ответ одной короткой транзакцией."""
+    await chat_history.append_message(db, user_id, is_user=True, text=message)
+    record = await chat_history.append_message(
+        db, user_id, is_user=False, text=text,
+        places=[p.model_dump() for p in places] or None
+    )
+    await db.commit()
+    return record_to_message(record)
+
+
+def rejected_response(rejected: AdmissionRejected) -> JSONResponse:
+    """Ответ при отказе контроля допуска: 429 с Retry-After."""
+    return JSONResponse(
+        status_code=429,
+        content=ChatResponse(success=False, error="Слишком много запросов, повторите позже").model_dump(),
+        headers={"Retry-After": str(rejected.retry_after)}
+    )
+
+
+def sse_event(event: str, data: str) -> str:
+    return f"event: {event}\ndata: {data}\n\n"
+
 
 @router.get("/history", response_model=List[ChatMessage])
-async def get_chat_history():
+async def get_chat_history(
+    before_id: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_async_db),
+    user: Principal = Depends(get_current_user)
+):
     """
     Получение истории сообщений пользователя.
+    Более ранние сообщения запрашиваются с before_id = id первого сообщения.
     UGC: запрос истории диалога.
     """
-    # TODO: Реализовать получение из БД
-    return []
+    records = await chat_history.get_history(db, user.id, before_id=before_id, limit=limit)
+    return [record_to_message(r) for r in records]
 
 
 @router.post("/message", response_model=ChatResponse)
-async def send_message(data: ChatRequest):
+async def send_message(
+    data: ChatRequest,
+    db: AsyncSession = Depends(get_async_db),
+    user: Principal = Depends(get_current_user)
+):
     """
-    Отправка сообщения в чат.
+    Отправка сообщения в чат. Сообщения пользователя ограничены его
+    token bucket, вызовы LLM - глобальным семафором с очередью;
+    при отказе - 429 с Retry-After, сообщение не сохраняется.
     UGC: событие отправки сообщения пользователем.
     """
-    # TODO: Реализовать интеграцию с LLM и сохранение в БД
-    return ChatResponse(
-        success=False,
-        error="В разработке"
-    )
+    if not data.message.strip():
+        return ChatResponse(success=False, error="Пустое сообщение")
+
+    try:
+        admission.check_rate(user)
+    except AdmissionRejected as rejected:
+        return rejected_response(rejected)
+
+    # Популярные вопросы отдаются из кэша без обращения к LLM
+    cached, found, history = await answer_message(db, user.id, data.message, data.location())
+    if cached is not None:
+        text, places = cached
+    else:
+        try:
+            permit = await admission.acquire(user)
+        except AdmissionRejected as rejected:
+            # Сообщение пользователя ещё не записано
+            return rejected_response(rejected)
+        async with permit:
+            started = time.perf_counter()
+            text = await llm_client.complete(data.message, found, history)
+            observe_llm("complete", time.perf_counter() - started, prompt_tokens(data.message, history), estimate_tokens(text))
+        places = [to_chat_place(p) for p in found]
+        store_answer(answer_key(data.message, data.location(), history), text, places)
+
+    message = await save_exchange(db, user.id, data.message, text, places)
+    return ChatResponse(success=True, message=message)
+
+
+@router.post("/message/stream")
+async def send_message_stream(data: ChatRequest, user: Principal = Depends(get_current_user)):
+    """
+    Отправка сообщения в чат с потоковым ответом (Server-Sent Events).
+    События: places - карточки мест сразу после подбора,
+    delta - очередной фрагмент текста, done - итоговое сообщение.
+    Ответ из кэша отдаётся без обращения к LLM; иначе место в семафоре
+    LLM занимается до начала ответа (иначе отказ нельзя вернуть как 429)
+    и освобождается после отправки потока.
+    UGC: событие отправки сообщения пользователем.
+    """
+    if not data.message.strip():
+        raise HTTPException(status_code=400, detail="Пустое сообщение")
+
+    try:
+        admission.check_rate(user)
+        async with AsyncSessionLocal() as db:
+            cached, found, history = await answer_message(db, user.id, data.message, data.location())
+        permit = await admission.acquire(user) if cached is None else None
+    except AdmissionRejected as rejected:
+        raise HTTPException(
+            status_code=429, detail="Слишком много запросов, повторите позже",
+            headers={"Retry-After": str(rejected.retry_after)}
+        )
+
+    async def events() -> AsyncIterator[str]:
+        if cached is not None:
+            text, places = cached
+            yield sse_event("places", json.dumps([p.model_dump() for p in places], ensure_ascii=False))
+            yield sse_event("delta", json.dumps({"text": text}, ensure_ascii=False))
+        else:
+            places = [to_chat_place(p) for p in found]
+            # Карточки отправляются до начала генерации текста
+            yield sse_event("places", json.dumps([p.model_dump() for p in places], ensure_ascii=False))
+            chunks = []
+            started = time.perf_counter()
+            async for chunk in llm_client.stream(data.message, found, history):
+                chunks.append(chunk)
+                yield sse_event("delta", json.dumps({"text": chunk}, ensure_ascii=False))
+            text = "".join(chunks)
+            observe_llm("stream", time.perf_counter() - started, prompt_tokens(data.message, history), estimate_tokens(text))
+            store_answer(answer_key(data.message, data.location(), history), text, places)
+
+        # Сессия открывается внутри генератора: dependency закрываются
+        # до того, как начнётся отправка тела ответа
+        async with AsyncSessionLocal() as db:
+            message = await save_exchange(db, user.id, data.message, text, places)
+        yield sse_event("done", message.model_dump_json())
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    if permit is None:
+        return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+    return ReleasingStreamingResponse(events(), permit, media_type="text/event-stream", headers=headers)
 
 
 @router.delete("/history")
-async def clear_history():
+async def clear_history(
+    db: AsyncSession = Depends(get_async_db),
+    user: Principal = Depends(get_current_user)
+):
     """
     Очистка истории чата.
     UGC: событие очистки диалога пользователем.
     """
-    # TODO: Реализовать очистку в БД
-    return {"success": False, "error": "В разработке"}
+    await chat_history.clear_history(db, user.id)
+    await db.commit()
+    return {"success": True}
+
+
+@router.get("/cache/stats")
+def get_cache_stats(admin: Principal = Depends(get_current_admin)):
+    """
+    Счётчики кэша ответов LLM (только admin).
+    """
+    return llm_cache.stats()
+
+
+@router.get("/admission/stats")
+def get_admission_stats(admin: Principal = Depends(get_current_admin)):
+    """
+    Счётчики контроля допуска к LLM: допущено, отклонено по причинам,
+    в работе и в очереди (только admin).
+    """
+    return admission.stats()
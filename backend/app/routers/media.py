@@ -0,0 +1,55 @@
+"""
+Раздача изображений мест (см. app.services.images).
+Имена файлов - хэши содержимого, поэтому ответы кэшируются навсегда
+(Cache-Control: immutable), ETag - тот же хэш.
+"""
+
+from fastapi import APIRouter, HTTPException, Request
+
+from app.responses import ImmutableFileResponse
+from app.services.images import (
+    ORIGINAL_NAME, THUMBNAIL_NAME, THUMBNAIL_SIZES,
+    find_original, original_path, shard, thumbnail_path, thumbnailer
+)
+
+router = APIRouter(prefix="/media", tags=["media"])
+
+MEDIA_TYPES = {"jpg": "image/jpeg", "png": "image/png", "webp": "image/webp", "gif": "image/gif"}
+
+
+@router.api_route("/originals/{prefix}/{name}", methods=["GET", "HEAD"])
+async def get_original(prefix: str, name: str, request: Request):
+    """Оригинал изображения."""
+    match = ORIGINAL_NAME.match(name)
+    if not match or shard(name) != prefix:
+        raise HTTPException(status_code=404, detail="Файл не найден")
+    try:
+        return ImmutableFileResponse(
+            str(original_path(name)), request,
+            etag=f'"{match.group(1)}"', media_type=MEDIA_TYPES[match.group(2)]
+        )
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Файл не найден")
+
+
+@router.api_route("/thumbs/{size}/{prefix}/{name}", methods=["GET", "HEAD"])
+async def get_thumbnail(size: str, prefix: str, name: str, request: Request):
+    """
+    WebP-превью. Если превью ещё не построено (задача в очереди пула),
+    запрос дожидается её, а не отдаёт 404.
+    """
+    match = THUMBNAIL_NAME.match(name)
+    if size not in THUMBNAIL_SIZES or not match or shard(name) != prefix:
+        raise HTTPException(status_code=404, detail="Файл не найден")
+    digest = match.group(1)
+    path = thumbnail_path(size, digest)
+
+    if not path.exists():
+        original = find_original(digest)
+        if original is None:
+            raise HTTPException(status_code=404, detail="Файл не найден")
+        await thumbnailer.ensure(original)
+
+    return ImmutableFileResponse(
+        str(path), request, etag=f'"{digest}-{size}"', media_type="image/webp"
+    )
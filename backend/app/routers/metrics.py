@@ -0,0 +1,58 @@
+"""
+Роутер метрик: экспозиция Prometheus и профилировщик.
+"""
+
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from app.routers.admin import get_current_admin
+from app.services.admission import admission
+from app.services.llm_cache import llm_cache
+from app.services.metrics import REGISTRY, stats_collector
+from app.services.profiler import PROFILER_ENABLED, ProfilerBusy, profiler, render_collapsed
+from app.services.response_cache import response_cache
+from app.services.tokens import Principal
+
+router = APIRouter(tags=["metrics"])
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4"
+
+REGISTRY.add_collector(stats_collector(
+    "response_cache", "Кэш ответов", response_cache.stats,
+    ("hits", "misses", "not_modified", "invalidations", "evictions")))
+REGISTRY.add_collector(stats_collector(
+    "llm_cache", "Кэш ответов LLM", llm_cache.stats, ("hits", "misses", "evictions")))
+REGISTRY.add_collector(stats_collector(
+    "chat_admission", "Контроль допуска к LLM", admission.stats,
+    ("admitted", "rate_limited", "queue_full", "shed", "timed_out")))
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """
+    Метрики процесса в текстовом формате Prometheus.
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@router.get("/api/admin/profile", response_class=PlainTextResponse)
+async def get_profile(
+    seconds: float = Query(10.0, gt=0, le=60),
+    interval: float = Query(0.01, ge=0.001, le=1.0),
+    limit: int = Query(200, ge=1, le=10000),
+    idle: bool = False,
+    admin: Principal = Depends(get_current_admin)
+):
+    """
+    Сэмплирующий профиль процесса за seconds секунд в формате свёрнутых
+    стеков (только admin, при PROFILER_ENABLED=1).
+    """
+    if not PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Профилировщик выключен")
+    try:
+        stacks, samples = await asyncio.to_thread(profiler.profile, seconds, interval, idle)
+    except ProfilerBusy:
+        raise HTTPException(status_code=409, detail="Профиль уже снимается")
+    return PlainTextResponse(f"# samples {samples}\n" + render_collapsed(stacks, limit))
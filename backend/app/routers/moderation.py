@@ -1,76 +1,227 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+
+from app.database import get_async_db
+from app.dependencies import require_role
+from app.models.report import ReportStatus, ReviewReport
+from app.models.review import Review, ReviewStatus
+from app.routers.reviews import refresh_places_in_index
+from app.schemas.auth import Role
 from app.schemas.moderation import (
-    Review, Report, UserInfo, ModerationStats,
+    Review as QueueReview, Report, UserInfo, ModerationStats,
     ReviewsListResponse, ReportsListResponse, UsersListResponse,
-    ModerationActionRequest, ModerationActionResponse
+    ModerationActionRequest, ModerationActionResponse,
+    BulkModerationRequest, BulkModerationResponse
 )
+from app.services import moderation_queue, moderation_stats
+from app.services.tokens import Principal
 
 router = APIRouter(prefix="/api/moderation", tags=["moderation"])
 
+# Доступ к модерации - модераторы и администраторы
+get_current_moderator = require_role(Role.MODERATOR, Role.ADMIN)
+
+MODERATION_ACTIONS = {
+    "approve": ReviewStatus.APPROVED,
+    "reject": ReviewStatus.REJECTED,
+}
+
 
 @router.get("/stats", response_model=ModerationStats)
-async def get_moderation_stats():
+async def get_moderation_stats(
+    db: AsyncSession = Depends(get_async_db),
+    moderator: Principal = Depends(get_current_moderator)
+):
     """
-    Получение статистики модерации.
+    Получение статистики модерации из таблицы счётчиков.
     UGC: событие просмотра статистики модератором.
     """
-    # TODO: Реализовать получение из БД
-    return ModerationStats(pending_reviews=0, reports_count=0)
+    counters = await moderation_stats.read_counters(db)
+    return ModerationStats(
+        pending_reviews=counters.get(moderation_stats.PENDING_REVIEWS, 0),
+        reports_count=counters.get(moderation_stats.OPEN_REPORTS, 0)
+    )
+
+
+def to_queue_item(review: Review, user_name: str, place_name: str, moderator_id: int) -> QueueReview:
+    mine = review.claimed_by == moderator_id and review.lease_expires_at is not None
+    return QueueReview(
+        id=review.id,
+        user=user_name,
+        place=place_name,
+        rating=review.rating,
+        text=review.text,
+        date=review.created_at.strftime("%d.%m.%Y") if review.created_at else "",
+        reports=review.reports_count,
+        lease_expires=review.lease_expires_at.isoformat() if mine else None
+    )
 
 
 @router.get("/queue", response_model=ReviewsListResponse)
-async def get_moderation_queue():
+async def get_moderation_queue(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    mine: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+    moderator: Principal = Depends(get_current_moderator)
+):
     """
-    Получение очереди отзывов на модерацию.
+    Получение очереди отзывов на модерацию: сначала с большим числом
+    жалоб, затем более старые. Следующая страница - cursor=next_cursor.
+    mine=true - только отзывы, арендованные текущим модератором.
     UGC: событие просмотра очереди модерации.
     """
-    # TODO: Реализовать получение из БД
+    try:
+        position = moderation_queue.decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Некорректный курсор")
+
+    rows = await moderation_queue.queue_page(db, moderator.id, position, limit, mine=mine)
     return ReviewsListResponse(
-        success=False,
-        reviews=[],
-        error="В разработке"
+        success=True,
+        reviews=[to_queue_item(*row, moderator.id) for row in rows],
+        next_cursor=moderation_queue.encode_cursor(rows[-1][0]) if len(rows) == limit else None
     )
 
 
+@router.post("/queue/claim", response_model=ReviewsListResponse)
+async def claim_reviews(
+    limit: int = Query(20, ge=1, le=moderation_queue.CLAIM_LIMIT),
+    db: AsyncSession = Depends(get_async_db),
+    moderator: Principal = Depends(get_current_moderator)
+):
+    """
+    Аренда пачки отзывов из головы очереди на MODERATION_LEASE_SECONDS.
+    Одновременные модераторы получают непересекающиеся пачки.
+    UGC: событие взятия отзывов в работу модератором.
+    """
+    rows = await moderation_queue.claim(db, moderator.id, limit)
+    return ReviewsListResponse(success=True, reviews=[to_queue_item(*row, moderator.id) for row in rows])
+
+
+@router.post("/queue/release", response_model=ModerationActionResponse)
+async def release_reviews(
+    db: AsyncSession = Depends(get_async_db),
+    moderator: Principal = Depends(get_current_moderator)
+):
+    """
+    Возврат арендованных отзывов в очередь.
+    UGC: событие отказа модератора от взятых отзывов.
+    """
+    released = await moderation_queue.release(db, moderator.id)
+    return ModerationActionResponse(success=True, message=f"Возвращено в очередь: {released}")
+
+
+@router.post("/bulk", response_model=BulkModerationResponse)
+async def moderate_reviews_bulk(
+    data: BulkModerationRequest,
+    db: AsyncSession = Depends(get_async_db),
+    moderator: Principal = Depends(get_current_moderator)
+):
+    """
+    Одобрение или отклонение многих отзывов в одной транзакции.
+    Отзывы, арендованные другими модераторами, пропускаются.
+    UGC: событие массовой модерации отзывов.
+    """
+    new_status = MODERATION_ACTIONS.get(data.action)
+    if new_status is None:
+        return BulkModerationResponse(success=False, error="Неизвестное действие")
+
+    review_ids = list(dict.fromkeys(data.review_ids))
+    processed, skipped, places = await moderation_queue.decide(db, moderator.id, review_ids, new_status)
+    await refresh_places_in_index(db, places)
+    return BulkModerationResponse(success=True, processed=len(processed), skipped=skipped)
+
+
 @router.put("/{review_id}", response_model=ModerationActionResponse)
-async def moderate_review(review_id: int, data: ModerationActionRequest):
+async def moderate_review(
+    review_id: int,
+    data: ModerationActionRequest,
+    db: AsyncSession = Depends(get_async_db),
+    moderator: Principal = Depends(get_current_moderator)
+):
     """
     Одобрение или отклонение отзыва.
     UGC: событие модерации отзыва (approve/reject).
     """
-    # TODO: Реализовать обновление статуса в БД
-    return ModerationActionResponse(
-        success=False,
-        error="В разработке"
-    )
+    new_status = MODERATION_ACTIONS.get(data.action)
+    if new_status is None:
+        return ModerationActionResponse(success=False, error="Неизвестное действие")
+
+    # Агрегаты места меняются в той же транзакции, что и статус отзыва
+    processed, _, places = await moderation_queue.decide(db, moderator.id, [review_id], new_status)
+    if not processed:
+        if await db.get(Review, review_id) is None:
+            raise HTTPException(status_code=404, detail="Отзыв не найден")
+        raise HTTPException(status_code=409, detail="Отзыв модерирует другой модератор")
+
+    await refresh_places_in_index(db, places)
+
+    return ModerationActionResponse(success=True, message=f"Статус отзыва: {new_status.value}")
 
 
 @router.get("/reports", response_model=ReportsListResponse)
-async def get_reports():
+async def get_reports(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_async_db),
+    moderator: Principal = Depends(get_current_moderator)
+):
     """
-    Получение списка жалоб.
+    Получение открытых жалоб: одна запись на отзыв, больше жалоб - раньше.
     UGC: событие просмотра жалоб модератором.
     """
-    # TODO: Реализовать получение из БД
-    return ReportsListResponse(
-        success=False,
-        reports=[],
-        error="В разработке"
-    )
+    try:
+        position = moderation_stats.decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Некорректный курсор")
+
+    rows = await moderation_stats.open_reports_page(db, position, limit)
+    reports = [
+        Report(
+            id=report.id,
+            type="review",
+            content=review.text,
+            reporter=reporter or "",
+            date=report.created_at.strftime("%d.%m.%Y") if report.created_at else "",
+            review_id=review.id,
+            count=report.count,
+            reasons=report.reasons or []
+        )
+        for report, review, reporter in rows
+    ]
+    next_cursor = moderation_stats.encode_cursor(rows[-1][0]) if len(rows) == limit else None
+    return ReportsListResponse(success=True, reports=reports, next_cursor=next_cursor)
 
 
 @router.put("/reports/{report_id}", response_model=ModerationActionResponse)
-async def handle_report(report_id: int, data: ModerationActionRequest):
+async def handle_report(
+    report_id: int,
+    data: ModerationActionRequest,
+    db: AsyncSession = Depends(get_async_db),
+    moderator: Principal = Depends(get_current_moderator)
+):
     """
-    Обработка жалобы.
+    Обработка жалобы: approve оставляет отзыв (одобряет), reject отклоняет.
+    Решение по отзыву закрывает все жалобы на него.
     UGC: событие обработки жалобы модератором.
     """
-    # TODO: Реализовать обновление в БД
-    return ModerationActionResponse(
-        success=False,
-        error="В разработке"
-    )
+    new_status = MODERATION_ACTIONS.get(data.action)
+    if new_status is None:
+        return ModerationActionResponse(success=False, error="Неизвестное действие")
+
+    report = await db.get(ReviewReport, report_id)
+    if report is None or report.status != ReportStatus.OPEN:
+        raise HTTPException(status_code=404, detail="Открытая жалоба не найдена")
+
+    processed, _, places = await moderation_queue.decide(db, moderator.id, [report.review_id], new_status)
+    if not processed:
+        raise HTTPException(status_code=409, detail="Отзыв модерирует другой модератор")
+
+    await refresh_places_in_index(db, places)
+
+    return ModerationActionResponse(success=True, message=f"Статус отзыва: {new_status.value}")
 
 
 @router.get("/users", response_model=UsersListResponse)
@@ -1,74 +1,333 @@
-from fastapi import APIRouter, HTTPException
-from typing import List, Optional
-from pydantic import BaseModel
+from dataclasses import dataclass
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from typing import List, Optional, Set, Tuple
+
+from app.database import get_db, get_async_db
+from app.models.place import Place
+from app.responses import model_response
+from app.routers.admin import get_current_admin
+from app.schemas.places import PlaceResponse, PlaceCreate
+from app.services.catalog_index import BBox, Point, catalog_index, place_to_response, with_distance
+from app.services.geo_index import MAX_DISTANCE_KM
+from app.services.images import MAX_IMAGE_BYTES, InvalidImage, store_original, thumbnailer
+from app.services.recommender import recommender, Preferences, CATEGORY_WEIGHT, TAG_WEIGHT
+from app.services.response_cache import response_cache
+from app.services.review_summary import get_summary
+from app.services.search_index import (
+    index_place, unindex_place, search_places, is_supported as search_supported
+)
+from app.services.semantic_index import semantic_index
+from app.services.tokens import Principal
 
 router = APIRouter(prefix="/api/places", tags=["places"])
 
+# Число результатов поиска, если limit не задан
+SEARCH_LIMIT = 50
+# Наибольший размер страницы списка мест
+MAX_PAGE_SIZE = 500
+
+PLACE_LIST = TypeAdapter(List[PlaceResponse])
+
+
+def parse_numbers(value: str, count: int, name: str) -> Tuple[float, ...]:
+    try:
+        numbers = tuple(float(part) for part in value.split(","))
+    except ValueError:
+        numbers = ()
+    if len(numbers) != count:
+        raise HTTPException(status_code=400, detail=f"{name}: ожидается {count} числа через запятую")
+    return numbers
 
-class PlaceResponse(BaseModel):
-    id: int
-    name: str
-    category: str
-    rating: float
-    reviewsCount: int
-    description: str
-    image: str
-    tags: Optional[List[str]] = None
 
+def check_point(latitude: float, longitude: float, name: str) -> None:
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise HTTPException(status_code=400, detail=f"{name}: координаты вне допустимого диапазона")
 
-class PlaceCreate(BaseModel):
-    name: str
-    category: str
-    description: str
-    image: str
-    tags: Optional[List[str]] = None
+
+def parse_near(near: Optional[str]) -> Optional[Point]:
+    """near=широта,долгота."""
+    if near is None:
+        return None
+    latitude, longitude = parse_numbers(near, 2, "near")
+    check_point(latitude, longitude, "near")
+    return latitude, longitude
+
+
+def parse_bbox(bbox: Optional[str]) -> Optional[BBox]:
+    """
+    bbox=min_lon,min_lat,max_lon,max_lat (порядок GeoJSON).
+    min_lon > max_lon - прямоугольник через 180-й меридиан.
+    """
+    if bbox is None:
+        return None
+    min_lon, min_lat, max_lon, max_lat = parse_numbers(bbox, 4, "bbox")
+    check_point(min_lat, min_lon, "bbox")
+    check_point(max_lat, max_lon, "bbox")
+    if min_lat > max_lat:
+        raise HTTPException(status_code=400, detail="bbox: min_lat больше max_lat")
+    return min_lat, min_lon, max_lat, max_lon
 
 
 @router.get("/", response_model=List[PlaceResponse])
-async def get_places(category: Optional[str] = None, search: Optional[str] = None):
+async def get_places(
+    request: Request,
+    category: Optional[str] = None,
+    search: Optional[str] = None,
+    tag: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    sort: Optional[str] = Query(None, pattern="^(rating|recommended|distance)$"),
+    near: Optional[str] = None,
+    radius: Optional[float] = Query(None, gt=0, le=MAX_DISTANCE_KM),
+    bbox: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
     """
     Получение списка мест.
+    sort=recommended - порядок движка рекомендаций (категория, теги,
+    сглаженный рейтинг, популярность).
+    near=широта,долгота - места по возрастанию расстояния (sort=distance
+    по умолчанию) с расстоянием distanceKm; radius - только в радиусе, км.
+    bbox=min_lon,min_lat,max_lon,max_lat - только в прямоугольнике.
+    Фильтры области сочетаются с категорией, тегом и поиском.
+    Карточки берутся из индекса каталога и сериализуются без повторной
+    валидации (app.responses.model_response).
     UGC: событие просмотра каталога мест.
     """
-    # TODO: Реализовать получение из БД с фильтрацией
-    return []
+    point = parse_near(near)
+    if radius is not None and point is None:
+        raise HTTPException(status_code=400, detail="radius задаётся вместе с near")
+    if sort == "distance" and point is None:
+        raise HTTPException(status_code=400, detail="sort=distance задаётся вместе с near")
+    area = Area(point, radius, parse_bbox(bbox))
+    order = sort or ("distance" if point is not None else "rating")
+    places = await select_places(db, category, search, tag, limit, offset, order, area)
+    return model_response(places, PLACE_LIST, request)
+
+
+@dataclass
+class Area:
+    """Фильтр области списка мест: радиус от точки и/или прямоугольник."""
+    near: Optional[Point] = None
+    radius_km: Optional[float] = None
+    bbox: Optional[BBox] = None
+
+    def ids(self):
+        """id мест в области; None - область не ограничена."""
+        return catalog_index.area(self.near, self.radius_km, self.bbox)
+
+
+def candidate_ids(tag: Optional[str], area: Area) -> Optional[Set[int]]:
+    """id мест с тегом в области; None - ни тег, ни область не заданы."""
+    place_ids = catalog_index.tagged(tag) if tag else None
+    in_area = area.ids()
+    if in_area is not None:
+        place_ids = in_area if place_ids is None else place_ids & in_area
+    return place_ids
+
+
+async def select_places(
+    db: AsyncSession,
+    category: Optional[str],
+    search: Optional[str],
+    tag: Optional[str],
+    limit: Optional[int],
+    offset: int,
+    sort: str,
+    area: Optional[Area] = None
+) -> List[PlaceResponse]:
+    """Карточки мест для списка: рекомендации, каталог или полнотекстовый поиск."""
+    area = area or Area()
+    if not search and sort == "recommended":
+        preferences = Preferences(
+            categories={category: CATEGORY_WEIGHT} if category else {},
+            tags={tag: TAG_WEIGHT} if tag else {}
+        )
+        k = limit if limit is not None else SEARCH_LIMIT
+        places = recommender.recommend(
+            preferences, k=k, category=category, offset=offset, place_ids=candidate_ids(tag, area)
+        )
+        return with_distance(places, area.near)
+
+    # Фильтрация и сортировка по рейтингу или расстоянию выполняются по in-memory индексу
+    if not search:
+        return catalog_index.query(
+            category=category, tag=tag, limit=limit, offset=offset,
+            near=area.near, radius_km=area.radius_km, bbox=area.bbox, order=sort
+        )
+
+    if not search_supported(db):
+        needle = search.strip().lower()
+        places = [
+            p for p in catalog_index.query(
+                category=category, tag=tag,
+                near=area.near, radius_km=area.radius_km, bbox=area.bbox, order=sort
+            )
+            if needle in p.name.lower() or needle in p.description.lower()
+        ]
+        end = offset + limit if limit is not None else None
+        return places[offset:end]
+
+    # Полнотекстовый поиск: ранжирование BM25; категория, тег и область
+    # (id мест из индекса каталога) - в том же запросе
+    limit = limit if limit is not None else SEARCH_LIMIT
+    place_ids = candidate_ids(tag, area)
+    by_distance = sort == "distance" and area.near is not None
+    if by_distance:
+        # Порядок по расстоянию: все совпадения, страница - после сортировки
+        hits = await search_places(db, search, category=category, limit=None, offset=0, place_ids=place_ids)
+    else:
+        hits = await search_places(db, search, category=category, limit=limit, offset=offset, place_ids=place_ids)
+    places = []
+    for hit in hits:
+        place = catalog_index.get(hit.place_id)
+        if place is not None:
+            places.append(place.model_copy(update={"snippet": hit.snippet}))
+    places = with_distance(places, area.near)
+    if by_distance:
+        # Как и в каталоге, по расстоянию упорядочиваются только места с координатами
+        places = sorted((p for p in places if p.distanceKm is not None), key=lambda p: p.distanceKm)
+        places = places[offset:offset + limit]
+    return places
 
 
 @router.get("/{place_id}", response_model=PlaceResponse)
-async def get_place(place_id: int):
+async def get_place(place_id: int, db: AsyncSession = Depends(get_async_db)):
     """
-    Получение информации о конкретном месте.
+    Получение информации о конкретном месте со сводкой отзывов.
     UGC: событие просмотра карточки места.
     """
-    # TODO: Реализовать получение из БД
-    raise HTTPException(status_code=501, detail="В разработке")
+    place = catalog_index.get(place_id)
+    if not place:
+        raise HTTPException(status_code=404, detail="Место не найдено")
+    summary = await get_summary(db, place_id)
+    return place.model_copy(update={"summary": summary}) if summary else place
 
 
 @router.post("/", response_model=dict)
-async def create_place(data: PlaceCreate):
+def create_place(
+    data: PlaceCreate,
+    db: Session = Depends(get_db),
+    admin: Principal = Depends(get_current_admin)
+):
     """
     Создание нового места (только admin).
     UGC: событие добавления нового места администратором.
     """
-    # TODO: Реализовать сохранение в БД
-    return {"success": False, "error": "В разработке"}
+    place = Place(
+        name=data.name,
+        category=data.category,
+        description=data.description,
+        image=data.image,
+        tags=data.tags,
+        latitude=data.latitude,
+        longitude=data.longitude
+    )
+    db.add(place)
+    db.flush()
+    index_place(db, place)
+    db.commit()
+    db.refresh(place)
+
+    response = place_to_response(place)
+    catalog_index.upsert(response)
+    semantic_index.upsert(response)
+    response_cache.invalidate_places([place.id])
+
+    return {"success": True, "id": place.id}
 
 
 @router.put("/{place_id}", response_model=dict)
-async def update_place(place_id: int, data: PlaceCreate):
+def update_place(
+    place_id: int,
+    data: PlaceCreate,
+    db: Session = Depends(get_db),
+    admin: Principal = Depends(get_current_admin)
+):
     """
     Обновление информации о месте (только admin).
     UGC: событие редактирования места администратором.
     """
-    # TODO: Реализовать обновление в БД
-    return {"success": False, "error": "В разработке"}
+    place = db.query(Place).filter(Place.id == place_id).first()
+    if not place:
+        raise HTTPException(status_code=404, detail="Место не найдено")
+
+    place.name = data.name
+    place.category = data.category
+    place.description = data.description
+    place.image = data.image
+    place.tags = data.tags
+    place.latitude = data.latitude
+    place.longitude = data.longitude
+    index_place(db, place)
+
+    db.commit()
+    db.refresh(place)
+
+    response = place_to_response(place)
+    catalog_index.upsert(response)
+    semantic_index.upsert(response)
+    response_cache.invalidate_places([place.id])
+
+    return {"success": True, "id": place.id}
+
+
+@router.post("/{place_id}/image", response_model=dict)
+def upload_place_image(
+    place_id: int,
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    admin: Principal = Depends(get_current_admin)
+):
+    """
+    Загрузка изображения места (только admin).
+    Оригинал сохраняется по хэшу содержимого, превью строятся в фоне;
+    в ответе - URL превью всех размеров.
+    """
+    place = db.query(Place).filter(Place.id == place_id).first()
+    if not place:
+        raise HTTPException(status_code=404, detail="Место не найдено")
+
+    data = file.file.read(MAX_IMAGE_BYTES + 1)
+    try:
+        place.image_file = store_original(data)
+    except InvalidImage as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    db.commit()
+    db.refresh(place)
+    thumbnailer.submit(place.image_file)
+
+    response = place_to_response(place)
+    catalog_index.upsert(response)
+    response_cache.invalidate_places([place.id])
+
+    return {"success": True, "id": place.id, "images": response.images}
 
 
 @router.delete("/{place_id}", response_model=dict)
-async def delete_place(place_id: int):
+def delete_place(
+    place_id: int,
+    db: Session = Depends(get_db),
+    admin: Principal = Depends(get_current_admin)
+):
     """
     Удаление места (только admin).
     UGC: событие удаления места администратором.
     """
-    # TODO: Реализовать удаление из БД
-    return {"success": False, "error": "В разработке"}
+    place = db.query(Place).filter(Place.id == place_id).first()
+    if not place:
+        raise HTTPException(status_code=404, detail="Место не найдено")
+
+    db.delete(place)
+    unindex_place(db, place_id)
+    db.commit()
+
+    catalog_index.remove(place_id)
+    semantic_index.remove(place_id)
+    response_cache.invalidate_places([place_id])
+
+    return {"success": True}
@@ -1,14 +1,35 @@
-from fastapi import APIRouter, HTTPException
-from typing import List, Optional
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Iterable, List, Optional
+from pydantic import BaseModel, Field, TypeAdapter
+
+from app.database import get_async_db
+from app.dependencies import get_current_user
+from app.models.place import Place
+from app.models.review import Review, ReviewStatus
+from app.models.user import User
+from app.responses import model_response, trusted
+from app.schemas.auth import Role
+from app.schemas.reviews import ReviewCreate
+from app.services.catalog_index import catalog_index, place_to_response
+from app.services.moderation_stats import PENDING_REVIEWS, add_report, counter_delta, drop_reports
+from app.services.place_stats import review_delta
+from app.services.premoderation import premoderator, Submission
+from app.services.response_cache import response_cache
+from app.services.tokens import Principal
 
 router = APIRouter(prefix="/api/reviews", tags=["reviews"])
 
+# Статус нового отзыва по решению премодерации (escalate - в очередь)
+PREMODERATION_STATUSES = {
+    "approve": ReviewStatus.APPROVED,
+    "reject": ReviewStatus.REJECTED,
+}
 
-class ReviewCreate(BaseModel):
-    place_id: int
-    rating: int
-    text: str
+
+class ReportCreate(BaseModel):
+    reason: str = Field(min_length=1, max_length=500)
 
 
 class ReviewResponse(BaseModel):
@@ -23,41 +44,172 @@ class ReviewResponse(BaseModel):
     status: str  # pending, approved, rejected
 
 
+REVIEW_LIST = TypeAdapter(List[ReviewResponse])
+
+
+async def refresh_place_in_index(db: AsyncSession, place_id: int) -> None:
+    """
+    Перечитать место после изменения агрегатов и обновить индекс каталога.
+    Кэшированные ответы места и его отзывов сбрасываются.
+    """
+    place = await db.get(Place, place_id, populate_existing=True)
+    if place:
+        catalog_index.upsert(place_to_response(place))
+    response_cache.invalidate_places([place_id])
+
+
+async def refresh_places_in_index(db: AsyncSession, place_ids: Iterable[int]) -> None:
+    """То же для многих мест одним запросом."""
+    place_ids = list(place_ids)
+    if not place_ids:
+        return
+    places = (await db.execute(
+        select(Place).where(Place.id.in_(place_ids)).execution_options(populate_existing=True)
+    )).scalars()
+    for place in places:
+        catalog_index.upsert(place_to_response(place))
+    response_cache.invalidate_places(place_ids)
+
+
 @router.get("/", response_model=List[ReviewResponse])
-async def get_reviews(place_id: Optional[int] = None):
+async def get_reviews(
+    request: Request,
+    place_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
     """
     Получение отзывов (опционально по месту).
     UGC: событие просмотра отзывов.
     """
-    # TODO: Реализовать получение из БД
-    return []
+    query = (
+        select(Review, User.name, Place.name)
+        .join(User, User.id == Review.user_id)
+        .join(Place, Place.id == Review.place_id)
+        .where(Review.status == ReviewStatus.APPROVED)
+        .order_by(Review.id.desc())
+    )
+    if place_id is not None:
+        query = query.where(Review.place_id == place_id)
+
+    rows = (await db.execute(query)).all()
+
+    reviews = [
+        trusted(
+            ReviewResponse, review,
+            user_name=user_name,
+            place_name=place_name,
+            date=review.created_at.strftime("%d.%m.%Y") if review.created_at else "",
+            status=review.status.value
+        ) for review, user_name, place_name in rows
+    ]
+    return model_response(reviews, REVIEW_LIST, request)
 
 
 @router.post("/", response_model=dict)
-async def create_review(data: ReviewCreate):
+async def create_review(
+    data: ReviewCreate,
+    db: AsyncSession = Depends(get_async_db),
+    user: Principal = Depends(get_current_user)
+):
     """
     Создание нового отзыва.
     UGC: событие публикации отзыва пользователем.
     """
-    # TODO: Реализовать сохранение в БД (со статусом pending)
-    return {"success": False, "error": "В разработке"}
+    if not await db.get(Place, data.place_id):
+        raise HTTPException(status_code=404, detail="Место не найдено")
+
+    # Премодерация: явные нарушения отклоняются, чистые отзывы одобряются,
+    # остальные попадают в очередь модерации и не влияют на рейтинг
+    decision = premoderator.score(Submission(user_id=user.id, text=data.text)) if premoderator.enabled else None
+    status = ReviewStatus.PENDING
+    if decision is not None and premoderator.enforced:
+        status = PREMODERATION_STATUSES.get(decision.action, ReviewStatus.PENDING)
+
+    review = Review(
+        user_id=user.id,
+        place_id=data.place_id,
+        rating=data.rating,
+        text=data.text,
+        status=status
+    )
+    db.add(review)
+    await db.flush()
+    if decision is not None:
+        db.add(premoderator.record(review.id, decision))
+    if status == ReviewStatus.APPROVED:
+        await db.execute(review_delta(review.place_id, review.rating, 1))
+    elif status == ReviewStatus.PENDING:
+        await db.execute(counter_delta(PENDING_REVIEWS, 1))
+    await db.commit()
+
+    if status == ReviewStatus.APPROVED:
+        await refresh_place_in_index(db, review.place_id)
+
+    return {"success": True, "id": review.id, "status": review.status.value}
 
 
 @router.delete("/{review_id}", response_model=dict)
-async def delete_review(review_id: int):
+async def delete_review(
+    review_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    user: Principal = Depends(get_current_user)
+):
     """
     Удаление отзыва (автор или модератор).
     UGC: событие удаления отзыва.
     """
-    # TODO: Реализовать удаление из БД
-    return {"success": False, "error": "В разработке"}
+    review = await db.get(Review, review_id)
+    if not review:
+        raise HTTPException(status_code=404, detail="Отзыв не найден")
+
+    if review.user_id != user.id and user.role not in (Role.MODERATOR, Role.ADMIN):
+        raise HTTPException(status_code=403, detail="Доступ запрещён")
+
+    # Жалобы удаляются в той же транзакции; сам отзыв удаляется условно
+    # (DELETE ... RETURNING): при одновременном удалении агрегаты и счётчик
+    # очереди меняет только транзакция, которая действительно удалила строку
+    await drop_reports(db, review_id)
+    deleted = (await db.execute(
+        delete(Review).where(Review.id == review_id)
+        .returning(Review.status, Review.place_id, Review.rating)
+        .execution_options(synchronize_session=False)
+    )).first()
+    if deleted is None:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Отзыв не найден")
+
+    # Одобренный отзыв вычитается из агрегатов места, ожидающий - из счётчика очереди
+    was_approved = deleted.status == ReviewStatus.APPROVED
+    if was_approved:
+        await db.execute(review_delta(deleted.place_id, deleted.rating, -1))
+    elif deleted.status == ReviewStatus.PENDING:
+        await db.execute(counter_delta(PENDING_REVIEWS, -1))
+    await db.commit()
+
+    if was_approved:
+        await refresh_place_in_index(db, deleted.place_id)
+
+    return {"success": True}
 
 
 @router.post("/{review_id}/report", response_model=dict)
-async def report_review(review_id: int, reason: str):
+async def report_review(
+    review_id: int,
+    data: ReportCreate,
+    db: AsyncSession = Depends(get_async_db),
+    user: Principal = Depends(get_current_user)
+):
     """
-    Жалоба на отзыв.
+    Жалоба на отзыв. Жалобы на один отзыв сводятся в одну запись
+    с числом жалоб и различными причинами.
     UGC: событие отправки жалобы на отзыв.
     """
-    # TODO: Реализовать создание жалобы в БД
-    return {"success": False, "error": "В разработке"}
+    review = await db.get(Review, review_id)
+    if not review:
+        raise HTTPException(status_code=404, detail="Отзыв не найден")
+
+    if not await add_report(db, review, user.id, data.reason):
+        return {"success": False, "error": "Вы уже пожаловались на этот отзыв"}
+    await db.commit()
+
+    return {"success": True}
@@ -57,6 +57,7 @@ class UserUpdate(BaseModel):
 
 
 class UserListResponse(BaseModel):
-    """Список пользователей."""
+    """Страница списка пользователей."""
     users: list[UserResponse]
-    total: int
+    total: Optional[int] = None
+    next_after_id: Optional[int] = None
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field
+from typing import Optional, List, Tuple
 from datetime import datetime
 
 
@@ -11,6 +11,9 @@ class Place(BaseModel):
     description: str
     image: str
     tags: Optional[List[str]] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    distanceKm: Optional[float] = None
 
 
 class ChatMessage(BaseModel):
@@ -23,6 +26,14 @@ class ChatMessage(BaseModel):
 
 class ChatRequest(BaseModel):
     message: str
+    # Местоположение пользователя: места подбираются среди ближайших
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
+
+    def location(self) -> Optional[Tuple[float, float]]:
+        if self.latitude is None or self.longitude is None:
+            return None
+        return self.latitude, self.longitude
 
 
 class ChatResponse(BaseModel):
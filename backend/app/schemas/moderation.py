@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List
 from datetime import datetime
 
@@ -10,14 +10,21 @@ class Review(BaseModel):
     rating: int
     text: str
     date: str
+    reports: int = 0
+    # Окончание аренды отзыва текущим модератором
+    lease_expires: Optional[str] = None
 
 
 class Report(BaseModel):
     id: int
     type: str
     content: str
+    # Первый пожаловавшийся; всего жалоб - count
     reporter: str
     date: str
+    review_id: int
+    count: int = 1
+    reasons: List[str] = []
 
 
 class UserInfo(BaseModel):
@@ -35,12 +42,15 @@ class ModerationStats(BaseModel):
 class ReviewsListResponse(BaseModel):
     success: bool
     reviews: List[Review] = []
+    # Курсор следующей страницы очереди (None - страница последняя)
+    next_cursor: Optional[str] = None
     error: Optional[str] = None
 
 
 class ReportsListResponse(BaseModel):
     success: bool
     reports: List[Report] = []
+    next_cursor: Optional[str] = None
     error: Optional[str] = None
 
 
@@ -54,6 +64,19 @@ class ModerationActionRequest(BaseModel):
     action: str  # "approve" or "reject"
 
 
+class BulkModerationRequest(BaseModel):
+    review_ids: List[int] = Field(min_length=1, max_length=1000)
+    action: str  # "approve" or "reject"
+
+
+class BulkModerationResponse(BaseModel):
+    success: bool
+    processed: int = 0
+    # Несуществующие или арендованные другим модератором отзывы
+    skipped: List[int] = []
+    error: Optional[str] = None
+
+
 class ModerationActionResponse(BaseModel):
     success: bool
     message: Optional[str] = None
@@ -0,0 +1,40 @@
+from pydantic import BaseModel, Field, model_validator
+from typing import Dict, Optional, List
+
+
+class PlaceResponse(BaseModel):
+    id: int
+    name: str
+    category: str
+    rating: float
+    reviewsCount: int
+    description: str
+    # URL превью для карточки, если у места загружено изображение
+    image: str
+    tags: Optional[List[str]] = None
+    # URL превью всех размеров (small, medium, large) и оригинала
+    images: Optional[Dict[str, str]] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    # Расстояние до точки near в км (только в запросах по местоположению)
+    distanceKm: Optional[float] = None
+    # Фрагмент текста с подсветкой совпадений (только в результатах поиска)
+    snippet: Optional[str] = None
+    # Сводка отзывов от LLM (только в карточке места)
+    summary: Optional[str] = None
+
+
+class PlaceCreate(BaseModel):
+    name: str
+    category: str
+    description: str
+    image: str
+    tags: Optional[List[str]] = None
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
+
+    @model_validator(mode="after")
+    def require_both_coordinates(self) -> "PlaceCreate":
+        if (self.latitude is None) != (self.longitude is None):
+            raise ValueError("latitude и longitude задаются вместе")
+        return self
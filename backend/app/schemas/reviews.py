@@ -0,0 +1,7 @@
+from pydantic import BaseModel, Field
+
+
+class ReviewCreate(BaseModel):
+    place_id: int
+    rating: int = Field(ge=1, le=5)
+    text: str
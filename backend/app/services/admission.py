@@ -0,0 +1,221 @@
+"""
+Контроль допуска запросов к LLM в чате.
+
+Два уровня:
+- token bucket на пользователя (по id аутентифицированного Principal):
+  скорость и запас сообщений задаются политикой роли; при пустом ведре
+  запрос сразу отклоняется с Retry-After до появления следующего токена;
+- глобальный семафор на вызовы LLM с ограниченной очередью ожидания.
+  Время ожидания оценивается по скользящему среднему длительности
+  вызова; если оценка больше допустимого для роли ожидания, запрос
+  отбрасывается сразу, не занимая места в очереди. Дождавшийся своего
+  срока запрос тоже отклоняется.
+Отказ - исключение AdmissionRejected, роутер отвечает 429 с Retry-After.
+
+Ведро - пара (токены, время) в OrderedDict по времени последнего
+обращения: проверка стоит O(1) и не зависит от числа пользователей.
+Ведро, простоявшее дольше полного пополнения, равно новому и удаляется
+при очередной проверке (просмотр только с головы словаря).
+
+Политики ролей: ADMISSION_<ROLE>="скорость,запас,ожидание", например
+ADMISSION_USER="0.2,5,10" - 0.2 сообщения в секунду, до 5 подряд,
+не более 10 секунд в очереди.
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Optional
+
+from app.schemas.auth import Role
+from app.services.tokens import Principal
+
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+LLM_QUEUE_SIZE = int(os.getenv("LLM_QUEUE_SIZE", str(4 * LLM_CONCURRENCY)))
+# Начальная оценка длительности вызова LLM, с
+INITIAL_CALL_SECONDS = 2.0
+# Вес нового замера в скользящем среднем
+EWMA_ALPHA = 0.2
+
+
+@dataclass(frozen=True)
+class RolePolicy:
+    rate: float  # сообщений в секунду
+    burst: int  # ёмкость ведра
+    max_wait: float  # допустимое ожидание в очереди, с
+
+    @property
+    def refill_seconds(self) -> float:
+        return self.burst / self.rate
+
+
+DEFAULT_POLICIES = {
+    Role.USER: RolePolicy(rate=0.2, burst=5, max_wait=10.0),
+    Role.MODERATOR: RolePolicy(rate=0.5, burst=10, max_wait=15.0),
+    Role.ADMIN: RolePolicy(rate=2.0, burst=20, max_wait=30.0),
+}
+
+
+def load_policies() -> Dict[Role, RolePolicy]:
+    policies = dict(DEFAULT_POLICIES)
+    for role in Role:
+        raw = os.getenv(f"ADMISSION_{role.name}")
+        if raw:
+            rate, burst, max_wait = raw.split(",")
+            policies[role] = RolePolicy(float(rate), int(burst), float(max_wait))
+    return policies
+
+
+class AdmissionRejected(Exception):
+    """Запрос не допущен; повторить через retry_after секунд."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class Permit:
+    """Место в глобальном семафоре; release() идемпотентен."""
+
+    def __init__(self, controller: "AdmissionController"):
+        self._controller = controller
+        self._started = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._controller._release(time.monotonic() - self._started)
+
+    async def __aenter__(self) -> "Permit":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.release()
+
+
+class AdmissionController:
+    """Ведра пользователей и семафор вызовов LLM с очередью (в рамках одного event loop)."""
+
+    def __init__(
+        self,
+        policies: Optional[Dict[Role, RolePolicy]] = None,
+        concurrency: int = LLM_CONCURRENCY,
+        queue_size: int = LLM_QUEUE_SIZE
+    ):
+        self.policies = policies or load_policies()
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.in_flight = 0
+        self.call_seconds = INITIAL_CALL_SECONDS
+        # user_id -> [токены, время обновления], от давних к недавним
+        self._buckets: "OrderedDict[int, list]" = OrderedDict()
+        self._idle_seconds = max(p.refill_seconds for p in self.policies.values())
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.stats_counters = {"admitted": 0, "rate_limited": 0, "queue_full": 0, "shed": 0, "timed_out": 0}
+
+    def policy(self, principal: Principal) -> RolePolicy:
+        return self.policies.get(principal.role, self.policies[Role.USER])
+
+    def check_rate(self, principal: Principal) -> None:
+        """Списание токена из ведра пользователя или AdmissionRejected."""
+        policy = self.policy(principal)
+        now = time.monotonic()
+        self._evict_idle(now)
+
+        bucket = self._buckets.get(principal.id)
+        if bucket is None:
+            bucket = self._buckets[principal.id] = [float(policy.burst), now]
+        else:
+            self._buckets.move_to_end(principal.id)
+            bucket[0] = min(policy.burst, bucket[0] + (now - bucket[1]) * policy.rate)
+            bucket[1] = now
+
+        if bucket[0] < 1.0:
+            self.stats_counters["rate_limited"] += 1
+            raise AdmissionRejected("rate", (1.0 - bucket[0]) / policy.rate)
+        bucket[0] -= 1.0
+
+    def _evict_idle(self, now: float) -> None:
+        buckets = self._buckets
+        while buckets:
+            user_id, (_, updated) = next(iter(buckets.items()))
+            if now - updated < self._idle_seconds:
+                break
+            del buckets[user_id]
+
+    def estimated_wait(self, position: int) -> float:
+        """Ожидание для позиции в очереди (1 - первый) при текущей длительности вызовов."""
+        return math.ceil(position / self.concurrency) * self.call_seconds
+
+    async def acquire(self, principal: Principal) -> Permit:
+        """Место для вызова LLM: сразу, после ожидания в очереди или AdmissionRejected."""
+        if self.in_flight < self.concurrency and not self._waiters:
+            self.in_flight += 1
+            self.stats_counters["admitted"] += 1
+            return Permit(self)
+
+        position = len(self._waiters) + 1
+        wait = self.estimated_wait(position)
+        if len(self._waiters) >= self.queue_size:
+            self.stats_counters["queue_full"] += 1
+            raise AdmissionRejected("queue_full", wait)
+        max_wait = self.policy(principal).max_wait
+        if wait > max_wait:
+            self.stats_counters["shed"] += 1
+            raise AdmissionRejected("shed", wait)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout=max_wait)
+        except asyncio.TimeoutError:
+            self._abandon(waiter)
+            self.stats_counters["timed_out"] += 1
+            raise AdmissionRejected("timed_out", self.estimated_wait(len(self._waiters) + 1))
+        except BaseException:
+            # Клиент ушёл, пока запрос ждал в очереди
+            self._abandon(waiter)
+            raise
+        self.stats_counters["admitted"] += 1
+        return Permit(self)
+
+    def _abandon(self, waiter: asyncio.Future) -> None:
+        if waiter.done() and not waiter.cancelled():
+            # Место уже было передано этому запросу - передаётся дальше
+            self._hand_off()
+            return
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def _release(self, seconds: float) -> None:
+        self.call_seconds += EWMA_ALPHA * (seconds - self.call_seconds)
+        self._hand_off()
+
+    def _hand_off(self) -> None:
+        # Место передаётся первому живому ожидающему, in_flight не меняется
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            **self.stats_counters,
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "buckets": len(self._buckets),
+            "call_seconds": round(self.call_seconds, 3),
+        }
+
+
+# Общий контроллер процесса
+admission = AdmissionController()
@@ -0,0 +1,441 @@
+"""
+Массовый импорт и экспорт мест, отзывов и пользователей (JSONL и CSV).
+
+Импорт - потоковый конвейер:
+    read_rows -> validate -> batches -> write_chunk
+- строки читаются из файла по одной, в памяти только текущая пачка
+  (chunk_size строк);
+- каждая строка проверяется схемой API (PlaceCreate, ReviewCreate,
+  UserBase) с дополнительными полями выгрузки; некорректные строки и
+  отзывы с несуществующими местом или автором пропускаются и попадают
+  в отчёт с номером строки;
+- пачка записывается executemany INSERT ... ON CONFLICT DO UPDATE в
+  одной транзакции: строки с id обновляют существующие записи, без id -
+  добавляются, пользователи сопоставляются по email. На SQLite SQL
+  компилируется один раз и выполняется курсором драйвера, без разбора
+  параметров SQLAlchemy на каждую строку. Пачка, нарушившая
+  ограничение БД, откатывается целиком и попадает в отчёт;
+- индекс поиска, агрегаты рейтинга мест и счётчики модерации во время
+  записи не обновляются и пересчитываются один раз в конце (finalize).
+In-memory индексы процесса (каталог, векторный индекс, кэши) обновляет
+вызывающий код: эндпоинт администратора - сразу, CLI bulk_data.py -
+при следующем запуске приложения.
+
+Экспорт - keyset-чтение по id пачками, память не зависит от объёма.
+Колонки выгрузки совпадают с колонками загрузки, поэтому выгрузка мест
+и отзывов загружается обратно без изменений. Хэши паролей пользователей
+выгружаются только по явному запросу (with_hashes), а загрузка
+пользователя требует password или hashed_password: загрузить обратно
+можно только выгрузку пользователей с with_hashes.
+
+CSV: первая строка - заголовок, пустая ячейка - значение по умолчанию,
+списки (теги) - через "|".
+"""
+
+import csv
+import io
+import time
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from itertools import islice
+from operator import attrgetter, itemgetter
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, TextIO, Tuple, Type, Union
+
+import orjson
+from pydantic import BaseModel, ValidationError, field_validator, model_validator
+from sqlalchemy import Table, func, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Dialect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.place import Place
+from app.models.review import Review, ReviewStatus
+from app.models.user import User
+from app.schemas.auth import Role, UserBase
+from app.schemas.places import PlaceCreate
+from app.schemas.reviews import ReviewCreate
+from app.services.images import ORIGINAL_NAME
+from app.services.moderation_stats import rebuild_counters
+from app.services.passwords import password_hasher
+from app.services.place_stats import rebuild_place_stats
+from app.services.search_index import rebuild_search_index
+
+FORMATS = ("jsonl", "csv")
+CHUNK_SIZE = 50_000
+EXPORT_CHUNK_SIZE = 5000
+# Сколько ошибок строк сохраняется в отчёте (считаются все)
+MAX_ERRORS = 100
+LIST_SEPARATOR = "|"
+
+DIALECT_INSERTS = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
+
+
+class PlaceRow(PlaceCreate):
+    id: Optional[int] = None
+    # Имя загруженного оригинала изображения (app.services.images)
+    image_file: Optional[str] = None
+
+    @field_validator("image_file")
+    @classmethod
+    def check_image_file(cls, value: Optional[str]) -> Optional[str]:
+        if value is not None and not ORIGINAL_NAME.match(value):
+            raise ValueError("ожидается имя файла <sha256>.<расширение>")
+        return value
+
+
+class ReviewRow(ReviewCreate):
+    id: Optional[int] = None
+    user_id: int
+    status: ReviewStatus = ReviewStatus.PENDING
+
+
+class UserRow(UserBase):
+    id: Optional[int] = None
+    role: Role = Role.USER
+    password: Optional[str] = None
+    hashed_password: Optional[str] = None
+
+    @model_validator(mode="after")
+    def require_password(self) -> "UserRow":
+        if not self.password and not self.hashed_password:
+            raise ValueError("нужен password или hashed_password")
+        return self
+
+
+@dataclass(frozen=True)
+class Entity:
+    """Загружаемая сущность: таблица, схема строки и колонки файла."""
+    name: str
+    table: Table
+    schema: Type[BaseModel]
+    columns: Tuple[str, ...]
+    # Колонка сопоставления с существующими записями (ON CONFLICT)
+    conflict: str = "id"
+    list_columns: Tuple[str, ...] = ()
+
+
+ENTITIES: Dict[str, Entity] = {
+    "places": Entity(
+        "places", Place.__table__, PlaceRow,
+        ("id", "name", "category", "description", "image", "image_file", "tags", "latitude", "longitude"),
+        list_columns=("tags",)
+    ),
+    "reviews": Entity(
+        "reviews", Review.__table__, ReviewRow,
+        ("id", "user_id", "place_id", "rating", "text", "status")
+    ),
+    "users": Entity(
+        "users", User.__table__, UserRow,
+        ("id", "email", "name", "role"), conflict="email"
+    ),
+}
+
+
+@dataclass
+class BulkReport:
+    entity: str
+    rows: int = 0
+    written: int = 0
+    invalid: int = 0
+    failed_chunks: int = 0
+    errors: List[str] = field(default_factory=list)
+    seconds: float = 0.0
+
+    def error(self, line: int, message: str) -> None:
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append(f"строка {line}: {message}")
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+# --- Чтение ---
+
+def read_rows(stream: TextIO, fmt: str, entity: Entity) -> Iterator[Tuple[int, Union[dict, str]]]:
+    """(номер строки, словарь полей CSV или текст строки JSONL)."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for raw in reader:
+            row = {}
+            for key, value in raw.items():
+                if key is None or value is None or value == "":
+                    continue
+                row[key] = value.split(LIST_SEPARATOR) if key in entity.list_columns else value
+            yield reader.line_num, row
+        return
+
+    # Строка JSONL не разбирается здесь: её JSON проверяет сама схема
+    # (model_validate_json), без промежуточного словаря
+    for line, content in enumerate(stream, start=1):
+        if content.strip():
+            yield line, content
+
+
+def validation_message(exc: ValidationError) -> str:
+    error = exc.errors()[0]
+    location = ".".join(str(part) for part in error["loc"])
+    return f"{location}: {error['msg']}" if location else error["msg"]
+
+
+def reference_check(db: Session, entity: Entity) -> Callable[[BaseModel], Optional[str]]:
+    """Проверка ссылок строки; для отзывов - по множествам id мест и авторов."""
+    if entity.name != "reviews":
+        return lambda row: None
+    place_ids = set(db.scalars(select(Place.id)))
+    user_ids = set(db.scalars(select(User.id)))
+
+    def check(row: ReviewRow) -> Optional[str]:
+        if row.place_id not in place_ids:
+            return f"место {row.place_id} не найдено"
+        if row.user_id not in user_ids:
+            return f"пользователь {row.user_id} не найден"
+        return None
+
+    return check
+
+
+def validate(
+    rows: Iterable[Tuple[int, Union[dict, str]]],
+    entity: Entity,
+    check: Callable[[BaseModel], Optional[str]],
+    report: BulkReport
+) -> Iterator[Tuple[int, BaseModel]]:
+    schema = entity.schema
+    for line, raw in rows:
+        report.rows += 1
+        try:
+            row = schema.model_validate_json(raw) if isinstance(raw, str) else schema.model_validate(raw)
+        except ValidationError as exc:
+            report.invalid += 1
+            report.error(line, validation_message(exc))
+            continue
+        problem = check(row)
+        if problem:
+            report.invalid += 1
+            report.error(line, problem)
+            continue
+        yield line, row
+
+
+def batches(items: Iterable, size: int) -> Iterator[List]:
+    items = iter(items)
+    while batch := list(islice(items, size)):
+        yield batch
+
+
+# --- Запись ---
+
+def to_params(entity: Entity, rows: List[BaseModel]) -> List[dict]:
+    """Параметры executemany; пароли пользователей хэшируются пачкой в пуле bcrypt."""
+    if entity.name == "users":
+        plain = [row.password for row in rows if not row.hashed_password]
+        hashes = iter(password_hasher.hash_many(plain) if plain else [])
+        params = []
+        for row in rows:
+            item = {
+                "email": row.email.lower(), "name": row.name, "role": row.role,
+                "hashed_password": row.hashed_password or next(hashes),
+            }
+            if row.id is not None:
+                item["id"] = row.id
+            params.append(item)
+        return params
+
+    # Поля читаются одним attrgetter: model_dump на каждую строку заметно дороже
+    names = entity.columns
+    getter = attrgetter(*names)
+    params = []
+    for row in rows:
+        item = dict(zip(names, getter(row)))
+        if item["id"] is None:
+            del item["id"]
+        params.append(item)
+    return params
+
+
+def upsert_statement(dialect: str, entity: Entity, keys: Tuple[str, ...]):
+    """INSERT для строк без ключа сопоставления, иначе INSERT ... ON CONFLICT DO UPDATE."""
+    if dialect not in DIALECT_INSERTS:
+        raise ValueError(f"Массовая загрузка не поддерживается для {dialect}")
+    statement = DIALECT_INSERTS[dialect](entity.table)
+    if entity.conflict not in keys:
+        return statement
+    updated = {key: statement.excluded[key] for key in keys if key not in (entity.conflict, "id")}
+    # onupdate колонок не срабатывает в ON CONFLICT - задаётся явно
+    if "updated_at" in entity.table.c:
+        updated["updated_at"] = func.now()
+    return statement.on_conflict_do_update(index_elements=[entity.conflict], set_=updated)
+
+
+@lru_cache(maxsize=None)
+def compiled_upsert(dialect: Dialect, entity: Entity, keys: Tuple[str, ...]) -> Tuple[str, Callable[[dict], tuple]]:
+    """
+    SQL драйвера для upsert строк с колонками keys и функция, которая
+    строит кортеж параметров строки: значения колонок через bind-процессоры
+    типов и скалярные default остальных колонок модели. То же, что делает
+    SQLAlchemy на каждую строку в construct_params, но без разбора
+    выражения - на 1M строк это несколько секунд.
+    """
+    compiled = upsert_statement(dialect.name, entity, keys).compile(dialect=dialect, column_keys=list(keys))
+    defaults = {}
+    for column in compiled.insert_prefetch:
+        if not column.default.is_scalar:
+            raise ValueError(f"{entity.name}.{column.key}: поддерживаются только скалярные default")
+        defaults[column.key] = column.default.arg
+    names = compiled.positiontup
+    get = itemgetter(*names)
+    processors = [
+        (i, process) for i, name in enumerate(names)
+        if (process := compiled.binds[name].type.bind_processor(dialect)) is not None
+    ]
+
+    def build(params: dict) -> tuple:
+        values = get({**defaults, **params})
+        if not processors:
+            return values
+        values = list(values)
+        for i, process in processors:
+            values[i] = process(values[i])
+        return tuple(values)
+
+    return compiled.string, build
+
+
+def write_chunk(db: Session, entity: Entity, chunk: List[Tuple[int, BaseModel]], report: BulkReport) -> None:
+    """
+    Пачка в одной транзакции: executemany на каждую группу строк с одинаковым
+    набором колонок. На SQLite - готовым SQL через курсор драйвера
+    (exec_driver_sql), на PostgreSQL - через SQLAlchemy, который сам
+    собирает строки в многострочный VALUES.
+    """
+    groups: Dict[Tuple[str, ...], List[dict]] = {}
+    for params in to_params(entity, [row for _, row in chunk]):
+        groups.setdefault(tuple(params), []).append(params)
+    dialect = db.get_bind().dialect
+    try:
+        for keys, params in groups.items():
+            if dialect.name == "sqlite":
+                sql, build = compiled_upsert(dialect, entity, keys)
+                db.connection().exec_driver_sql(sql, [build(item) for item in params])
+            else:
+                db.execute(upsert_statement(dialect.name, entity, keys), params)
+        db.commit()
+    except IntegrityError as exc:
+        db.rollback()
+        report.failed_chunks += 1
+        report.error(chunk[0][0], f"пачка до строки {chunk[-1][0]} не записана: {exc.orig}")
+        return
+    report.written += len(chunk)
+
+
+def sync_sequence(db: Session, table: Table) -> None:
+    """PostgreSQL: последовательность id после вставки строк с явными id."""
+    db.execute(text(
+        f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+        f"coalesce((SELECT max(id) FROM {table.name}), 1))"
+    ))
+
+
+def finalize(db: Session, entity_names: Set[str]) -> None:
+    """Отложенные пересчёты после загрузки (с commit)."""
+    if "places" in entity_names:
+        rebuild_search_index(db)
+    if db.get_bind().dialect.name == "postgresql":
+        for name in entity_names:
+            sync_sequence(db, ENTITIES[name].table)
+    db.commit()
+    if "reviews" in entity_names:
+        rebuild_place_stats(db, fix=True)
+        rebuild_counters(db)
+
+
+def import_rows(
+    db: Session,
+    entity_name: str,
+    stream: TextIO,
+    fmt: str,
+    chunk_size: int = CHUNK_SIZE,
+    on_chunk: Optional[Callable[[BulkReport], None]] = None
+) -> BulkReport:
+    """Загрузка файла сущности entity_name; пересчёты - один раз в конце."""
+    entity = ENTITIES[entity_name]
+    started = time.perf_counter()
+    report = BulkReport(entity=entity.name)
+    rows = validate(read_rows(stream, fmt, entity), entity, reference_check(db, entity), report)
+    for chunk in batches(rows, chunk_size):
+        write_chunk(db, entity, chunk, report)
+        if on_chunk is not None:
+            on_chunk(report)
+    finalize(db, {entity.name})
+    report.seconds = round(time.perf_counter() - started, 3)
+    return report
+
+
+# --- Выгрузка ---
+
+def export_columns(entity: Entity, with_hashes: bool = False) -> Tuple[str, ...]:
+    if entity.name == "users" and with_hashes:
+        return entity.columns + ("hashed_password",)
+    return entity.columns
+
+
+def export_query(entity: Entity, after_id: Optional[int], limit: int, with_hashes: bool = False):
+    """Keyset-страница выгрузки по возрастанию id."""
+    table = entity.table
+    query = select(*(table.c[name] for name in export_columns(entity, with_hashes)))
+    if after_id is not None:
+        query = query.where(table.c.id > after_id)
+    return query.order_by(table.c.id).limit(limit)
+
+
+def export_chunks(db: Session, entity: Entity, chunk_size: int = EXPORT_CHUNK_SIZE, with_hashes: bool = False):
+    after_id = None
+    while True:
+        chunk = db.execute(export_query(entity, after_id, chunk_size, with_hashes)).all()
+        if not chunk:
+            return
+        yield chunk
+        after_id = chunk[-1].id
+
+
+def plain(value):
+    return value.value if isinstance(value, (Role, ReviewStatus)) else value
+
+
+def csv_header(entity: Entity, with_hashes: bool = False) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(export_columns(entity, with_hashes))
+    return buffer.getvalue()
+
+
+def encode_rows(entity: Entity, rows, fmt: str) -> str:
+    """Пачка строк выгрузки в JSONL или CSV (без заголовка)."""
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([
+                LIST_SEPARATOR.join(value or []) if name in entity.list_columns else plain(value)
+                for name, value in row._mapping.items()
+            ])
+        return buffer.getvalue()
+    return "".join(
+        orjson.dumps({name: plain(value) for name, value in row._mapping.items()}).decode() + "\n"
+        for row in rows
+    )
+
+
+def export_rows(db: Session, entity_name: str, out: TextIO, fmt: str, with_hashes: bool = False) -> int:
+    """Выгрузка сущности в файл; возвращает число строк."""
+    entity = ENTITIES[entity_name]
+    if fmt == "csv":
+        out.write(csv_header(entity, with_hashes))
+    count = 0
+    for chunk in export_chunks(db, entity, with_hashes=with_hashes):
+        out.write(encode_rows(entity, chunk, fmt))
+        count += len(chunk)
+    return count
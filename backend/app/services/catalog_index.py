@@ -0,0 +1,378 @@
+"""
+In-memory индекс каталога мест.
+
+Держит в памяти процесса:
+- карточки мест (PlaceResponse) по id;
+- инвертированные индексы категория -> id и тег -> id;
+- отсортированные по рейтингу списки id для каждой категории и для всего каталога;
+- пространственный индекс координат (GeoIndex): фильтры по радиусу и
+  прямоугольнику, ближайшие места.
+
+Индекс обновляется инкрементально из create/update/delete роутера мест,
+поэтому фильтрация и сортировка каталога не обращаются к таблице.
+"""
+
+import hashlib
+import heapq
+from bisect import bisect_left, insort
+from threading import RLock
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models.place import Place
+from app.schemas.places import PlaceResponse
+from app.services.geo_index import GeoIndex, haversine_km
+from app.services.images import CARD_SIZE, image_urls
+
+# Ключ posting-листа для всего каталога (без фильтра по категории)
+ALL = ""
+# Сколько последних изменённых id помнит журнал изменений (changes_since)
+JOURNAL_SIZE = 10_000
+# Поля карточки, которые меняются с каждым отзывом: не входят в content_version
+RATING_FIELDS = {"rating", "reviewsCount"}
+# Точка (широта, долгота) и прямоугольник (min_lat, min_lon, max_lat, max_lon)
+Point = Tuple[float, float]
+BBox = Tuple[float, float, float, float]
+
+
+def _norm(value: str) -> str:
+    return value.strip().lower()
+
+
+def _content(place: PlaceResponse) -> str:
+    """Карточка без рейтинга и числа отзывов."""
+    return place.model_dump_json(exclude=RATING_FIELDS)
+
+
+def place_to_response(place: Place) -> PlaceResponse:
+    """
+    Преобразование ORM-объекта места в карточку для API.
+    Без валидации: значения пришли из БД (см. app.responses.trusted).
+    Для загруженного изображения image - URL превью карточки.
+    """
+    images = image_urls(place.image_file) if place.image_file else None
+    return PlaceResponse.model_construct(
+        id=place.id,
+        name=place.name,
+        category=place.category,
+        rating=place.rating or 0.0,
+        reviewsCount=place.reviews_count or 0,
+        description=place.description,
+        image=images[CARD_SIZE] if images else place.image,
+        tags=place.tags,
+        images=images,
+        latitude=place.latitude,
+        longitude=place.longitude
+    )
+
+
+class CatalogIndex:
+    """Инвертированный индекс каталога с posting-листами по рейтингу."""
+
+    def __init__(self):
+        self._lock = RLock()
+        self._places: Dict[int, PlaceResponse] = {}
+        self._by_category: Dict[str, Set[int]] = {}
+        self._by_tag: Dict[str, Set[int]] = {}
+        # Списки ключей (-rating, id), отсортированные по возрастанию,
+        # т.е. по убыванию рейтинга
+        self._by_rating: Dict[str, List[Tuple[float, int]]] = {ALL: []}
+        self._geo = GeoIndex()
+        # Версия каталога: хэш содержимого после загрузки, далее
+        # цепочка хэшей изменений. Не совпадает между разными состояниями
+        # каталога, поэтому годится как часть ключа внешних кэшей.
+        self.version = hashlib.blake2b(digest_size=8).hexdigest()
+        # То же без рейтинга и числа отзывов: не меняется от каждого
+        # одобренного отзыва (ключ кэша ответов LLM)
+        self.content_version = self.version
+        # Журнал id изменённых мест; _journal_start - номер первой записи
+        self._journal: List[int] = []
+        self._journal_start = 0
+
+    def __len__(self) -> int:
+        return len(self._places)
+
+    def rebuild(self, db: Session) -> None:
+        """Полная загрузка индекса из БД (при старте приложения и после импорта)."""
+        places = [place_to_response(p) for p in db.query(Place).yield_per(1000)]
+        self.load(places)
+
+    def load(self, places: Iterable[PlaceResponse]) -> None:
+        """
+        Замена содержимого индекса. Новый индекс строится в стороне, под
+        блокировкой только подменяются ссылки: читатели без блокировки
+        (get) видят либо старый, либо новый каталог целиком.
+        """
+        fresh = CatalogIndex()
+        for place in places:
+            fresh._add(place, sort=False)
+        for postings in fresh._by_rating.values():
+            postings.sort()
+        digest = hashlib.blake2b(digest_size=8)
+        content_digest = hashlib.blake2b(digest_size=8)
+        for place_id in sorted(fresh._places):
+            place = fresh._places[place_id]
+            digest.update(place.model_dump_json().encode())
+            content_digest.update(_content(place).encode())
+        with self._lock:
+            self._places = fresh._places
+            self._by_category = fresh._by_category
+            self._by_tag = fresh._by_tag
+            self._by_rating = fresh._by_rating
+            self._geo = fresh._geo
+            self.version = digest.hexdigest()
+            self.content_version = content_digest.hexdigest()
+            # Прежние курсоры журнала становятся недействительными
+            self._journal_start += len(self._journal) + 1
+            self._journal = []
+
+    def get(self, place_id: int) -> Optional[PlaceResponse]:
+        return self._places.get(place_id)
+
+    def upsert(self, place: PlaceResponse) -> None:
+        """Добавление или обновление места в индексе."""
+        with self._lock:
+            old = self._places.get(place.id)
+            self._remove(place.id, geo=False)
+            self._add(place, sort=True)
+            self._bump_version("upsert", place.model_dump_json(), content=old is None or _content(old) != _content(place))
+            self._record(place.id)
+
+    def remove(self, place_id: int) -> None:
+        """Удаление места из индекса."""
+        with self._lock:
+            if self._remove(place_id):
+                self._bump_version("remove", str(place_id), content=True)
+                self._record(place_id)
+
+    @property
+    def journal_end(self) -> int:
+        """Курсор после последнего изменения (читается без блокировки)."""
+        return self._journal_start + len(self._journal)
+
+    def changes_since(self, cursor: int) -> Tuple[int, Optional[List[int]]]:
+        """
+        id мест, изменённых после курсора, и новый курсор. None вместо
+        списка - журнал не покрывает курсор (каталог перезагружен или
+        изменений слишком много), нужна полная перестройка.
+        """
+        with self._lock:
+            end = self.journal_end
+            if cursor < self._journal_start:
+                return end, None
+            return end, self._journal[cursor - self._journal_start:]
+
+    def _record(self, place_id: int) -> None:
+        self._journal.append(place_id)
+        if len(self._journal) > JOURNAL_SIZE:
+            half = len(self._journal) // 2
+            del self._journal[:half]
+            self._journal_start += half
+
+    def all(self) -> List[PlaceResponse]:
+        """Все места каталога в порядке id."""
+        with self._lock:
+            return [self._places[place_id] for place_id in sorted(self._places)]
+
+    def tagged(self, tag: str) -> Set[int]:
+        """id мест с тегом."""
+        with self._lock:
+            return set(self._by_tag.get(_norm(tag), ()))
+
+    def categories(self) -> List[str]:
+        return sorted(self._by_category)
+
+    def query(
+        self,
+        category: Optional[str] = None,
+        tag: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        near: Optional[Point] = None,
+        radius_km: Optional[float] = None,
+        bbox: Optional[BBox] = None,
+        order: str = "rating"
+    ) -> List[PlaceResponse]:
+        """
+        Места с фильтром по категории, тегу и области, по убыванию рейтинга
+        или (order="distance") по расстоянию до near.
+        Без фильтра по области обходит только posting-лист категории и
+        останавливается, набрав offset + limit подходящих мест.
+        С near у мест заполнено расстояние distanceKm.
+        """
+        with self._lock:
+            accept = self._filter(category, tag)
+            if accept is None:
+                return []
+            area = self.area(near, radius_km, bbox)
+
+            if order == "distance" and near is not None:
+                if area is not None:
+                    accept_area = lambda place_id: place_id in area and accept(place_id)
+                else:
+                    accept_area = accept
+                need = offset + limit if limit is not None else len(self._places)
+                hits = self._geo.nearest(near[0], near[1], need, accept_area)
+                return [
+                    self._places[place_id].model_copy(update={"distanceKm": round(distance, 3)})
+                    for place_id, distance in hits[offset:]
+                ]
+
+            postings = self._by_rating.get(_norm(category) if category else ALL, [])
+            if area is not None and len(area) < area_walk_cost(len(postings), len(area), offset, limit):
+                keys = ((-self._places[place_id].rating, place_id) for place_id in area if accept(place_id))
+                # Куча выгодна, только если нужна малая часть области
+                if limit is not None and (offset + limit) * 10 < len(area):
+                    postings = heapq.nsmallest(offset + limit, keys)
+                else:
+                    postings = sorted(keys)
+
+            result = []
+            skipped = 0
+            for _, place_id in postings:
+                if (area is not None and place_id not in area) or not accept(place_id):
+                    continue
+                if skipped < offset:
+                    skipped += 1
+                    continue
+                result.append(self._places[place_id])
+                if limit is not None and len(result) >= limit:
+                    break
+            return with_distance(result, near)
+
+    def area(
+        self,
+        near: Optional[Point] = None,
+        radius_km: Optional[float] = None,
+        bbox: Optional[BBox] = None
+    ) -> Optional[Set[int]]:
+        """id мест в радиусе от near и/или в прямоугольнике; None - область не задана."""
+        with self._lock:
+            area = None
+            if near is not None and radius_km is not None:
+                area = set(self._geo.within_radius(near[0], near[1], radius_km)[0].tolist())
+            if bbox is not None:
+                in_bbox = set(self._geo.within_bbox(*bbox).tolist())
+                area = in_bbox if area is None else area & in_bbox
+            return area
+
+    def nearest(
+        self,
+        latitude: float,
+        longitude: float,
+        k: int,
+        category: Optional[str] = None,
+        max_km: Optional[float] = None
+    ) -> List[PlaceResponse]:
+        """k ближайших мест (с distanceKm), опционально в категории и не дальше max_km."""
+        with self._lock:
+            accept = self._filter(category, None)
+            if accept is None:
+                return []
+            options = {"max_km": max_km} if max_km is not None else {}
+            return [
+                self._places[place_id].model_copy(update={"distanceKm": round(distance, 3)})
+                for place_id, distance in self._geo.nearest(latitude, longitude, k, accept, **options)
+            ]
+
+    def _filter(self, category: Optional[str], tag: Optional[str]):
+        """Проверка категории и тега по id места; None - под фильтр ничего не попадает."""
+        category_ids = tag_ids = None
+        if category:
+            category_ids = self._by_category.get(_norm(category))
+            if not category_ids:
+                return None
+        if tag:
+            tag_ids = self._by_tag.get(_norm(tag))
+            if not tag_ids:
+                return None
+        if category_ids is None and tag_ids is None:
+            return lambda place_id: True
+        return lambda place_id: (
+            (category_ids is None or place_id in category_ids)
+            and (tag_ids is None or place_id in tag_ids)
+        )
+
+    def _bump_version(self, op: str, payload: str, content: bool) -> None:
+        digest = hashlib.blake2b(self.version.encode(), digest_size=8)
+        digest.update(op.encode())
+        digest.update(payload.encode())
+        self.version = digest.hexdigest()
+        if content:
+            content_digest = hashlib.blake2b(self.content_version.encode(), digest_size=8)
+            content_digest.update(op.encode())
+            content_digest.update(payload.encode())
+            self.content_version = content_digest.hexdigest()
+
+    def _add(self, place: PlaceResponse, sort: bool) -> None:
+        category = _norm(place.category)
+        key = (-place.rating, place.id)
+        self._places[place.id] = place
+        self._by_category.setdefault(category, set()).add(place.id)
+        for tag in place.tags or []:
+            self._by_tag.setdefault(_norm(tag), set()).add(place.id)
+        self._geo.set(place.id, place.latitude, place.longitude)
+        for postings_key in (ALL, category):
+            postings = self._by_rating.setdefault(postings_key, [])
+            if sort:
+                insort(postings, key)
+            else:
+                postings.append(key)
+
+    def _remove(self, place_id: int, geo: bool = True) -> bool:
+        """Удаление из индексов; geo=False - координаты перезапишет следующий _add."""
+        place = self._places.pop(place_id, None)
+        if place is None:
+            return False
+        category = _norm(place.category)
+        key = (-place.rating, place.id)
+        _discard(self._by_category, category, place_id)
+        if geo:
+            self._geo.discard(place_id)
+        for tag in place.tags or []:
+            _discard(self._by_tag, _norm(tag), place_id)
+        for postings_key in (ALL, category):
+            postings = self._by_rating[postings_key]
+            pos = bisect_left(postings, key)
+            if pos < len(postings) and postings[pos] == key:
+                del postings[pos]
+            if postings_key != ALL and not postings:
+                del self._by_rating[postings_key]
+        return True
+
+
+def area_walk_cost(postings: int, area: int, offset: int, limit: Optional[int]) -> float:
+    """
+    Сколько элементов posting-листа придётся обойти, чтобы набрать
+    offset + limit мест области (при равномерном распределении).
+    Если это больше размера области, дешевле упорядочить саму область.
+    """
+    if limit is None:
+        return postings
+    return (offset + limit) * postings / max(area, 1)
+
+
+def with_distance(places: List[PlaceResponse], near: Optional[Point]) -> List[PlaceResponse]:
+    """Карточки с расстоянием до near (если точка задана и у места есть координаты)."""
+    if near is None:
+        return places
+    return [
+        place.model_copy(update={"distanceKm": round(float(
+            haversine_km(near[0], near[1], place.latitude, place.longitude)), 3)})
+        if place.latitude is not None else place
+        for place in places
+    ]
+
+
+def _discard(index: Dict[str, Set[int]], key: str, place_id: int) -> None:
+    ids = index.get(key)
+    if ids is None:
+        return
+    ids.discard(place_id)
+    if not ids:
+        del index[key]
+
+
+# Общий индекс процесса
+catalog_index = CatalogIndex()
@@ -0,0 +1,116 @@
+"""
+Хранилище истории чата.
+
+- append_message(): вставка сообщения в текущую версию диалога одним
+  INSERT (версия подставляется подзапросом);
+- get_history(): страница истории по курсору before_id;
+- get_context(): последние N реплик в пределах бюджета токенов для
+  промпта LLM - один запрос по индексу (user_id, version, id);
+- clear_history(): очистка через увеличение версии диалога.
+"""
+
+from typing import List, Optional
+
+from sqlalchemy import select, update, insert, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.chat import ChatThread, ChatMessageRecord
+from app.services.llm import ChatTurn
+
+# Окно контекста LLM по умолчанию
+CONTEXT_MAX_TURNS = 10
+CONTEXT_TOKEN_BUDGET = 2000
+
+
+def estimate_tokens(text: str) -> int:
+    """Грубая оценка числа токенов (~4 символа на токен)."""
+    return len(text) // 4 + 1
+
+
+def current_version(user_id: int):
+    """Подзапрос текущей версии диалога (0, если диалог ещё не очищался)."""
+    return func.coalesce(
+        select(ChatThread.version).where(ChatThread.user_id == user_id).scalar_subquery(),
+        0
+    )
+
+
+def current_messages(user_id: int):
+    """Сообщения текущей версии диалога пользователя."""
+    return select(ChatMessageRecord).where(
+        ChatMessageRecord.user_id == user_id,
+        ChatMessageRecord.version == current_version(user_id)
+    )
+
+
+async def append_message(
+    db: AsyncSession,
+    user_id: int,
+    is_user: bool,
+    text: str,
+    places: Optional[list] = None
+) -> ChatMessageRecord:
+    """Добавление сообщения в текущую версию диалога (без commit)."""
+    result = await db.execute(
+        insert(ChatMessageRecord)
+        .values(
+            user_id=user_id,
+            version=current_version(user_id),
+            is_user=is_user,
+            text=text,
+            places=places,
+            tokens=estimate_tokens(text)
+        )
+        .returning(ChatMessageRecord)
+    )
+    return result.scalar_one()
+
+
+async def get_history(
+    db: AsyncSession,
+    user_id: int,
+    before_id: Optional[int] = None,
+    limit: int = 50
+) -> List[ChatMessageRecord]:
+    """Страница истории (в хронологическом порядке), более ранняя чем before_id."""
+    query = current_messages(user_id)
+    if before_id is not None:
+        query = query.where(ChatMessageRecord.id < before_id)
+    rows = (await db.execute(query.order_by(ChatMessageRecord.id.desc()).limit(limit))).scalars().all()
+    return list(reversed(rows))
+
+
+async def get_context(
+    db: AsyncSession,
+    user_id: int,
+    max_turns: int = CONTEXT_MAX_TURNS,
+    token_budget: int = CONTEXT_TOKEN_BUDGET
+) -> List[ChatTurn]:
+    """Последние реплики диалога, укладывающиеся в бюджет токенов."""
+    rows = (await db.execute(
+        current_messages(user_id)
+        .with_only_columns(ChatMessageRecord.is_user, ChatMessageRecord.text, ChatMessageRecord.tokens)
+        .order_by(ChatMessageRecord.id.desc())
+        .limit(max_turns)
+    )).all()
+
+    turns = []
+    used = 0
+    for row in rows:
+        if used + row.tokens > token_budget:
+            break
+        used += row.tokens
+        turns.append(ChatTurn(is_user=row.is_user, text=row.text))
+    turns.reverse()
+    return turns
+
+
+async def clear_history(db: AsyncSession, user_id: int) -> None:
+    """Очистка истории: новая версия диалога (без commit)."""
+    result = await db.execute(
+        update(ChatThread)
+        .where(ChatThread.user_id == user_id)
+        .values(version=ChatThread.version + 1)
+    )
+    if result.rowcount == 0:
+        db.add(ChatThread(user_id=user_id, version=1))
@@ -0,0 +1,129 @@
+"""
+In-memory пространственный индекс мест.
+
+Координаты хранятся в массивах numpy, отсортированных по широте.
+Запрос по области сначала бинарным поиском выделяет полосу широт
+(для радиуса - широта ± радиус), затем векторно проверяет долготу или
+считает расстояния (haversine) только внутри полосы. Ближайшие k мест -
+поиск в расширяющемся радиусе, пока не наберётся k подходящих.
+
+Индекс - часть индекса каталога (app.services.catalog_index) и
+обновляется вместе с ним; массивы пересобираются лениво при первом
+запросе после изменения.
+"""
+
+import math
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+# Половина окружности Земли: дальше точек нет
+MAX_DISTANCE_KM = math.pi * EARTH_RADIUS_KM
+# Начальный радиус поиска ближайших и множитель его расширения
+NEAREST_START_KM = 5.0
+NEAREST_GROWTH = 4.0
+
+
+def haversine_km(lat: float, lon: float, lats, lons):
+    """Расстояние по дуге большого круга от точки до точки (или массива точек)."""
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class GeoIndex:
+    """Координаты мест, отсортированные по широте. Не потокобезопасен: защищается вызывающим."""
+
+    def __init__(self):
+        self._coords: Dict[int, Tuple[float, float]] = {}
+        self._dirty = False
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._lat = np.zeros(0)
+        self._lon = np.zeros(0)
+
+    def __len__(self) -> int:
+        return len(self._coords)
+
+    def set(self, place_id: int, latitude: Optional[float], longitude: Optional[float]) -> None:
+        """Координаты места; место без координат в индекс не попадает."""
+        if latitude is None or longitude is None:
+            self.discard(place_id)
+            return
+        coords = (latitude, longitude)
+        # Рейтинг и текст места меняются чаще координат: массивы не пересобираются
+        if self._coords.get(place_id) != coords:
+            self._coords[place_id] = coords
+            self._dirty = True
+
+    def discard(self, place_id: int) -> None:
+        if self._coords.pop(place_id, None) is not None:
+            self._dirty = True
+
+    def clear(self) -> None:
+        self._coords = {}
+        self._dirty = True
+
+    def _arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if self._dirty:
+            n = len(self._coords)
+            ids = np.fromiter(self._coords, dtype=np.int64, count=n)
+            coords = np.array(list(self._coords.values()), dtype=np.float64).reshape(n, 2)
+            order = np.argsort(coords[:, 0], kind="stable")
+            self._ids, self._lat, self._lon = ids[order], coords[order, 0], coords[order, 1]
+            self._dirty = False
+        return self._ids, self._lat, self._lon
+
+    def _band(self, min_lat: float, max_lat: float) -> slice:
+        _, lat, _ = self._arrays()
+        return slice(int(np.searchsorted(lat, min_lat, "left")), int(np.searchsorted(lat, max_lat, "right")))
+
+    def within_radius(self, latitude: float, longitude: float, radius_km: float) -> Tuple[np.ndarray, np.ndarray]:
+        """id мест в радиусе и расстояния до них, по возрастанию расстояния."""
+        ids, lat, lon = self._arrays()
+        delta = radius_km / KM_PER_DEGREE
+        band = self._band(latitude - delta, latitude + delta)
+        distances = haversine_km(latitude, longitude, lat[band], lon[band])
+        inside = np.flatnonzero(distances <= radius_km)
+        order = inside[np.argsort(distances[inside], kind="stable")]
+        return ids[band][order], distances[order]
+
+    def within_bbox(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> np.ndarray:
+        """id мест в прямоугольнике; min_lon > max_lon - прямоугольник через 180-й меридиан."""
+        ids, _, lon = self._arrays()
+        band = self._band(min_lat, max_lat)
+        lons = lon[band]
+        if min_lon <= max_lon:
+            mask = (lons >= min_lon) & (lons <= max_lon)
+        else:
+            mask = (lons >= min_lon) | (lons <= max_lon)
+        return ids[band][mask]
+
+    def nearest(
+        self,
+        latitude: float,
+        longitude: float,
+        k: int,
+        accept: Optional[Callable[[int], bool]] = None,
+        max_km: float = MAX_DISTANCE_KM
+    ) -> List[Tuple[int, float]]:
+        """k ближайших мест (id, расстояние), прошедших фильтр accept, не дальше max_km."""
+        radius = min(NEAREST_START_KM, max_km)
+        while True:
+            # В полосе широт меньше k мест - радиус расширяется без расчёта расстояний
+            band = self._band(latitude - radius / KM_PER_DEGREE, latitude + radius / KM_PER_DEGREE)
+            if band.stop - band.start < min(k, len(self._coords)) and radius < max_km:
+                radius = min(radius * NEAREST_GROWTH, max_km)
+                continue
+            ids, distances = self.within_radius(latitude, longitude, radius)
+            found = []
+            for place_id, distance in zip(ids.tolist(), distances.tolist()):
+                if accept is None or accept(place_id):
+                    found.append((place_id, distance))
+                    if len(found) == k:
+                        return found
+            if radius >= max_km or len(ids) == len(self._coords):
+                return found
+            radius = min(radius * NEAREST_GROWTH, max_km)
@@ -0,0 +1,206 @@
+"""
+Изображения мест: хранение оригиналов по хэшу содержимого и WebP-превью.
+
+Раскладка каталога MEDIA_DIR:
+    originals/ab/<sha256>.jpg            - оригинал как загружен
+    thumbs/<size>/ab/<sha256>.webp       - превью размеров THUMBNAIL_SIZES
+Имя файла - SHA-256 содержимого оригинала, поэтому одинаковые фотографии
+хранятся один раз, а файл по одному URL никогда не меняется (раздаётся
+с Cache-Control: immutable, см. app.routers.media). У места хранится
+только имя оригинала (Place.image_file).
+
+Превью строятся в пуле процессов (декодирование и сжатие - CPU):
+после загрузки задача ставится в пул и выполняется в фоне; запрос
+превью, которое ещё не готово, ждёт ту же задачу (Thumbnailer.ensure).
+"""
+
+import asyncio
+import hashlib
+import io
+import multiprocessing
+import os
+import re
+import tempfile
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from threading import RLock
+from typing import Dict, List, Optional
+
+from PIL import Image, ImageOps
+
+MEDIA_DIR = Path(os.getenv("MEDIA_DIR", str(Path(__file__).resolve().parent.parent.parent / "media")))
+# Префикс URL файлов: /media у этого же сервера или адрес CDN
+MEDIA_URL = os.getenv("MEDIA_URL", "/media").rstrip("/")
+
+# Превью: имя размера -> наибольшая сторона в пикселях
+THUMBNAIL_SIZES = {"small": 320, "medium": 640, "large": 1280}
+# Размер для карточек каталога (PlaceResponse.image)
+CARD_SIZE = "medium"
+WEBP_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", "80"))
+THUMBNAIL_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+
+MAX_IMAGE_BYTES = int(os.getenv("MAX_IMAGE_BYTES", str(20 * 1024 * 1024)))
+MAX_IMAGE_PIXELS = 50_000_000
+
+# Формат Pillow -> расширение оригинала
+FORMATS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp", "GIF": "gif"}
+ORIGINAL_NAME = re.compile(r"^([0-9a-f]{64})\.(jpg|png|webp|gif)$")
+THUMBNAIL_NAME = re.compile(r"^([0-9a-f]{64})\.webp$")
+
+
+class InvalidImage(ValueError):
+    """Файл не является изображением поддерживаемого формата."""
+
+
+def shard(digest: str) -> str:
+    return digest[:2]
+
+
+def original_path(name: str) -> Path:
+    return MEDIA_DIR / "originals" / shard(name) / name
+
+
+def thumbnail_path(size: str, digest: str) -> Path:
+    return MEDIA_DIR / "thumbs" / size / shard(digest) / f"{digest}.webp"
+
+
+def find_original(digest: str) -> Optional[str]:
+    """Имя оригинала по хэшу (расширение в URL превью не передаётся)."""
+    for ext in FORMATS.values():
+        name = f"{digest}.{ext}"
+        if original_path(name).exists():
+            return name
+    return None
+
+
+def image_urls(name: str) -> Dict[str, str]:
+    """URL превью всех размеров и оригинала для имени оригинала."""
+    digest = name.split(".", 1)[0]
+    urls = {
+        size: f"{MEDIA_URL}/thumbs/{size}/{shard(digest)}/{digest}.webp"
+        for size in THUMBNAIL_SIZES
+    }
+    urls["original"] = f"{MEDIA_URL}/originals/{shard(digest)}/{name}"
+    return urls
+
+
+def write_atomic(path: Path, data: bytes) -> None:
+    """
+    Запись через временный файл: читатели не видят недописанный файл.
+    Имя временного файла уникально (mkstemp), поэтому одновременная
+    запись того же файла из разных потоков или процессов безопасна.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        # mkstemp создаёт файл 0600; файлы раздаются веб-сервером или CDN
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def store_original(data: bytes) -> str:
+    """
+    Сохранение оригинала; возвращает имя файла <sha256>.<ext>.
+    Проверяется только заголовок изображения (формат и размеры),
+    полное декодирование выполняется при построении превью.
+    """
+    if len(data) > MAX_IMAGE_BYTES:
+        raise InvalidImage(f"Файл больше {MAX_IMAGE_BYTES // (1024 * 1024)} МБ")
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            fmt, (width, height) = image.format, image.size
+    except (OSError, Image.DecompressionBombError):
+        raise InvalidImage("Файл не является изображением")
+    if fmt not in FORMATS:
+        raise InvalidImage(f"Формат {fmt} не поддерживается")
+    if width * height > MAX_IMAGE_PIXELS:
+        raise InvalidImage("Слишком большое разрешение изображения")
+
+    name = f"{hashlib.sha256(data).hexdigest()}.{FORMATS[fmt]}"
+    path = original_path(name)
+    # Такая фотография уже загружена - файл не переписывается
+    if not path.exists():
+        write_atomic(path, data)
+    return name
+
+
+def make_thumbnails(name: str) -> List[str]:
+    """
+    Построение недостающих превью оригинала (выполняется в процессе пула).
+    JPEG декодируется сразу в уменьшенном масштабе (draft), каждое
+    следующее превью строится из предыдущего, а не из оригинала.
+    """
+    digest = name.split(".", 1)[0]
+    sizes = sorted(THUMBNAIL_SIZES.items(), key=lambda item: item[1], reverse=True)
+    missing = [(size, side) for size, side in sizes if not thumbnail_path(size, digest).exists()]
+    if not missing:
+        return []
+
+    with Image.open(original_path(name)) as source:
+        source.draft("RGB", (missing[0][1], missing[0][1]))
+        image = ImageOps.exif_transpose(source)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "PA") else "RGB")
+        made = []
+        for size, side in missing:
+            image.thumbnail((side, side), Image.LANCZOS)
+            buffer = io.BytesIO()
+            image.save(buffer, "WEBP", quality=WEBP_QUALITY, method=4)
+            write_atomic(thumbnail_path(size, digest), buffer.getvalue())
+            made.append(size)
+    return made
+
+
+class Thumbnailer:
+    """Пул процессов построения превью; одна задача на оригинал одновременно."""
+
+    def __init__(self, workers: int = THUMBNAIL_WORKERS):
+        self.workers = workers
+        # RLock: колбэк уже завершённой задачи вызывается сразу внутри submit
+        self._lock = RLock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending: Dict[str, Future] = {}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: fork из процесса с потоками (пул anyio, uvicorn) небезопасен
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def submit(self, name: str) -> Future:
+        """Задача построения превью; повторный вызов до её завершения вернёт её же."""
+        with self._lock:
+            future = self._pending.get(name)
+            if future is None:
+                future = self._get_executor().submit(make_thumbnails, name)
+                self._pending[name] = future
+                future.add_done_callback(lambda _: self._done(name))
+            return future
+
+    def _done(self, name: str) -> None:
+        with self._lock:
+            self._pending.pop(name, None)
+
+    async def ensure(self, name: str) -> None:
+        await asyncio.wrap_future(self.submit(name))
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def shutdown(self, wait: bool = False) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait, cancel_futures=not wait)
+                self._executor = None
+
+
+# Общий пул процесса
+thumbnailer = Thumbnailer()
@@ -0,0 +1,371 @@
+"""
+Потоковая загрузка мест из внешних источников.
+
+Конвейер - цепочка асинхронных генераторов:
+    fetch -> parse -> normalize -> dedupe -> batches -> upsert
+
+- fetch: документы источника загружаются с ограниченной параллельностью
+  (окно из concurrency задач), порядок документов сохраняется;
+- parse: разбор документа в пуле потоков, пока загружаются следующие;
+- normalize: очистка полей, записи без названия отбрасываются;
+- dedupe: SimHash по названию и описанию; почти совпадающие места
+  (расстояние Хэмминга <= SIMHASH_DISTANCE) считаются дублями -
+  и внутри загрузки, и с уже существующим каталогом;
+- upsert: пачки по batch_size в отдельных транзакциях - executemany
+  для INSERT/UPDATE мест, соответствий источнику и полнотекстового
+  индекса, плюс контрольная точка источника.
+
+Контрольная точка (документ, номер записи) сохраняется в транзакции
+пачки, поэтому прерванная загрузка продолжается с первой
+незаписанной записи. In-memory индексы каталога перестраиваются
+вызывающим кодом после загрузки.
+"""
+
+import asyncio
+import hashlib
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.ingestion import PlaceSource, IngestionCheckpoint
+from app.models.place import Place
+from app.services.ingestion_sources import Source
+from app.services.search_index import (
+    FTS_DELETE, FTS_INSERT, TRIGRAM_DELETE, TRIGRAM_INSERT, index_params, is_supported, stem, words
+)
+
+BATCH_SIZE = 1000
+FETCH_CONCURRENCY = 8
+# Порог расстояния Хэмминга между SimHash почти одинаковых мест
+SIMHASH_DISTANCE = 3
+SIMHASH_BANDS = 4
+# Вес слов названия относительно шинглов описания
+NAME_WEIGHT = 3
+
+
+@dataclass
+class PlaceRecord:
+    """Нормализованная запись источника."""
+    external_id: str
+    name: str
+    category: str
+    description: str
+    image: str
+    tags: List[str]
+    # Позиция записи: (документ, номер записи в документе)
+    document: str
+    record: int
+    simhash: int = 0
+    place_id: Optional[int] = None
+    # insert | update | link (дубль существующего места: только соответствие)
+    action: str = "insert"
+
+
+@dataclass
+class IngestionReport:
+    source: str
+    documents: int = 0
+    records: int = 0
+    inserted: int = 0
+    updated: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+    resumed_from: Optional[Tuple[str, int]] = None
+    new_place_ids: List[int] = field(default_factory=list)
+
+
+# --- SimHash ---
+
+def simhash_features(name: str, description: str) -> List[str]:
+    """Признаки: основы слов названия (с весом) и пары основ описания."""
+    name_stems = [stem(w) for w in words(name)]
+    description_stems = [stem(w) for w in words(description)]
+    features = [f"n:{s}" for s in name_stems] * NAME_WEIGHT
+    features += [f"d:{a} {b}" for a, b in zip(description_stems, description_stems[1:])]
+    return features or [f"n:{name.strip().lower()}"]
+
+
+def simhash_many(items: List[Tuple[str, str]]) -> List[int]:
+    """64-битные SimHash для пар (название, описание) одним проходом numpy."""
+    if not items:
+        return []
+    digests = []
+    offsets = []
+    for name, description in items:
+        offsets.append(len(digests))
+        digests.extend(
+            hashlib.blake2b(f.encode(), digest_size=8).digest()
+            for f in simhash_features(name, description)
+        )
+    hashes = np.frombuffer(b"".join(digests), dtype=np.uint8).reshape(-1, 8)
+    # Биты признаков -> +1/-1, сумма по признакам записи, знак суммы - бит SimHash
+    signs = np.unpackbits(hashes, axis=1, bitorder="little").astype(np.int16) * 2 - 1
+    sums = np.add.reduceat(signs, offsets, axis=0)
+    packed = np.packbits(sums > 0, axis=1, bitorder="little")
+    return [int(h) for h in packed.view("<u8").ravel()]
+
+
+class SimHashIndex:
+    """
+    Поиск почти совпадающих SimHash: хэш делится на SIMHASH_BANDS полос,
+    при расстоянии < SIMHASH_BANDS хотя бы одна полоса совпадает точно.
+    """
+
+    def __init__(self, distance: int = SIMHASH_DISTANCE, bands: int = SIMHASH_BANDS):
+        self.distance = distance
+        self.bands = bands
+        self.width = 64 // bands
+        self._buckets: List[Dict[int, List[Tuple[int, Optional[int]]]]] = [{} for _ in range(bands)]
+
+    def _keys(self, simhash: int):
+        mask = (1 << self.width) - 1
+        for band in range(self.bands):
+            yield band, (simhash >> (band * self.width)) & mask
+
+    def add(self, simhash: int, place_id: Optional[int]) -> None:
+        for band, key in self._keys(simhash):
+            self._buckets[band].setdefault(key, []).append((simhash, place_id))
+
+    def find(self, simhash: int) -> Optional[Tuple[int, Optional[int]]]:
+        """Ближайший известный хэш в пределах порога: (simhash, place_id)."""
+        for band, key in self._keys(simhash):
+            for candidate in self._buckets[band].get(key, ()):
+                if (candidate[0] ^ simhash).bit_count() <= self.distance:
+                    return candidate
+        return None
+
+
+# --- Стадии конвейера ---
+
+async def fetch(
+    source: Source,
+    documents: List[str],
+    concurrency: int = FETCH_CONCURRENCY
+) -> AsyncIterator[Tuple[str, List[dict]]]:
+    """
+    Загрузка и разбор документов: до concurrency документов в работе,
+    результаты отдаются в исходном порядке.
+    """
+    async def load(ref: str) -> List[dict]:
+        content = await source.fetch(ref)
+        return await asyncio.to_thread(source.parse, content)
+
+    pending = deque()
+    refs = iter(documents)
+    for ref in refs:
+        pending.append((ref, asyncio.create_task(load(ref))))
+        if len(pending) >= concurrency:
+            break
+    try:
+        while pending:
+            ref, task = pending.popleft()
+            records = await task
+            next_ref = next(refs, None)
+            if next_ref is not None:
+                pending.append((next_ref, asyncio.create_task(load(next_ref))))
+            yield ref, records
+    finally:
+        for _, task in pending:
+            task.cancel()
+
+
+async def parse(
+    documents: AsyncIterator[Tuple[str, List[dict]]],
+    report: IngestionReport,
+    resume: Optional[Tuple[str, int]] = None
+) -> AsyncIterator[Tuple[str, int, dict]]:
+    """Записи документов с позицией; записи до контрольной точки пропускаются."""
+    async for ref, records in documents:
+        report.documents += 1
+        skip = resume[1] if resume and resume[0] == ref else -1
+        for i, raw in enumerate(records):
+            if i > skip:
+                yield ref, i, raw
+
+
+def _clean(value) -> str:
+    return " ".join(str(value or "").split())
+
+
+async def normalize(
+    records: AsyncIterator[Tuple[str, int, dict]],
+    report: IngestionReport
+) -> AsyncIterator[PlaceRecord]:
+    async for ref, i, raw in records:
+        report.records += 1
+        name = _clean(raw.get("name"))
+        category = _clean(raw.get("category"))
+        if not name or not category:
+            report.invalid += 1
+            continue
+        tags = []
+        for tag in raw.get("tags") or []:
+            tag = _clean(tag).lower()
+            if tag and tag not in tags:
+                tags.append(tag)
+        external_id = _clean(raw.get("external_id") or raw.get("id")) or f"{ref}#{i}"
+        yield PlaceRecord(
+            external_id=external_id,
+            name=name,
+            category=category[:1].upper() + category[1:],
+            description=_clean(raw.get("description")),
+            image=_clean(raw.get("image")),
+            tags=tags,
+            document=ref,
+            record=i
+        )
+
+
+async def batches(items: AsyncIterator, size: int) -> AsyncIterator[List]:
+    batch = []
+    async for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def dedupe(
+    batches_in: AsyncIterator[List[PlaceRecord]],
+    known: Dict[str, int],
+    index: SimHashIndex,
+    report: IngestionReport
+) -> AsyncIterator[Tuple[List[PlaceRecord], PlaceRecord]]:
+    """
+    Отбрасывание дублей. Запись, уже известная по external_id, обновляет
+    своё место; почти совпадающая с другим местом - привязывается к нему
+    без изменения; с записью этой же загрузки - отбрасывается.
+    Отдаёт (записи к сохранению, последняя запись пачки для контрольной точки).
+    """
+    seen = set()
+    async for batch in batches_in:
+        hashes = simhash_many([(r.name, r.description) for r in batch])
+        result = []
+        for record, simhash in zip(batch, hashes):
+            record.simhash = simhash
+            if record.external_id in seen:
+                report.duplicates += 1
+                continue
+            seen.add(record.external_id)
+            record.place_id = known.get(record.external_id)
+            if record.place_id is not None:
+                record.action = "update"
+            else:
+                match = index.find(simhash)
+                if match is not None:
+                    report.duplicates += 1
+                    if match[1] is not None:
+                        known[record.external_id] = match[1]
+                        record.place_id = match[1]
+                        record.action = "link"
+                        result.append(record)
+                    continue
+                index.add(simhash, None)
+            result.append(record)
+        yield result, batch[-1]
+
+
+# --- Запись ---
+
+async def load_state(
+    db: AsyncSession,
+    source: str
+) -> Tuple[Dict[str, int], SimHashIndex, Optional[Tuple[str, int]]]:
+    """Соответствия источника, SimHash каталога и контрольная точка."""
+    known = dict((await db.execute(
+        select(PlaceSource.external_id, PlaceSource.place_id).where(PlaceSource.source == source)
+    )).all())
+    index = SimHashIndex()
+    places = (await db.execute(select(Place.id, Place.name, Place.description))).all()
+    for (place_id, _, _), simhash in zip(places, simhash_many([(p.name, p.description) for p in places])):
+        index.add(simhash, place_id)
+    checkpoint = await db.get(IngestionCheckpoint, source)
+    resume = (checkpoint.document, checkpoint.record) if checkpoint else None
+    return known, index, resume
+
+
+async def upsert_batch(
+    db: AsyncSession,
+    source: str,
+    batch: List[PlaceRecord],
+    last: PlaceRecord,
+    report: IngestionReport
+) -> None:
+    """Запись пачки и контрольной точки (позиция last) в одной транзакции."""
+    inserts = [r for r in batch if r.action == "insert"]
+    updates = [r for r in batch if r.action == "update"]
+    links = [r for r in batch if r.action == "link"]
+    fields = lambda r: {  # noqa: E731
+        "name": r.name, "category": r.category, "description": r.description,
+        "image": r.image, "tags": r.tags,
+    }
+
+    if inserts:
+        ids = (await db.execute(
+            insert(Place).returning(Place.id, sort_by_parameter_order=True),
+            [fields(r) for r in inserts]
+        )).scalars().all()
+        for record, place_id in zip(inserts, ids):
+            record.place_id = place_id
+        report.new_place_ids.extend(ids)
+    if inserts or links:
+        await db.execute(insert(PlaceSource), [
+            {"source": source, "external_id": r.external_id, "place_id": r.place_id}
+            for r in inserts + links
+        ])
+    if updates:
+        await db.execute(update(Place), [{"id": r.place_id, **fields(r)} for r in updates])
+
+    if is_supported(db) and (inserts or updates):
+        changed = [index_params(Place(id=r.place_id, **fields(r))) for r in inserts + updates]
+        if updates:
+            ids = [{"id": r.place_id} for r in updates]
+            await db.execute(FTS_DELETE, ids)
+            await db.execute(TRIGRAM_DELETE, ids)
+        await db.execute(FTS_INSERT, changed)
+        await db.execute(TRIGRAM_INSERT, changed)
+
+    await db.merge(IngestionCheckpoint(source=source, document=last.document, record=last.record))
+    await db.commit()
+
+    report.inserted += len(inserts)
+    report.updated += len(updates)
+    report.batches += 1
+
+
+async def ingest(
+    db: AsyncSession,
+    source: Source,
+    batch_size: int = BATCH_SIZE,
+    concurrency: int = FETCH_CONCURRENCY,
+    restart: bool = False
+) -> IngestionReport:
+    """Загрузка источника; restart=True игнорирует контрольную точку."""
+    started = time.perf_counter()
+    report = IngestionReport(source=source.name)
+    if restart:
+        await db.execute(delete(IngestionCheckpoint).where(IngestionCheckpoint.source == source.name))
+        await db.commit()
+    known, index, resume = await load_state(db, source.name)
+    report.resumed_from = resume
+
+    documents = source.documents()
+    if resume:
+        documents = [ref for ref in documents if ref >= resume[0]]
+
+    stream = fetch(source, documents, concurrency)
+    records = normalize(parse(stream, report, resume), report)
+    async for batch, last in dedupe(batches(records, batch_size), known, index, report):
+        await upsert_batch(db, source.name, batch, last, report)
+
+    report.seconds = time.perf_counter() - started
+    return report
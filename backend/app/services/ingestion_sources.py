@@ -0,0 +1,166 @@
+"""
+Источники мест для конвейера загрузки (app.services.ingestion).
+
+Источник - упорядоченный список документов (файлов, страниц, выгрузок
+каналов), загрузка документа и разбор его в сырые записи-словари
+с ключами external_id, name, category, description, image, tags.
+
+- JsonFileSource: JSON-массив или JSON Lines с карточками мест;
+- HtmlFileSource: HTML-страницы портала с карточками
+  <article class="place" data-id="...">;
+- TelegramExportSource: экспорт канала Telegram Desktop (result.json),
+  пост = место: первая строка - название, хэштеги - категория и теги.
+
+Файловые источники подменяют реальные сайты и каналы в разработке
+и тестах; сетевой источник реализует тот же интерфейс.
+"""
+
+import asyncio
+import json
+import re
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Dict, List, Optional
+
+HASHTAG_RE = re.compile(r"#(\w+)", re.UNICODE)
+
+
+class Source:
+    """Интерфейс источника мест."""
+
+    name = "base"
+
+    def documents(self) -> List[str]:
+        """Ссылки на документы источника в стабильном порядке."""
+        raise NotImplementedError
+
+    async def fetch(self, ref: str) -> bytes:
+        raise NotImplementedError
+
+    def parse(self, content: bytes) -> List[Dict]:
+        """Разбор документа в сырые записи (выполняется в пуле потоков)."""
+        raise NotImplementedError
+
+
+class FileSource(Source):
+    """Источник из локальных файлов: один файл или каталог по маске."""
+
+    pattern = "*"
+
+    def __init__(self, path: Path, name: Optional[str] = None):
+        self.path = Path(path)
+        if name:
+            self.name = name
+
+    def documents(self) -> List[str]:
+        if self.path.is_file():
+            return [str(self.path)]
+        return sorted(str(p) for p in self.path.rglob(self.pattern) if p.is_file())
+
+    async def fetch(self, ref: str) -> bytes:
+        return await asyncio.to_thread(Path(ref).read_bytes)
+
+
+class JsonFileSource(FileSource):
+    name = "json"
+    pattern = "*.json*"
+
+    def parse(self, content: bytes) -> List[Dict]:
+        text = content.decode("utf-8").strip()
+        if text.startswith("["):
+            return json.loads(text)
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+class _PlaceCardParser(HTMLParser):
+    """Сбор карточек <article class="place"> с полями по CSS-классам."""
+
+    FIELDS = {"name", "category", "description"}
+
+    def __init__(self):
+        super().__init__()
+        self.records: List[Dict] = []
+        self._record: Optional[Dict] = None
+        self._field: Optional[str] = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        classes = set((attrs.get("class") or "").split())
+        if tag == "article" and "place" in classes:
+            self._record = {"external_id": attrs.get("data-id"), "tags": []}
+            return
+        if self._record is None:
+            return
+        if tag == "img":
+            self._record["image"] = attrs.get("src") or ""
+        elif "tag" in classes:
+            self._field = "tag"
+        elif classes & self.FIELDS:
+            self._field = next(iter(classes & self.FIELDS))
+
+    def handle_endtag(self, tag):
+        if tag == "article" and self._record is not None:
+            self.records.append(self._record)
+            self._record = None
+        self._field = None
+
+    def handle_data(self, data):
+        if self._record is None or self._field is None:
+            return
+        if self._field == "tag":
+            self._record["tags"].append(data)
+        else:
+            self._record[self._field] = self._record.get(self._field, "") + data
+
+
+class HtmlFileSource(FileSource):
+    name = "html"
+    pattern = "*.htm*"
+
+    def parse(self, content: bytes) -> List[Dict]:
+        parser = _PlaceCardParser()
+        parser.feed(content.decode("utf-8"))
+        parser.close()
+        return parser.records
+
+
+def _telegram_text(text) -> str:
+    """Текст поста: строка или список фрагментов с разметкой."""
+    if isinstance(text, str):
+        return text
+    return "".join(part if isinstance(part, str) else part.get("text", "") for part in text)
+
+
+class TelegramExportSource(FileSource):
+    name = "telegram"
+    pattern = "result.json"
+
+    def parse(self, content: bytes) -> List[Dict]:
+        export = json.loads(content)
+        channel = export.get("id") or export.get("name") or ""
+        records = []
+        for message in export.get("messages", []):
+            if message.get("type") != "message":
+                continue
+            text = _telegram_text(message.get("text", "")).strip()
+            hashtags = HASHTAG_RE.findall(text)
+            lines = [line.strip() for line in HASHTAG_RE.sub("", text).splitlines() if line.strip()]
+            if not lines or not hashtags:
+                # Посты без хэштегов - не карточки мест
+                continue
+            records.append({
+                "external_id": f"{channel}/{message['id']}",
+                "name": lines[0],
+                "category": hashtags[0].replace("_", " "),
+                "description": " ".join(lines[1:]),
+                "image": message.get("photo") or "",
+                "tags": [tag.replace("_", " ") for tag in hashtags[1:]],
+            })
+        return records
+
+
+SOURCES = {
+    JsonFileSource.name: JsonFileSource,
+    HtmlFileSource.name: HtmlFileSource,
+    TelegramExportSource.name: TelegramExportSource,
+}
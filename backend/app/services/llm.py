@@ -0,0 +1,105 @@
+"""
+Клиент LLM для диалога с пользователем.
+
+LLMClient - интерфейс клиента, StubLLMClient - детерминированная локальная
+реализация без обращения к сети (для разработки и тестов).
+"""
+
+import asyncio
+from collections import Counter
+from dataclasses import dataclass
+from typing import AsyncIterator, List, Optional
+
+from app.schemas.places import PlaceResponse
+from app.services.search_index import stem, words
+
+# Сколько частых слов попадает в сводку заглушки
+SUMMARY_KEYWORDS = 5
+SUMMARY_PREFIX = "Посетители отмечают: "
+
+
+@dataclass
+class ChatTurn:
+    """Реплика из истории диалога, передаваемая в промпт."""
+    is_user: bool
+    text: str
+
+
+class LLMClient:
+    """
+    Интерфейс клиента LLM.
+    Реализация обязана определить stream(); complete() по умолчанию
+    собирает ответ из потока.
+    """
+
+    def stream(
+        self,
+        message: str,
+        places: List[PlaceResponse],
+        history: Optional[List[ChatTurn]] = None
+    ) -> AsyncIterator[str]:
+        """Ответ по частям (токенам) по мере генерации."""
+        raise NotImplementedError
+
+    async def complete(
+        self,
+        message: str,
+        places: List[PlaceResponse],
+        history: Optional[List[ChatTurn]] = None
+    ) -> str:
+        return "".join([chunk async for chunk in self.stream(message, places, history)])
+
+    async def summarize(self, texts: List[str]) -> str:
+        """
+        Краткая сводка по набору текстов: отзывов или промежуточных
+        сводок (для иерархической суммаризации).
+        """
+        raise NotImplementedError
+
+
+class StubLLMClient(LLMClient):
+    """
+    Детерминированная заглушка LLM: ответ строится из найденных мест
+    и отдаётся по словам. token_delay имитирует задержку генерации.
+    """
+
+    def __init__(self, token_delay: float = 0.0):
+        self.token_delay = token_delay
+
+    def answer(self, message: str, places: List[PlaceResponse]) -> str:
+        if not places:
+            return "К сожалению, я не нашёл подходящих мест. Попробуйте уточнить запрос."
+        names = ", ".join(p.name for p in places)
+        return f"По запросу «{message.strip()}» рекомендую: {names}."
+
+    async def stream(
+        self,
+        message: str,
+        places: List[PlaceResponse],
+        history: Optional[List[ChatTurn]] = None
+    ) -> AsyncIterator[str]:
+        words = self.answer(message, places).split(" ")
+        for i, word in enumerate(words):
+            if self.token_delay:
+                await asyncio.sleep(self.token_delay)
+            yield word if i == 0 else " " + word
+
+    async def summarize(self, texts: List[str]) -> str:
+        """Сводка из самых частых значимых слов (по основам) входных текстов."""
+        counts = Counter()
+        first_form = {}
+        for text in texts:
+            # Промежуточные сводки учитываются без служебного префикса
+            for word in words(text.removeprefix(SUMMARY_PREFIX)):
+                if len(word) > 3:
+                    key = stem(word)
+                    counts[key] += 1
+                    first_form.setdefault(key, word)
+        if not counts:
+            return "Отзывы без содержательных комментариев."
+        top = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:SUMMARY_KEYWORDS]
+        return SUMMARY_PREFIX + ", ".join(first_form[key] for key, _ in top) + "."
+
+
+# Клиент, используемый роутерами
+llm_client: LLMClient = StubLLMClient()
@@ -0,0 +1,151 @@
+"""
+Кэш ответов LLM для популярных запросов чата.
+
+Ключ - нормализованный текст сообщения (регистр, пробелы и пунктуация
+свёрнуты) плюс версия каталога мест: после изменения каталога старые
+ответы перестают совпадать по ключу и вытесняются.
+
+Вытеснение - LRU с ограничением числа записей и TTL. Записи хранятся
+в памяти и дублируются в отдельный файл SQLite, поэтому кэш переживает
+перезапуск приложения.
+"""
+
+import hashlib
+import sqlite3
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Iterable, Optional, Tuple
+
+from app.database import BASE_DIR
+
+CACHE_PATH = BASE_DIR / "llm_cache.db"
+MAX_ENTRIES = 10_000
+TTL_SECONDS = 24 * 60 * 60
+# Местоположение в ключе округляется до сотых градуса (~1 км): соседние
+# запросы из одного района используют общий ответ
+LOCATION_DECIMALS = 2
+
+
+def normalize_message(message: str) -> str:
+    """Приведение сообщения к каноническому виду для ключа кэша."""
+    text = unicodedata.normalize("NFKC", message).casefold().replace("ё", "е")
+    text = "".join(
+        " " if unicodedata.category(ch).startswith(("P", "S")) else ch
+        for ch in text
+    )
+    return " ".join(text.split())
+
+
+def make_key(
+    message: str,
+    catalog_version: str,
+    location: Optional[Tuple[float, float]] = None,
+    history: Iterable[Tuple[bool, str]] = ()
+) -> str:
+    """
+    Ключ ответа: сообщение, версия каталога, местоположение и окно истории
+    диалога (is_user, текст). Ответ на уточняющий вопрос зависит от
+    предыдущих реплик, поэтому переиспользуется только при том же контексте.
+    """
+    raw = f"{normalize_message(message)}\0{catalog_version}"
+    if location is not None:
+        raw += "\0" + ",".join(f"{value:.{LOCATION_DECIMALS}f}" for value in location)
+    for is_user, text in history:
+        raw += f"\0{'u' if is_user else 'a'}:{normalize_message(text)}"
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+class LLMCache:
+    """LRU-кэш с TTL и персистентным хранилищем в SQLite."""
+
+    def __init__(self, path: Path, max_entries: int = MAX_ENTRIES, ttl_seconds: float = TTL_SECONDS):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = Lock()
+        # key -> (created_at, value), порядок - от давно использованных к недавним
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """Ленивое открытие файла кэша и загрузка живых записей в память."""
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+            rows = conn.execute(
+                "SELECT key, created_at, value FROM llm_cache ORDER BY accessed_at"
+            ).fetchall()
+            for key, created_at, value in rows[-self.max_entries:]:
+                self._entries[key] = (created_at, value)
+            if len(rows) > self.max_entries:
+                conn.executemany(
+                    "DELETE FROM llm_cache WHERE key = ?",
+                    [(key,) for key, _, _ in rows[:-self.max_entries]]
+                )
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            conn = self._connect()
+            entry = self._entries.get(key)
+            now = time.time()
+            if entry is None:
+                self.misses += 1
+                return None
+            created_at, value = entry
+            if now - created_at > self.ttl_seconds:
+                del self._entries[key]
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            conn = self._connect()
+            now = time.time()
+            self._entries[key] = (now, value)
+            self._entries.move_to_end(key)
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+            while len(self._entries) > self.max_entries:
+                old_key, _ = self._entries.popitem(last=False)
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (old_key,))
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connect().execute("DELETE FROM llm_cache")
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+
+# Общий кэш процесса
+llm_cache = LLMCache(CACHE_PATH)
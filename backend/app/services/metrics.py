@@ -0,0 +1,332 @@
+"""
+Метрики процесса в формате Prometheus.
+
+Реестр REGISTRY хранит счётчики и гистограммы с метками; значения,
+которые уже считают другие сервисы (кэши, контроль допуска), снимаются
+в момент запроса /metrics функциями-коллекторами, поэтому на горячем
+пути они ничего не стоят.
+
+Источники:
+- MetricsMiddleware - число и длительность запросов по шаблону
+  маршрута ("/api/places/{place_id}", а не конкретный путь), запросы
+  в работе;
+- хуки SQLAlchemy (install_sql_hooks) - число запросов к БД и время БД
+  на HTTP-запрос; одинаковый SQL, выполненный в одном запросе
+  N_PLUS_ONE_THRESHOLD раз и больше, считается признаком N+1 и пишется
+  в лог вместе с маршрутом (один раз на пару маршрут/запрос);
+- observe_llm() - длительность и токены вызовов LLM;
+- коллекторы кэша ответов, кэша LLM и контроля допуска.
+
+render() отдаёт текстовый формат экспозиции Prometheus 0.0.4.
+"""
+
+import logging
+import os
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+from starlette.routing import Match
+
+logger = logging.getLogger(__name__)
+
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "10"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0)
+
+Labels = Tuple[str, ...]
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(names: Tuple[str, ...], values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._lock = Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{format_labels(self.labels, labels)} {format_value(value)}"
+            for labels, value in items
+        ]
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[Labels, float] = {}
+
+    def add(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{format_labels(self.labels, labels)} {format_value(value)}"
+            for labels, value in items
+        ]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets: Iterable[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [счётчики по корзинам (последняя - +Inf), сумма, количество]
+        self._values: Dict[Labels, list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(labels, (list(counts), total, count)) for labels, (counts, total, count) in self._values.items()]
+        lines = self.header()
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{format_labels(self.labels, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.labels, labels)} {format_value(total)}")
+            lines.append(f"{self.name}_count{format_labels(self.labels, labels)} {count}")
+        return lines
+
+
+@dataclass
+class Collected:
+    """Значение, снятое коллектором в момент запроса /metrics."""
+    name: str
+    help: str
+    kind: str
+    samples: List[Tuple[Dict[str, str], float]]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[Metric] = []
+        self.collectors: List[Callable[[], Iterable[Collected]]] = []
+
+    def register(self, metric: Metric):
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[Collected]]) -> None:
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for collector in self.collectors:
+            try:
+                collected = list(collector())
+            except Exception:
+                logger.exception("Ошибка коллектора метрик")
+                continue
+            for item in collected:
+                lines.append(f"# HELP {item.name} {item.help}")
+                lines.append(f"# TYPE {item.name} {item.kind}")
+                for labels, value in item.samples:
+                    label_text = format_labels(tuple(labels), tuple(labels.values()))
+                    lines.append(f"{item.name}{label_text} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+http_requests = REGISTRY.register(Counter(
+    "http_requests_total", "Число HTTP-запросов", ("method", "route", "status")))
+http_latency = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "Длительность HTTP-запросов", ("method", "route")))
+http_in_flight = REGISTRY.register(Gauge(
+    "http_requests_in_flight", "HTTP-запросы в работе"))
+db_queries = REGISTRY.register(Histogram(
+    "db_queries_per_request", "Число SQL-запросов на HTTP-запрос", ("route",), QUERY_COUNT_BUCKETS))
+db_time = REGISTRY.register(Histogram(
+    "db_time_per_request_seconds", "Время SQL-запросов на HTTP-запрос", ("route",)))
+db_n_plus_one = REGISTRY.register(Counter(
+    "db_n_plus_one_total", "HTTP-запросы с повторяющимся SQL (признак N+1)", ("route",)))
+llm_latency = REGISTRY.register(Histogram(
+    "llm_request_duration_seconds", "Длительность вызовов LLM", ("operation",), LLM_BUCKETS))
+llm_tokens = REGISTRY.register(Counter(
+    "llm_tokens_total", "Оценка токенов запросов и ответов LLM", ("operation", "kind")))
+
+
+@dataclass
+class RequestStats:
+    """SQL-статистика текущего HTTP-запроса."""
+    queries: int = 0
+    db_seconds: float = 0.0
+    statements: Dict[str, int] = field(default_factory=dict)
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+# Пары (маршрут, SQL), о которых уже сообщено в лог
+_reported_n_plus_one = set()
+
+
+def route_template(scope) -> str:
+    """
+    Шаблон маршрута для метки. Если запрос не дошёл до роутера (ответ
+    из кэша), маршрут ищется по таблице маршрутов приложения.
+    """
+    route = scope.get("route")
+    if route is None and "app" in scope:
+        for candidate in scope["app"].router.routes:
+            if candidate.matches(scope)[0] == Match.FULL:
+                route = candidate
+                break
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: длительность и статус запросов, SQL-статистика на запрос."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_in_flight.add(amount=1)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_in_flight.add(amount=-1)
+            current_request.reset(token)
+            route = route_template(scope)
+            method = scope["method"]
+            http_requests.inc(method, route, str(status))
+            http_latency.observe(time.perf_counter() - started, method, route)
+            db_queries.observe(stats.queries, route)
+            db_time.observe(stats.db_seconds, route)
+            check_n_plus_one(route, stats)
+
+
+def check_n_plus_one(route: str, stats: RequestStats) -> None:
+    repeated = [(sql, n) for sql, n in stats.statements.items() if n >= N_PLUS_ONE_THRESHOLD]
+    if not repeated:
+        return
+    db_n_plus_one.inc(route)
+    for sql, n in repeated:
+        if (route, sql) not in _reported_n_plus_one:
+            _reported_n_plus_one.add((route, sql))
+            logger.warning("Возможный N+1 в %s: запрос выполнен %d раз: %s", route, n, " ".join(sql.split())[:300])
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context.metrics_started = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_request.get()
+    started = getattr(context, "metrics_started", None)
+    if stats is None or started is None:
+        return
+    stats.queries += 1
+    stats.db_seconds += time.perf_counter() - started
+    stats.statements[statement] = stats.statements.get(statement, 0) + 1
+
+
+def install_sql_hooks(*engines) -> None:
+    """Подписка на события движков (синхронных; для async - engine.sync_engine)."""
+    for engine in engines:
+        if not event.contains(engine, "before_cursor_execute", before_cursor_execute):
+            event.listen(engine, "before_cursor_execute", before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+
+def observe_llm(operation: str, seconds: float, prompt_tokens: int, completion_tokens: int) -> None:
+    llm_latency.observe(seconds, operation)
+    llm_tokens.inc(operation, "prompt", amount=prompt_tokens)
+    llm_tokens.inc(operation, "completion", amount=completion_tokens)
+
+
+def stats_collector(prefix: str, help_text: str, source: Callable[[], Dict[str, float]], counters: Iterable[str]):
+    """
+    Коллектор для сервисов с методом stats(): ключи из counters
+    экспонируются как счётчики, остальные - как gauge.
+    """
+    counters = set(counters)
+
+    def collect() -> List[Collected]:
+        result = []
+        for key, value in source().items():
+            kind = "counter" if key in counters else "gauge"
+            name = f"{prefix}_{key}_total" if kind == "counter" else f"{prefix}_{key}"
+            result.append(Collected(name, f"{help_text}: {key}", kind, [({}, value)]))
+        return result
+
+    return collect
@@ -0,0 +1,203 @@
+"""
+Очередь модерации отзывов с арендой.
+
+Порядок очереди: больше жалоб - раньше, при равенстве - старше (меньше id);
+его покрывает индекс ix_reviews_queue (status, reports_count DESC, id).
+
+- claim(): один UPDATE ... RETURNING выставляет модератору аренду на пачку
+  отзывов из головы очереди. Свободными считаются отзывы без аренды или
+  с истёкшей арендой, поэтому одновременные модераторы получают
+  непересекающиеся пачки (SQLite сериализует запись, на PostgreSQL
+  подзапрос выбирает строки с FOR UPDATE SKIP LOCKED).
+- queue_page(): просмотр очереди с keyset-пагинацией по курсору
+  "жалобы:id".
+- decide(): решение по многим отзывам в одной транзакции - смена статуса
+  условным UPDATE ... RETURNING на каждый прежний статус (дельты считаются
+  только по действительно изменённым строкам), агрегаты мест - executemany по местам, счётчики
+  модерации и закрытие жалоб на рассмотренные отзывы.
+"""
+
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.place import Place
+from app.models.premoderation import PremoderationDecision
+from app.models.review import Review, ReviewStatus
+from app.models.user import User
+from app.services.moderation_stats import PENDING_REVIEWS, counter_delta, pending_delta, resolve_reports
+from app.services.place_stats import bulk_review_delta, review_delta_params, status_delta
+
+LEASE_SECONDS = int(os.getenv("MODERATION_LEASE_SECONDS", "600"))
+CLAIM_LIMIT = 100
+
+QUEUE_ORDER = (Review.reports_count.desc(), Review.id.asc())
+
+
+def now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def available_to(moderator_id: int, moment: datetime):
+    """Отзыв не арендован другим модератором (или его аренда истекла)."""
+    return or_(
+        Review.claimed_by.is_(None),
+        Review.claimed_by == moderator_id,
+        Review.lease_expires_at < moment
+    )
+
+
+def encode_cursor(review: Review) -> str:
+    return f"{review.reports_count}:{review.id}"
+
+
+def decode_cursor(cursor: str) -> Tuple[int, int]:
+    reports, review_id = cursor.split(":")
+    return int(reports), int(review_id)
+
+
+def after_cursor(cursor: Tuple[int, int]):
+    """Позиции очереди строго после курсора в порядке QUEUE_ORDER."""
+    reports, review_id = cursor
+    return or_(
+        Review.reports_count < reports,
+        and_(Review.reports_count == reports, Review.id > review_id)
+    )
+
+
+def with_names(query):
+    """Отзывы очереди с именами автора и места для ответа API."""
+    return (
+        query.add_columns(User.name, Place.name)
+        .join(User, User.id == Review.user_id)
+        .join(Place, Place.id == Review.place_id)
+    )
+
+
+async def claim(db: AsyncSession, moderator_id: int, limit: int) -> List[Tuple[Review, str, str]]:
+    """Аренда до limit отзывов из головы очереди (с commit)."""
+    moment = now()
+    head = (
+        select(Review.id)
+        .where(Review.status == ReviewStatus.PENDING, available_to(moderator_id, moment))
+        .order_by(*QUEUE_ORDER)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    claimed_ids = (await db.execute(
+        update(Review)
+        .where(Review.id.in_(head.scalar_subquery()))
+        .values(claimed_by=moderator_id, lease_expires_at=moment + timedelta(seconds=LEASE_SECONDS))
+        .returning(Review.id)
+        .execution_options(synchronize_session=False)
+    )).scalars().all()
+    await db.commit()
+    if not claimed_ids:
+        return []
+    rows = (await db.execute(
+        with_names(select(Review)).where(Review.id.in_(claimed_ids)).order_by(*QUEUE_ORDER)
+    )).all()
+    return [tuple(row) for row in rows]
+
+
+async def release(db: AsyncSession, moderator_id: int) -> int:
+    """Возврат всех арендованных модератором отзывов в очередь (с commit)."""
+    result = await db.execute(
+        update(Review)
+        .where(Review.claimed_by == moderator_id, Review.status == ReviewStatus.PENDING)
+        .values(claimed_by=None, lease_expires_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def queue_page(
+    db: AsyncSession,
+    moderator_id: int,
+    cursor: Optional[Tuple[int, int]],
+    limit: int,
+    mine: bool = False
+) -> List[Tuple[Review, str, str]]:
+    """
+    Страница очереди: доступные модератору отзывы или (mine=True)
+    только арендованные им.
+    """
+    moment = now()
+    query = with_names(select(Review)).where(Review.status == ReviewStatus.PENDING)
+    if mine:
+        query = query.where(Review.claimed_by == moderator_id, Review.lease_expires_at >= moment)
+    else:
+        query = query.where(available_to(moderator_id, moment))
+    if cursor is not None:
+        query = query.where(after_cursor(cursor))
+    rows = (await db.execute(query.order_by(*QUEUE_ORDER).limit(limit))).all()
+    return [tuple(row) for row in rows]
+
+
+async def decide(
+    db: AsyncSession,
+    moderator_id: int,
+    review_ids: List[int],
+    new_status: ReviewStatus,
+    human: bool = True
+) -> Tuple[List[int], List[int], Set[int]]:
+    """
+    Смена статуса отзывов в одной транзакции (с commit).
+    Пропускаются несуществующие отзывы и арендованные другими модераторами.
+    Решение человека (human=True) дописывается к решениям премодерации
+    и закрывает жалобы на рассмотренные отзывы.
+    Возвращает (обработанные id, пропущенные id, id мест с изменёнными агрегатами).
+    """
+    moment = now()
+    current = (await db.execute(
+        select(Review.id, Review.status)
+        .where(Review.id.in_(review_ids), available_to(moderator_id, moment))
+    )).all()
+    by_status: Dict[ReviewStatus, List[int]] = defaultdict(list)
+    for row in current:
+        by_status[row.status].append(row.id)
+
+    # Статус и аренда перепроверяются в самом UPDATE: отзыв, который успел
+    # решить другой модератор, не вернётся, и его дельта не применится дважды
+    processed: List[int] = []
+    deltas: Dict[int, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+    pending = 0
+    for old_status, ids in by_status.items():
+        changed = (await db.execute(
+            update(Review)
+            .where(Review.id.in_(ids), Review.status == old_status, available_to(moderator_id, moment))
+            .values(status=new_status, claimed_by=None, lease_expires_at=None)
+            .returning(Review.id, Review.place_id, Review.rating)
+            .execution_options(synchronize_session=False)
+        )).all()
+        delta = status_delta(old_status, new_status)
+        for row in changed:
+            processed.append(row.id)
+            pending += pending_delta(old_status, new_status)
+            if delta:
+                deltas[row.place_id][row.rating] += delta
+
+    found = set(processed)
+    skipped = [review_id for review_id in review_ids if review_id not in found]
+
+    if processed and human:
+        await db.execute(
+            update(PremoderationDecision)
+            .where(PremoderationDecision.review_id.in_(processed))
+            .values(human_status=new_status.value)
+            .execution_options(synchronize_session=False)
+        )
+        await resolve_reports(db, processed)
+    if pending:
+        await db.execute(counter_delta(PENDING_REVIEWS, pending))
+    if deltas:
+        await db.execute(bulk_review_delta(), [
+            review_delta_params(place_id, place_deltas) for place_id, place_deltas in deltas.items()
+        ])
+    await db.commit()
+    return processed, skipped, set(deltas)
@@ -0,0 +1,211 @@
+"""
+Счётчики модерации и сведение жалоб на отзывы.
+
+Дашборд модератора опрашивает /api/moderation/stats постоянно, поэтому
+число отзывов в очереди и открытых жалоб хранится в таблице counters.
+Счётчики меняются UPDATE'ом value = value + delta в той же транзакции,
+что и отзыв, жалоба или решение модератора: /stats читает две строки
+по первичному ключу вместо COUNT(*) по отзывам.
+
+rebuild_counters() пересчитывает значения по таблицам целиком - при
+запуске приложения (новая БД, ручные правки, каскадные удаления).
+
+Жалобы на один отзыв сводятся в одну запись review_reports: число
+жалоб и различные причины. Повторная жалоба того же пользователя
+не учитывается (review_report_authors).
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, func, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models.counter import Counter
+from app.models.report import ReportStatus, ReviewReport, ReviewReportAuthor
+from app.models.review import Review, ReviewStatus
+from app.models.user import User
+
+PENDING_REVIEWS = "pending_reviews"
+OPEN_REPORTS = "open_reports"
+
+# Сколько различных причин хранится в сводной жалобе
+MAX_REASONS = 20
+REASON_LENGTH = 200
+
+REPORTS_ORDER = (ReviewReport.count.desc(), ReviewReport.id.asc())
+
+
+def counter_delta(name: str, delta: int):
+    """UPDATE счётчика на delta. Выполняется в транзакции вызывающего кода."""
+    return (
+        update(Counter)
+        .where(Counter.name == name)
+        .values(value=Counter.value + delta)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def pending_delta(old: Optional[ReviewStatus], new: Optional[ReviewStatus]) -> int:
+    """Изменение числа отзывов в очереди при смене статуса (None - отзыва нет)."""
+    return int(new == ReviewStatus.PENDING) - int(old == ReviewStatus.PENDING)
+
+
+async def read_counters(db: AsyncSession) -> Dict[str, int]:
+    rows = (await db.execute(
+        select(Counter.name, Counter.value).where(Counter.name.in_([PENDING_REVIEWS, OPEN_REPORTS]))
+    )).all()
+    return {name: value for name, value in rows}
+
+
+def rebuild_counters(db: Session) -> Dict[str, Tuple[Optional[int], int]]:
+    """
+    Пересчёт счётчиков по таблицам (с commit).
+    Возвращает расхождения {имя: (хранимое, пересчитанное)}.
+    """
+    actual = {
+        PENDING_REVIEWS: db.scalar(select(func.count(Review.id)).where(Review.status == ReviewStatus.PENDING)),
+        OPEN_REPORTS: db.scalar(select(func.count(ReviewReport.id)).where(ReviewReport.status == ReportStatus.OPEN)),
+    }
+    stored = dict(db.execute(select(Counter.name, Counter.value)).all())
+    drift = {name: (stored.get(name), value) for name, value in actual.items() if stored.get(name) != value}
+    for name, (old, value) in drift.items():
+        if old is None:
+            db.add(Counter(name=name, value=value))
+        else:
+            db.execute(update(Counter).where(Counter.name == name).values(value=value))
+    db.commit()
+    return drift
+
+
+async def add_report(db: AsyncSession, review: Review, user_id: int, reason: str) -> bool:
+    """
+    Учёт жалобы пользователя на отзыв в сводной записи (без commit).
+    Возвращает False, если пользователь уже жаловался на этот отзыв.
+    """
+    reason = reason.strip()[:REASON_LENGTH]
+    try:
+        async with db.begin_nested():
+            await db.execute(insert(ReviewReportAuthor).values(review_id=review.id, user_id=user_id))
+    except IntegrityError:
+        return False
+
+    created_elsewhere = False
+    while True:
+        report = (await db.execute(
+            select(ReviewReport.id, ReviewReport.count, ReviewReport.reasons, ReviewReport.status)
+            .where(ReviewReport.review_id == review.id)
+        )).first()
+        if report is None:
+            try:
+                async with db.begin_nested():
+                    db.add(ReviewReport(
+                        review_id=review.id, count=1, reasons=[reason] if reason else [],
+                        status=ReportStatus.OPEN, first_reporter_id=user_id
+                    ))
+            except IntegrityError:
+                # Сводную запись одновременно создал другой запрос - обновляем её
+                if created_elsewhere:
+                    raise
+                created_elsewhere = True
+                continue
+            await db.execute(counter_delta(OPEN_REPORTS, 1))
+            await bump_reports_count(db, review.id)
+            return True
+
+        reasons = list(report.reasons or [])
+        if reason and reason not in reasons and len(reasons) < MAX_REASONS:
+            reasons.append(reason)
+        values = {"count": ReviewReport.count + 1, "reasons": reasons}
+        if report.status != ReportStatus.OPEN:
+            # Новая жалоба после рассмотрения снова открывает запись
+            values["status"] = ReportStatus.OPEN
+        # Причины дописываются в Python, поэтому запись обновляется, только
+        # если с чтения её не изменила другая жалоба (count растёт с каждой)
+        result = await db.execute(
+            update(ReviewReport)
+            .where(
+                ReviewReport.id == report.id,
+                ReviewReport.count == report.count,
+                ReviewReport.status == report.status
+            )
+            .values(values)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount:
+            break
+        # Иначе - перечитываем: другая жалоба уже записана, так что повтор
+        # не бесконечен
+
+    if report.status != ReportStatus.OPEN:
+        await db.execute(counter_delta(OPEN_REPORTS, 1))
+    await bump_reports_count(db, review.id)
+    return True
+
+
+async def bump_reports_count(db: AsyncSession, review_id: int) -> None:
+    """Число жалоб на отзыв поднимает его в очереди модерации."""
+    await db.execute(
+        update(Review)
+        .where(Review.id == review_id)
+        .values(reports_count=Review.reports_count + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def resolve_reports(db: AsyncSession, review_ids: Iterable[int]) -> int:
+    """Закрытие открытых жалоб на отзывы (без commit). Возвращает число закрытых."""
+    review_ids = list(review_ids)
+    if not review_ids:
+        return 0
+    result = await db.execute(
+        update(ReviewReport)
+        .where(ReviewReport.review_id.in_(review_ids), ReviewReport.status == ReportStatus.OPEN)
+        .values(status=ReportStatus.RESOLVED)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount:
+        await db.execute(counter_delta(OPEN_REPORTS, -result.rowcount))
+    return result.rowcount
+
+
+async def drop_reports(db: AsyncSession, review_id: int) -> None:
+    """Удаление жалоб вместе с отзывом (без commit)."""
+    await resolve_reports(db, [review_id])
+    await db.execute(delete(ReviewReport).where(ReviewReport.review_id == review_id))
+    await db.execute(delete(ReviewReportAuthor).where(ReviewReportAuthor.review_id == review_id))
+
+
+def encode_cursor(report: ReviewReport) -> str:
+    return f"{report.count}:{report.id}"
+
+
+def decode_cursor(cursor: str) -> Tuple[int, int]:
+    count, report_id = cursor.split(":")
+    return int(count), int(report_id)
+
+
+async def open_reports_page(
+    db: AsyncSession,
+    cursor: Optional[Tuple[int, int]],
+    limit: int
+) -> List[Tuple[ReviewReport, Review, Optional[str]]]:
+    """
+    Открытые жалобы с отзывом и именем первого пожаловавшегося:
+    больше жалоб - раньше, keyset-пагинация по курсору "число:id".
+    """
+    query = (
+        select(ReviewReport, Review, User.name)
+        .join(Review, Review.id == ReviewReport.review_id)
+        .outerjoin(User, User.id == ReviewReport.first_reporter_id)
+        .where(ReviewReport.status == ReportStatus.OPEN)
+    )
+    if cursor is not None:
+        count, report_id = cursor
+        query = query.where(or_(
+            ReviewReport.count < count,
+            and_(ReviewReport.count == count, ReviewReport.id > report_id)
+        ))
+    rows = (await db.execute(query.order_by(*REPORTS_ORDER).limit(limit))).all()
+    return [tuple(row) for row in rows]
@@ -0,0 +1,107 @@
+"""
+Сервис хэширования паролей.
+
+bcrypt занимает 100-300 мс CPU на вызов, поэтому хэширование и проверка
+выполняются в ограниченном пуле процессов. Число задач в работе и в
+очереди ограничено: при насыщении сервис сразу отказывает
+(PasswordHasherBusy), а роутер отвечает 503 с Retry-After, вместо того
+чтобы копить запросы.
+
+Стоимость bcrypt задаётся BCRYPT_ROUNDS. Хэши с другой стоимостью
+считаются устаревшими и перехэшируются при успешном входе.
+"""
+
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+from typing import Iterable, List, Optional, Tuple
+
+from passlib.context import CryptContext
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASHER_WORKERS = int(os.getenv("HASHER_WORKERS", str(os.cpu_count() or 2)))
+# Сколько задач может ждать свободного процесса сверх числа воркеров
+HASHER_QUEUE_SIZE = int(os.getenv("HASHER_QUEUE_SIZE", str(4 * HASHER_WORKERS)))
+RETRY_AFTER_SECONDS = 1
+
+# Хэширование паролей через bcrypt
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS
+)
+
+
+def verify_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Проверка пароля; вторым элементом - новый хэш, если старый устарел."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+def hash_password(password: str) -> str:
+    """Хэширование пароля."""
+    return pwd_context.hash(password)
+
+
+class PasswordHasherBusy(Exception):
+    """Пул хэширования насыщен, запрос нужно повторить позже."""
+
+
+class PasswordHasher:
+    """Ограниченный пул процессов для bcrypt с async-интерфейсом."""
+
+    def __init__(self, workers: int = HASHER_WORKERS, queue_size: int = HASHER_QUEUE_SIZE):
+        self.workers = workers
+        self.capacity = workers + queue_size
+        self.in_flight = 0
+        self.rejected = 0
+        self._lock = Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: fork из процесса с потоками (пул anyio, uvicorn) небезопасен
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    async def _submit(self, fn, *args):
+        with self._lock:
+            if self.in_flight >= self.capacity:
+                self.rejected += 1
+                raise PasswordHasherBusy()
+            self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(hash_password, password)
+
+    async def verify(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        return await self._submit(verify_password, password, hashed_password)
+
+    def hash_many(self, passwords: Iterable[str]) -> List[str]:
+        """Пакетное хэширование для скриптов (синхронно, без лимита очереди)."""
+        passwords = list(passwords)
+        chunksize = max(1, len(passwords) // (self.workers * 4))
+        return list(self._get_executor().map(hash_password, passwords, chunksize=chunksize))
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+# Общий пул процесса
+password_hasher = PasswordHasher()
@@ -0,0 +1,136 @@
+"""
+Материализованные агрегаты рейтинга мест.
+
+В таблице places для каждого места хранятся сумма оценок, число
+одобренных отзывов, гистограмма оценок (rating_1..rating_5) и средний
+рейтинг. Они меняются одним UPDATE в той же транзакции, что и статус
+отзыва, поэтому каталог не считает AVG/COUNT по отзывам на каждый запрос.
+
+rebuild_place_stats() пересчитывает агрегаты по таблице отзывов целиком
+и сообщает о расхождениях (запуск: python rebuild_place_stats.py).
+"""
+
+from typing import Dict, List, Tuple
+
+from sqlalchemy import bindparam, case, func, select, update
+from sqlalchemy.orm import Session
+
+from app.models.place import Place
+from app.models.review import Review, ReviewStatus
+
+HISTOGRAM_COLUMNS = {
+    1: Place.rating_1,
+    2: Place.rating_2,
+    3: Place.rating_3,
+    4: Place.rating_4,
+    5: Place.rating_5,
+}
+
+
+def review_delta(place_id: int, rating: int, delta: int):
+    """
+    UPDATE, добавляющий (delta=1) или убирающий (delta=-1) одобренный
+    отзыв из агрегатов места. Выполняется в транзакции вызывающего кода.
+    """
+    new_count = Place.reviews_count + delta
+    new_sum = Place.rating_sum + delta * rating
+    histogram_column = HISTOGRAM_COLUMNS[rating]
+    return (
+        update(Place)
+        .where(Place.id == place_id)
+        .values({
+            Place.reviews_count: new_count,
+            Place.rating_sum: new_sum,
+            histogram_column: histogram_column + delta,
+            Place.rating: case((new_count > 0, func.round(new_sum * 1.0 / new_count, 2)), else_=0.0),
+        })
+        .execution_options(synchronize_session=False)
+    )
+
+
+def bulk_review_delta():
+    """
+    UPDATE агрегатов места на произвольную дельту по каждой оценке -
+    для executemany с параметрами из review_delta_params().
+    Core-UPDATE по таблице: ORM-вариант со списком параметров
+    превратился бы в bulk UPDATE по первичному ключу.
+    """
+    places = Place.__table__
+    new_count = places.c.reviews_count + bindparam("d_count")
+    new_sum = places.c.rating_sum + bindparam("d_sum")
+    return (
+        update(places)
+        .where(places.c.id == bindparam("place_id"))
+        .values({
+            places.c.reviews_count: new_count,
+            places.c.rating_sum: new_sum,
+            **{
+                places.c[f"rating_{star}"]: places.c[f"rating_{star}"] + bindparam(f"d_{star}")
+                for star in HISTOGRAM_COLUMNS
+            },
+            places.c.rating: case((new_count > 0, func.round(new_sum * 1.0 / new_count, 2)), else_=0.0),
+        })
+    )
+
+
+def review_delta_params(place_id: int, deltas: Dict[int, int]) -> Dict[str, int]:
+    """Параметры bulk_review_delta(): deltas - изменение числа отзывов по оценкам."""
+    return {
+        "place_id": place_id,
+        "d_count": sum(deltas.values()),
+        "d_sum": sum(star * delta for star, delta in deltas.items()),
+        **{f"d_{star}": deltas.get(star, 0) for star in HISTOGRAM_COLUMNS},
+    }
+
+
+def status_delta(old: ReviewStatus, new: ReviewStatus) -> int:
+    """Изменение числа одобренных отзывов при смене статуса."""
+    return int(new == ReviewStatus.APPROVED) - int(old == ReviewStatus.APPROVED)
+
+
+def rebuild_place_stats(db: Session, fix: bool = True) -> List[Tuple[int, Dict, Dict]]:
+    """
+    Полный пересчёт агрегатов по одобренным отзывам.
+    Возвращает расхождения (place_id, хранимые, пересчитанные);
+    при fix=True хранимые значения исправляются.
+    """
+    counts = {
+        star: func.sum(case((Review.rating == star, 1), else_=0))
+        for star in HISTOGRAM_COLUMNS
+    }
+    rows = db.execute(
+        select(Review.place_id, func.count(Review.id), func.sum(Review.rating), *counts.values())
+        .where(Review.status == ReviewStatus.APPROVED)
+        .group_by(Review.place_id)
+    ).all()
+    actual = {
+        row[0]: {
+            "reviews_count": row[1],
+            "rating_sum": row[2],
+            **{f"rating_{star}": row[3 + i] for i, star in enumerate(HISTOGRAM_COLUMNS)}
+        }
+        for row in rows
+    }
+
+    empty = {"reviews_count": 0, "rating_sum": 0, **{f"rating_{star}": 0 for star in HISTOGRAM_COLUMNS}}
+    stored_columns = [Place.id, Place.reviews_count, Place.rating_sum, *HISTOGRAM_COLUMNS.values()]
+    drift = []
+    for row in db.execute(select(*stored_columns)).all():
+        stored = dict(zip(empty, row[1:]))
+        expected = actual.get(row[0], empty)
+        if stored != expected:
+            drift.append((row[0], stored, expected))
+
+    if fix and drift:
+        db.execute(update(Place), [
+            {
+                "id": place_id,
+                **expected,
+                "rating": round(expected["rating_sum"] / expected["reviews_count"], 2)
+                if expected["reviews_count"] else 0.0
+            }
+            for place_id, _, expected in drift
+        ])
+        db.commit()
+
+    return drift
@@ -0,0 +1,401 @@
+"""
+Автоматическая премодерация отзывов.
+
+Отзыв прогоняется через цепочку проверок (Check), каждая добавляет баллы
+и причины. По сумме баллов принимается решение:
+- reject:   score >= REJECT_SCORE (например, нецензурная лексика);
+- approve:  score < APPROVE_SCORE и нет причин для подозрений;
+- escalate: иначе - отзыв остаётся в очереди модераторов.
+
+Проверки:
+- StopWordCheck: скомпилированный автомат Ахо-Корасик по словарю
+  (нецензурные корни, спам-фразы); текст нормализуется - регистр, ё,
+  латинские и цифровые двойники кириллических букв;
+- SpamHeuristicsCheck: плотность ссылок, повторы слов и символов,
+  капслок, одинаковый текст от разных пользователей;
+- ClassifierCheck: необязательный наивный байесовский классификатор,
+  обученный на решениях модераторов (premoderate_reviews.py train).
+
+Режим PREMODERATION_MODE: enforce - решение применяется, shadow - только
+записывается, off - премодерация выключена. Решения пишутся в
+premoderation_decisions; итог модератора дописывается туда же, что даёт
+точность и полноту автомата (premoderate_reviews.py report).
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+import time
+from collections import Counter, OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import BASE_DIR
+from app.models.premoderation import PremoderationDecision
+from app.services.search_index import WORD_RE, stem, words
+
+PREMODERATION_MODE = os.getenv("PREMODERATION_MODE", "enforce")
+MODEL_PATH = BASE_DIR / "premoderation_model.json"
+
+REJECT_SCORE = 1.0
+APPROVE_SCORE = 0.3
+
+# Нецензурные корни ("*" - корень, слово может продолжаться)
+PROFANITY = (
+    "хуй*", "хуе*", "хуё*", "хуя*", "пизд*", "ебал*", "ебан*", "ебат*", "выеб*", "заеб*",
+    "бля", "блять", "бляд*", "сука", "суки", "мудак*", "мудил*", "гандон*", "пидор*", "пидар*",
+)
+# Спам-фразы
+SPAM_PHRASES = (
+    "казино*", "ставки на спорт", "букмекер*", "заработок в интернете", "заработай*",
+    "промокод*", "кредит*", "займ*", "подписывайтесь", "переходите по ссылке",
+    "пишите в личк*", "viagra", "crypto*", "криптовалют*",
+)
+
+# Двойники кириллических букв: латиница, цифры, символы
+LOOKALIKES = str.maketrans({
+    "a": "а", "b": "в", "c": "с", "e": "е", "h": "н", "k": "к", "m": "м", "o": "о",
+    "p": "р", "t": "т", "x": "х", "y": "у", "0": "о", "3": "з", "4": "ч",
+    "6": "б", "@": "а", "$": "с", "ё": "е",
+})
+
+# Ссылка: схема или www целиком, иначе домен по окончанию (без просмотра
+# назад - так регулярное выражение не перебирает каждое слово)
+URL_RE = re.compile(r"(?:https?://|www\.|t\.me/)\S*|\.(?:ru|com|net|org|info|xyz|рф|su)\b")
+REPEAT_RE = re.compile(r"(.)\1{4,}")
+UPPER_RE = re.compile(r"[A-ZА-ЯЁ]")
+LETTER_RE = re.compile(r"[^\W\d_]")
+
+
+# Латиница, символы и цифры внутри слов требуют замены (в обычном
+# русском тексте их почти нет, и перевод таблицей пропускается)
+NEEDS_TRANSLATION_RE = re.compile(r"[a-z@$ё]")
+DIGIT_IN_WORD_RE = re.compile(r"[^\W\d]\d|\d[^\W\d]")
+
+
+def normalize(text: str) -> str:
+    text = text.lower()
+    if NEEDS_TRANSLATION_RE.search(text) or (any(ch.isdigit() for ch in text) and DIGIT_IN_WORD_RE.search(text)):
+        return text.translate(LOOKALIKES)
+    return text
+
+
+class AhoCorasick:
+    """
+    Автомат Ахо-Корасик, скомпилированный в полную таблицу переходов:
+    поиск - один словарный переход на символ текста.
+    Шаблон с "*" на конце совпадает с началом слова, без "*" - со словом
+    целиком (границы проверяются по соседним символам).
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns: List[Tuple[str, bool]] = []
+        goto: List[Dict[str, int]] = [{}]
+        outputs: List[List[int]] = [[]]
+        for raw in patterns:
+            prefix = raw.endswith("*")
+            pattern = normalize(raw.rstrip("*"))
+            state = 0
+            for ch in pattern:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    outputs.append([])
+                state = nxt
+            outputs[state].append(len(self.patterns))
+            self.patterns.append((pattern, prefix))
+
+        # Ссылки неудач в порядке BFS; таблица переходов состояния -
+        # переходы его ссылки неудачи, дополненные собственными
+        fail = [0] * len(goto)
+        delta: List[Dict[str, int]] = [dict(goto[0])] + [{} for _ in range(len(goto) - 1)]
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            outputs[state] = outputs[state] + outputs[fail[state]]
+            for ch, nxt in goto[state].items():
+                fail[nxt] = delta[fail[state]].get(ch, 0)
+                queue.append(nxt)
+            delta[state] = {**delta[fail[state]], **goto[state]}
+        self._delta = delta
+        self._outputs = [tuple(o) for o in outputs]
+
+    def find(self, text: str) -> List[str]:
+        """Найденные шаблоны (с учётом границ слов) в нормализованном тексте."""
+        found = []
+        delta, outputs, patterns = self._delta, self._outputs, self.patterns
+        state = 0
+        for end, ch in enumerate(text, 1):
+            state = delta[state].get(ch, 0)
+            if not outputs[state]:
+                continue
+            for index in outputs[state]:
+                pattern, prefix = patterns[index]
+                start = end - len(pattern)
+                if start > 0 and text[start - 1].isalnum():
+                    continue
+                if not prefix and end < len(text) and text[end].isalnum():
+                    continue
+                found.append(pattern)
+        return found
+
+
+@dataclass
+class Decision:
+    action: str  # approve | reject | escalate
+    score: float
+    reasons: List[str] = field(default_factory=list)
+    micros: float = 0.0
+
+
+@dataclass
+class Submission:
+    """Отзыв на проверку."""
+    user_id: int
+    text: str
+    review_id: Optional[int] = None
+
+
+class Check:
+    """Проверка: возвращает баллы подозрительности и причины."""
+
+    def score(self, submission: Submission, normalized: str) -> Tuple[float, List[str]]:
+        raise NotImplementedError
+
+
+class StopWordCheck(Check):
+    """Все словари - один автомат: текст просматривается один раз."""
+
+    def __init__(self, dictionaries: Dict[str, Tuple[Iterable[str], float]]):
+        self.labels: Dict[str, Tuple[str, float]] = {}
+        patterns = []
+        for reason, (words_, weight) in dictionaries.items():
+            for raw in words_:
+                patterns.append(raw)
+                self.labels[normalize(raw.rstrip("*"))] = (reason, weight)
+        self.matcher = AhoCorasick(patterns)
+
+    def score(self, submission, normalized):
+        found = self.matcher.find(normalized)
+        if not found:
+            return 0.0, []
+        labels = [self.labels[w] for w in found]
+        reasons = sorted({f"{reason}:{w}" for w, (reason, _) in zip(found, labels)})
+        return sum(weight for _, weight in labels), reasons
+
+
+class DuplicateTracker:
+    """Отпечатки недавних текстов -> авторы (ограниченный LRU в памяти)."""
+
+    def __init__(self, max_entries: int = 100_000):
+        self.max_entries = max_entries
+        self._authors: "OrderedDict[str, Set[int]]" = OrderedDict()
+
+    @staticmethod
+    def fingerprint(tokens: List[str]) -> str:
+        return hashlib.blake2b(" ".join(tokens).encode(), digest_size=8).hexdigest()
+
+    def other_authors(self, fingerprint: str, user_id: int) -> int:
+        """Регистрация текста автора; число других авторов того же текста."""
+        authors = self._authors.get(fingerprint)
+        if authors is None:
+            authors = self._authors[fingerprint] = set()
+            if len(self._authors) > self.max_entries:
+                self._authors.popitem(last=False)
+        else:
+            self._authors.move_to_end(fingerprint)
+        authors.add(user_id)
+        return len(authors) - 1
+
+
+class SpamHeuristicsCheck(Check):
+    def __init__(self, tracker: DuplicateTracker):
+        self.tracker = tracker
+
+    def score(self, submission, normalized):
+        text = submission.text
+        tokens = WORD_RE.findall(normalized)
+        score, reasons = 0.0, []
+
+        links = len(URL_RE.findall(text.lower()))
+        if links:
+            density = links / max(len(tokens), 1)
+            score += min(1.0, 0.4 * links + 2 * density)
+            reasons.append(f"links:{links}")
+        if len(tokens) >= 8 and len(set(tokens)) / len(tokens) < 0.5:
+            score += 0.4
+            reasons.append("repeated_words")
+        if REPEAT_RE.search(text):
+            score += 0.2
+            reasons.append("repeated_chars")
+        # Доля заглавных > 0.6 при 20+ буквах возможна только от 12 заглавных
+        upper = len(UPPER_RE.findall(text))
+        if upper >= 12 and upper / len(LETTER_RE.findall(text)) > 0.6:
+            score += 0.2
+            reasons.append("caps")
+        if tokens and self.tracker.other_authors(self.tracker.fingerprint(tokens), submission.user_id):
+            score += 0.7
+            reasons.append("duplicate_text")
+        return score, reasons
+
+
+class NaiveBayesClassifier:
+    """Мультиномиальный наивный Байес по основам слов: вероятность отклонения."""
+
+    def __init__(self, log_prior: float = 0.0, log_ratio: Optional[Dict[str, float]] = None,
+                 default_ratio: float = 0.0):
+        self.log_prior = log_prior
+        self.log_ratio = log_ratio or {}
+        self.default_ratio = default_ratio
+
+    @staticmethod
+    def features(text: str) -> List[str]:
+        return [stem(w) for w in words(normalize(text))]
+
+    @classmethod
+    def train(cls, texts: List[str], rejected: List[bool]) -> "NaiveBayesClassifier":
+        counts = {True: Counter(), False: Counter()}
+        docs = Counter(rejected)
+        for text, label in zip(texts, rejected):
+            counts[label].update(cls.features(text))
+        vocabulary = set(counts[True]) | set(counts[False])
+        totals = {label: sum(c.values()) + len(vocabulary) + 1 for label, c in counts.items()}
+        log_ratio = {
+            w: math.log((counts[True][w] + 1) / totals[True]) - math.log((counts[False][w] + 1) / totals[False])
+            for w in vocabulary
+        }
+        return cls(
+            log_prior=math.log((docs[True] + 1) / (docs[False] + 1)),
+            log_ratio=log_ratio,
+            default_ratio=math.log(totals[False] / totals[True])
+        )
+
+    def predict(self, text: str) -> float:
+        logit = self.log_prior + sum(self.log_ratio.get(f, self.default_ratio) for f in self.features(text))
+        return 1.0 / (1.0 + math.exp(-max(min(logit, 50.0), -50.0)))
+
+    def save(self, path) -> None:
+        path.write_text(json.dumps({
+            "log_prior": self.log_prior,
+            "log_ratio": self.log_ratio,
+            "default_ratio": self.default_ratio,
+        }, ensure_ascii=False))
+
+    @classmethod
+    def load(cls, path) -> Optional["NaiveBayesClassifier"]:
+        if not path.exists():
+            return None
+        return cls(**json.loads(path.read_text()))
+
+
+class ClassifierCheck(Check):
+    def __init__(self, classifier: NaiveBayesClassifier, weight: float = 1.0):
+        self.classifier = classifier
+        self.weight = weight
+
+    def score(self, submission, normalized):
+        probability = self.classifier.predict(submission.text)
+        if probability < 0.5:
+            return 0.0, []
+        return self.weight * (probability - 0.5) * 2, [f"classifier:{probability:.2f}"]
+
+
+class PreModerator:
+    """Цепочка проверок и пороги решения."""
+
+    def __init__(self, checks: List[Check], mode: str = PREMODERATION_MODE):
+        self.checks = checks
+        self.mode = mode
+        self.version = hashlib.blake2b(
+            ",".join(type(c).__name__ for c in checks).encode() + repr((PROFANITY, SPAM_PHRASES)).encode(),
+            digest_size=8
+        ).hexdigest()
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    @property
+    def enforced(self) -> bool:
+        return self.mode == "enforce"
+
+    def score(self, submission: Submission) -> Decision:
+        start = time.perf_counter()
+        normalized = normalize(submission.text)
+        total, reasons = 0.0, []
+        for check in self.checks:
+            points, why = check.score(submission, normalized)
+            total += points
+            reasons.extend(why)
+        if total >= REJECT_SCORE:
+            action = "reject"
+        elif total < APPROVE_SCORE and not reasons:
+            action = "approve"
+        else:
+            action = "escalate"
+        return Decision(action, round(total, 3), reasons, (time.perf_counter() - start) * 1e6)
+
+    def score_batch(self, submissions: Iterable[Submission]) -> List[Decision]:
+        """Пакетная оценка (перепроверка очереди)."""
+        return [self.score(s) for s in submissions]
+
+    def record(self, review_id: int, decision: Decision) -> PremoderationDecision:
+        return PremoderationDecision(
+            review_id=review_id,
+            action=decision.action,
+            score=decision.score,
+            reasons=decision.reasons or None,
+            mode=self.mode,
+            version=self.version
+        )
+
+
+def default_checks(model_path=MODEL_PATH) -> List[Check]:
+    checks: List[Check] = [
+        StopWordCheck({
+            "profanity": (PROFANITY, REJECT_SCORE),
+            "spam_phrase": (SPAM_PHRASES, 0.5),
+        }),
+        SpamHeuristicsCheck(DuplicateTracker()),
+    ]
+    classifier = NaiveBayesClassifier.load(model_path)
+    if classifier is not None:
+        checks.append(ClassifierCheck(classifier))
+    return checks
+
+
+async def evaluate(db: AsyncSession) -> Dict[str, Dict[str, float]]:
+    """
+    Точность и полнота автоматических решений по отзывам, которые потом
+    рассматривал модератор: approve против approved, reject против rejected.
+    """
+    rows = (await db.execute(
+        select(PremoderationDecision.action, PremoderationDecision.human_status, func.count())
+        .where(PremoderationDecision.human_status.is_not(None))
+        .group_by(PremoderationDecision.action, PremoderationDecision.human_status)
+    )).all()
+    matrix = Counter({(action, human): n for action, human, n in rows})
+    result = {}
+    for action, human in (("approve", "approved"), ("reject", "rejected")):
+        predicted = sum(n for (a, _), n in matrix.items() if a == action)
+        actual = sum(n for (_, h), n in matrix.items() if h == human)
+        hits = matrix[(action, human)]
+        result[action] = {
+            "predicted": predicted,
+            "actual": actual,
+            "precision": hits / predicted if predicted else 0.0,
+            "recall": hits / actual if actual else 0.0,
+        }
+    result["escalate"] = {"count": sum(n for (a, _), n in matrix.items() if a == "escalate")}
+    return result
+
+
+# Общий премодератор процесса
+premoderator = PreModerator(default_checks())
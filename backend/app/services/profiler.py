@@ -0,0 +1,90 @@
+"""
+Сэмплирующий профилировщик для анализа горячих путей в продакшене.
+
+Отдельный поток раз в interval секунд снимает стеки всех потоков
+процесса (sys._current_frames) и считает одинаковые стеки. Результат -
+"свёрнутые" стеки (функции через ";" и число сэмплов), формат
+flamegraph.pl и speedscope. Накладные расходы - только на время
+профилирования; одновременно идёт не больше одного профиля.
+
+Включается переменной PROFILER_ENABLED=1, см. GET /api/admin/profile.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import List, Optional, Tuple
+
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "0") == "1"
+MAX_SECONDS = 60.0
+MIN_INTERVAL = 0.001
+MAX_DEPTH = 64
+# Функции ожидания: стеки, которые заканчиваются ими, - простой потоков
+IDLE_FUNCTIONS = {
+    ("threading", "wait"), ("selectors", "select"), ("queue", "get"),
+    ("concurrent.futures.thread", "_worker"), ("anyio._backends._asyncio", "run"),
+}
+
+
+class ProfilerBusy(Exception):
+    """Профиль уже снимается."""
+
+
+def frame_name(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}.{code.co_name}:{frame.f_lineno}"
+
+
+def is_idle(frame) -> bool:
+    return (frame.f_globals.get("__name__"), frame.f_code.co_name) in IDLE_FUNCTIONS
+
+
+def collapse(frame) -> str:
+    names = []
+    while frame is not None and len(names) < MAX_DEPTH:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    """Профилировщик по снимкам стеков всех потоков."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def profile(self, seconds: float, interval: float, idle: bool = False) -> Tuple[Counter, int]:
+        """
+        Сэмплирование seconds секунд (блокирует вызывающий поток).
+        idle=False - без стеков простаивающих потоков.
+        """
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy()
+        try:
+            seconds = min(seconds, MAX_SECONDS)
+            interval = max(interval, MIN_INTERVAL)
+            own = threading.get_ident()
+            stacks: Counter = Counter()
+            samples = 0
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id != own and (idle or not is_idle(frame)):
+                        stacks[collapse(frame)] += 1
+                samples += 1
+                time.sleep(interval)
+            return stacks, samples
+        finally:
+            self._lock.release()
+
+
+def render_collapsed(stacks: Counter, limit: Optional[int] = None) -> str:
+    lines: List[str] = [f"{stack} {count}" for stack, count in stacks.most_common(limit)]
+    return "\n".join(lines) + "\n"
+
+
+# Общий профилировщик процесса
+profiler = SamplingProfiler()
@@ -0,0 +1,350 @@
+"""
+Векторный движок рекомендаций мест.
+
+Признаки места:
+- категория (код категории места);
+- теги (posting-листы тег -> строки, вес 1 / число тегов места);
+- байесовски сглаженный рейтинг: (PRIOR * среднее + сумма оценок) / (PRIOR + n),
+  делённый на 5;
+- популярность: log(1 + число отзывов), нормированная на максимум.
+
+Предпочтения пользователя - веса тех же признаков. Оценка всех мест -
+векторные операции над столбцами рейтинга и популярности, выборка веса
+по коду категории и добавка по posting-листам запрошенных тегов;
+top-k - argpartition. Категории и теги хранятся разреженно, поэтому
+новая категория или тег не меняют размер матрицы.
+
+Строки обновляются инкрементально по журналу изменений каталога
+(CatalogIndex.changes_since): одобренный отзыв меняет одну строку,
+столбцы рейтинга и популярности пересчитываются векторно. Полная
+перестройка - только после перезагрузки каталога.
+"""
+
+from dataclasses import dataclass
+from threading import RLock
+from typing import Collection, Dict, Iterable, List, Optional, Set
+
+import numpy as np
+
+from app.schemas.places import PlaceResponse
+from app.services.catalog_index import catalog_index, CatalogIndex
+from app.services.search_index import stem, words
+
+# Сила байесовского сглаживания рейтинга (в "виртуальных отзывах")
+RATING_PRIOR = 5.0
+
+# Веса рейтинга и популярности в предпочтениях по умолчанию
+DEFAULT_RATING_WEIGHT = 1.0
+DEFAULT_POPULARITY_WEIGHT = 0.3
+# Вес явно запрошенных категорий и тегов
+CATEGORY_WEIGHT = 2.0
+TAG_WEIGHT = 1.0
+# Сколько тегов пакетной оценки входит в одно умножение матриц
+BATCH_TAGS = 64
+
+
+@dataclass
+class Preferences:
+    """Предпочтения пользователя: веса категорий, тегов, рейтинга и популярности."""
+    categories: Dict[str, float]
+    tags: Dict[str, float]
+    rating: float = DEFAULT_RATING_WEIGHT
+    popularity: float = DEFAULT_POPULARITY_WEIGHT
+
+
+def _norm(value: str) -> str:
+    return value.strip().lower()
+
+
+class Recommender:
+    """Признаки мест каталога и векторизованная оценка мест."""
+
+    def __init__(self, catalog: CatalogIndex):
+        self._catalog = catalog
+        self._lock = RLock()
+        self._cursor = -1
+        # Строка -> карточка места (None - свободная строка)
+        self.places: List[Optional[PlaceResponse]] = []
+        self.row_of: Dict[int, int] = {}
+        self._free: List[int] = []
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.categories = np.zeros(0, dtype=np.int32)
+        self.tag_weights = np.zeros(0, dtype=np.float32)
+        self.counts = np.zeros(0, dtype=np.float32)
+        self.sums = np.zeros(0, dtype=np.float32)
+        self.category_columns: Dict[str, int] = {}
+        self.tag_rows: Dict[str, Set[int]] = {}
+        self._tag_arrays: Dict[str, np.ndarray] = {}
+        # Столбцы рейтинга и популярности: матрица 2 x число строк
+        self.features = np.zeros((2, 0), dtype=np.float32)
+        # One-hot категорий для пакетной оценки, строится лениво
+        self._categories_onehot: Optional[np.ndarray] = None
+
+    def refresh(self) -> None:
+        """Применение изменений каталога с прошлого раза."""
+        if self._cursor == self._catalog.journal_end:
+            return
+        with self._lock:
+            cursor, changed = self._catalog.changes_since(self._cursor)
+            if cursor == self._cursor:
+                return
+            if changed is None:
+                self._build(self._catalog.all())
+            else:
+                for place_id in dict.fromkeys(changed):
+                    self._set(place_id, self._catalog.get(place_id))
+            self._update_features()
+            self._cursor = cursor
+
+    def _build(self, places: List[PlaceResponse]) -> None:
+        self.places = []
+        self.row_of = {}
+        self._free = []
+        self.category_columns = {}
+        self.tag_rows = {}
+        self._tag_arrays = {}
+        self._categories_onehot = None
+        self._reserve(len(places), reset=True)
+        for place in places:
+            self._set(place.id, place)
+
+    def _reserve(self, capacity: int, reset: bool = False) -> None:
+        if not reset and capacity <= len(self.ids):
+            return
+        keep = 0 if reset else len(self.places)
+
+        def grow(array: np.ndarray, fill) -> np.ndarray:
+            result = np.full(capacity, fill, dtype=array.dtype)
+            result[:keep] = array[:keep]
+            return result
+
+        self.ids = grow(self.ids, -1)
+        self.categories = grow(self.categories, -1)
+        self.tag_weights = grow(self.tag_weights, 0)
+        self.counts = grow(self.counts, 0)
+        self.sums = grow(self.sums, 0)
+
+    def _set(self, place_id: int, place: Optional[PlaceResponse]) -> None:
+        """Запись строки места; place=None - место удалено из каталога."""
+        row = self.row_of.get(place_id)
+        if row is not None:
+            self._clear_row(row)
+            if place is None:
+                del self.row_of[place_id]
+                self.places[row] = None
+                self.categories[row] = -1
+                self._categories_onehot = None
+                self._free.append(row)
+                return
+        elif place is None:
+            return
+        else:
+            if self._free:
+                row = self._free.pop()
+            else:
+                row = len(self.places)
+                if row == len(self.ids):
+                    self._reserve(max(1024, 2 * len(self.ids)))
+                self.places.append(None)
+                self._categories_onehot = None
+            self.row_of[place_id] = row
+
+        self.places[row] = place
+        self.ids[row] = place_id
+        category = _norm(place.category)
+        column = self.category_columns.setdefault(category, len(self.category_columns))
+        if self.categories[row] != column:
+            self.categories[row] = column
+            self._categories_onehot = None
+        self.counts[row] = place.reviewsCount
+        self.sums[row] = place.rating * place.reviewsCount
+        tags = {_norm(tag) for tag in place.tags or []}
+        self.tag_weights[row] = 1.0 / len(place.tags) if place.tags else 0.0
+        for tag in tags:
+            self.tag_rows.setdefault(tag, set()).add(row)
+            self._tag_arrays.pop(tag, None)
+
+    def _clear_row(self, row: int) -> None:
+        for tag in {_norm(tag) for tag in self.places[row].tags or []}:
+            rows = self.tag_rows[tag]
+            rows.discard(row)
+            if not rows:
+                del self.tag_rows[tag]
+            self._tag_arrays.pop(tag, None)
+        self.ids[row] = -1
+        self.tag_weights[row] = 0.0
+        self.counts[row] = 0.0
+        self.sums[row] = 0.0
+
+    def _update_features(self) -> None:
+        n = len(self.places)
+        counts, sums = self.counts[:n], self.sums[:n]
+        total = counts.sum()
+        mean = float(sums.sum() / total) if total else 0.0
+        features = np.empty((2, n), dtype=np.float32)
+        features[0] = (RATING_PRIOR * mean + sums) / (RATING_PRIOR + counts) / 5.0
+        popularity = np.log1p(counts)
+        if n and popularity.max() > 0:
+            popularity /= popularity.max()
+        features[1] = popularity
+        self.features = features
+
+    def _tag_array(self, tag: str) -> Optional[np.ndarray]:
+        rows = self._tag_arrays.get(tag)
+        if rows is None:
+            postings = self.tag_rows.get(tag)
+            if postings is None:
+                return None
+            rows = self._tag_arrays[tag] = np.fromiter(postings, dtype=np.int64, count=len(postings))
+        return rows
+
+    def _category_weights(self, preferences: Preferences) -> np.ndarray:
+        """Вес по коду категории; последний элемент - для свободных строк (код -1)."""
+        weights = np.zeros(len(self.category_columns) + 1, dtype=np.float32)
+        for category, weight in preferences.categories.items():
+            column = self.category_columns.get(_norm(category))
+            if column is not None:
+                weights[column] += weight
+        return weights
+
+    def _add_tags(self, scores: np.ndarray, preferences: Preferences) -> None:
+        for tag, weight in preferences.tags.items():
+            rows = self._tag_array(_norm(tag))
+            if rows is not None:
+                scores[rows] += weight * self.tag_weights[rows]
+
+    def _category_matrix(self) -> np.ndarray:
+        """One-hot категорий (категории x строки); категорий мало, матрица плотная."""
+        if self._categories_onehot is None:
+            n = len(self.places)
+            onehot = np.zeros((len(self.category_columns), n), dtype=np.float32)
+            live = np.flatnonzero(self.categories[:n] >= 0)
+            onehot[self.categories[live], live] = 1.0
+            self._categories_onehot = onehot
+        return self._categories_onehot
+
+    def _tag_weights(self, preferences: List[Preferences], tags: List[str]) -> np.ndarray:
+        """Веса тегов tags в предпочтениях (пользователи x теги)."""
+        column = {tag: i for i, tag in enumerate(tags)}
+        weights = np.zeros((len(preferences), len(tags)), dtype=np.float32)
+        for user, user_preferences in enumerate(preferences):
+            for tag, weight in user_preferences.tags.items():
+                i = column.get(_norm(tag))
+                if i is not None:
+                    weights[user, i] += weight
+        return weights
+
+    def _tag_indicators(self, tags: List[str]) -> np.ndarray:
+        """Признаки тегов tags (теги x строки) из posting-листов."""
+        indicators = np.zeros((len(tags), len(self.places)), dtype=np.float32)
+        for i, tag in enumerate(tags):
+            rows = self._tag_array(tag)
+            indicators[i, rows] = self.tag_weights[rows]
+        return indicators
+
+    def scores(self, preferences: Preferences) -> np.ndarray:
+        """Оценки всех строк; у свободных строк -inf. Вызывается под блокировкой."""
+        n = len(self.places)
+        scores = preferences.rating * self.features[0] + preferences.popularity * self.features[1]
+        scores += self._category_weights(preferences)[self.categories[:n]]
+        self._add_tags(scores, preferences)
+        scores[self.ids[:n] < 0] = -np.inf
+        return scores
+
+    def _mask(self, category: Optional[str]) -> Optional[np.ndarray]:
+        if category is None:
+            return None
+        column = self.category_columns.get(_norm(category))
+        if column is None:
+            return np.zeros(len(self.places), dtype=bool)
+        return self.categories[:len(self.places)] == column
+
+    def recommend(
+        self,
+        preferences: Preferences,
+        k: int = 10,
+        category: Optional[str] = None,
+        offset: int = 0,
+        place_ids: Optional[Collection[int]] = None
+    ) -> List[PlaceResponse]:
+        """
+        Top-k мест по сумме взвешенных признаков.
+        place_ids ограничивает выбор местами из списка (например, ближайшими).
+        """
+        with self._lock:
+            self.refresh()
+            if not self.row_of:
+                return []
+            scores = self.scores(preferences)
+            mask = self._mask(category)
+            if place_ids is not None:
+                in_ids = np.isin(self.ids[:len(self.places)], np.fromiter(place_ids, dtype=np.int64, count=len(place_ids)))
+                mask = in_ids if mask is None else mask & in_ids
+            if mask is not None:
+                scores = np.where(mask, scores, -np.inf)
+            top = _top_k(scores, offset + k)
+            return [self.places[i] for i in top[offset:] if np.isfinite(scores[i])]
+
+    def recommend_batch(self, preferences: Iterable[Preferences], k: int = 10) -> List[List[PlaceResponse]]:
+        """
+        Пакетная оценка: произведение матрицы предпочтений пользователей на
+        матрицы признаков - рейтинга и популярности, one-hot категорий и
+        индикаторов только тех тегов, что есть в предпочтениях пакета.
+        """
+        preferences = list(preferences)
+        with self._lock:
+            self.refresh()
+            n = len(self.places)
+            if not self.row_of or not preferences:
+                return [[] for _ in preferences]
+            # Теги, которые есть в предпочтениях пакета; первые BATCH_TAGS -
+            # в общем умножении, остальные частями
+            tags = sorted({_norm(t) for p in preferences for t in p.tags} & self.tag_rows.keys())
+            head, rest = tags[:BATCH_TAGS], tags[BATCH_TAGS:]
+            weights = np.hstack([
+                np.array([[p.rating, p.popularity] for p in preferences], dtype=np.float32),
+                np.stack([self._category_weights(p)[:-1] for p in preferences]),
+                self._tag_weights(preferences, head),
+            ])
+            matrix = np.vstack([self.features, self._category_matrix(), self._tag_indicators(head)])
+            # пользователи x места: строки непрерывны в памяти для argpartition
+            scores = weights @ matrix
+            for start in range(0, len(rest), BATCH_TAGS):
+                chunk = rest[start:start + BATCH_TAGS]
+                scores += self._tag_weights(preferences, chunk) @ self._tag_indicators(chunk)
+            scores[:, self.ids[:n] < 0] = -np.inf
+            k = min(k, len(self.row_of))
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            result = []
+            for user, candidates in enumerate(top):
+                order = candidates[np.argsort(-scores[user, candidates], kind="stable")]
+                result.append([self.places[i] for i in order])
+            return result
+
+    def preferences_from_text(self, text: str) -> Preferences:
+        """Предпочтения из свободного текста: упомянутые категории и теги."""
+        with self._lock:
+            self.refresh()
+            stems = {stem(w) for w in words(text)}
+            categories = {c: CATEGORY_WEIGHT for c in self.category_columns if _mentions(c, stems)}
+            tags = {t: TAG_WEIGHT for t in self.tag_rows if _mentions(t, stems)}
+            return Preferences(categories=categories, tags=tags)
+
+
+def _mentions(phrase: str, stems: set) -> bool:
+    """Все слова категории/тега упомянуты в тексте (по основам)."""
+    phrase_stems = {stem(w) for w in words(phrase) if len(w) > 2}
+    return bool(phrase_stems) and phrase_stems <= stems
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Индексы k лучших оценок по убыванию (argpartition + сортировка только k)."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+# Общий движок процесса
+recommender = Recommender(catalog_index)
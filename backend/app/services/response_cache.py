@@ -0,0 +1,303 @@
+"""
+Кэш ответов GET-эндпоинтов чтения с ETag и условными запросами.
+
+ResponseCacheMiddleware (ASGI) кэширует ответы 200 маршрутов из
+CACHED_ROUTES целиком (тело и заголовки):
+- ключ - путь, нормализованные параметры запроса (отсортированы, пустые
+  отброшены) и кодировка сжатия, которую получит клиент;
+- у записи есть теги сущностей ("catalog", "place:<id>", "reviews",
+  "users" - имена авторов в списках отзывов):
+  записи мест, отзывов и модерации вызывают invalidate() с тегами
+  затронутых мест, и удаляются только зависящие от них записи;
+- списки каталога дополнительно привязаны к версии catalog_index:
+  запись с другой версией считается промахом;
+- запись живёт не дольше RESPONSE_CACHE_TTL секунд: инвалидация
+  действует только в своём процессе, а изменения из других воркеров и
+  скриптов видны по истечении срока;
+- у ответа сильный ETag (хэш тела): при совпадении If-None-Match
+  отправляется 304 без тела, Cache-Control разрешает браузерам и CDN
+  хранить ответ и перепроверять его по ETag.
+
+Запись, на время вычисления которой пришлась инвалидация, в кэш не
+кладётся: иначе устаревший ответ пережил бы изменение.
+Статистика (доля попаданий) - GET /api/admin/response-cache/stats.
+"""
+
+import hashlib
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+from app.services.catalog_index import catalog_index
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE", "1") == "1"
+MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_ENTRIES", "2000"))
+MAX_BYTES = int(os.getenv("RESPONSE_CACHE_BYTES", str(64 * 1024 * 1024)))
+# Срок жизни записи, секунд
+TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL", "60"))
+# Ответы крупнее не кэшируются, чтобы один список не вытеснил всё
+MAX_ENTRY_BYTES = MAX_BYTES // 8
+# max-age для браузеров и CDN: после него ответ перепроверяется по ETag
+CACHE_MAX_AGE = int(os.getenv("RESPONSE_CACHE_MAX_AGE", "0"))
+CACHE_CONTROL = f"public, max-age={CACHE_MAX_AGE}, must-revalidate"
+
+CATALOG = "catalog"
+# Список отзывов без фильтра по месту
+ALL_REVIEWS = "reviews"
+# Ответы с именами пользователей
+USERS = "users"
+
+
+def place_tag(place_id: int) -> str:
+    return f"place:{place_id}"
+
+
+@dataclass
+class CachedRoute:
+    """Кэшируемый маршрут: шаблон пути, теги записи и версия данных."""
+
+    pattern: "re.Pattern"
+    tags: Callable[["re.Match", Dict[str, str]], Set[str]]
+    version: Optional[Callable[[], str]] = None
+
+
+def review_tags(match, query: Dict[str, str]) -> Set[str]:
+    place_id = query.get("place_id", "")
+    return {USERS, place_tag(int(place_id)) if place_id.isdigit() else ALL_REVIEWS}
+
+
+CACHED_ROUTES: List[CachedRoute] = [
+    CachedRoute(re.compile(r"^/api/places/?$"), lambda m, q: {CATALOG}, lambda: catalog_index.version),
+    CachedRoute(re.compile(r"^/api/places/(\d+)$"), lambda m, q: {place_tag(int(m.group(1)))}),
+    CachedRoute(re.compile(r"^/api/reviews/?$"), review_tags),
+]
+
+
+@dataclass
+class Entry:
+    status: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+    etag: str
+    tags: Set[str]
+    version: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Сильное сравнение; слабые валидаторы W/"..." тоже принимаются для GET
+    candidates = {c.strip().removeprefix("W/") for c in if_none_match.split(",")}
+    return etag in candidates
+
+
+def normalize_query(query_string: bytes) -> Tuple[str, Dict[str, str]]:
+    pairs = [(k, v.strip()) for k, v in parse_qsl(query_string.decode("latin-1")) if v.strip()]
+    pairs.sort()
+    return urlencode(pairs), dict(pairs)
+
+
+def response_encoding(accept_encoding: str) -> str:
+    """Корзина кодировки для ключа: ответ может быть сжат под клиента."""
+    accept = accept_encoding.lower()
+    if "br" in accept:
+        return "br"
+    if "gzip" in accept:
+        return "gzip"
+    return "identity"
+
+
+class ResponseCache:
+    """LRU-кэш ответов с тегами сущностей и ограничением по памяти."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES, ttl: float = TTL_SECONDS):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.bytes = 0
+        # Номер поколения растёт при каждой инвалидации
+        self.generation = 0
+        self._lock = Lock()
+        self._entries: "OrderedDict[str, Entry]" = OrderedDict()
+        self._by_tag: Dict[str, Set[str]] = {}
+
+    def get(self, key: str, version: Optional[str]) -> Optional[Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.version != version:
+                self._drop(key)
+                entry = None
+            elif entry is not None and time.time() - entry.created_at > self.ttl:
+                self._drop(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key: str, entry: Entry, generation: int) -> bool:
+        """Сохранение ответа, если с начала запроса не было инвалидаций."""
+        size = len(entry.body)
+        with self._lock:
+            if generation != self.generation or size > MAX_ENTRY_BYTES:
+                return False
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = entry
+            self.bytes += size
+            for tag in entry.tags:
+                self._by_tag.setdefault(tag, set()).add(key)
+            while self._entries and (len(self._entries) > self.max_entries or self.bytes > self.max_bytes):
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+            return True
+
+    def invalidate(self, *tags: str) -> int:
+        """Удаление записей с любым из тегов. Возвращает число удалённых."""
+        with self._lock:
+            self.generation += 1
+            keys = set()
+            for tag in tags:
+                keys |= self._by_tag.get(tag, set())
+            for key in keys:
+                self._drop(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def invalidate_places(self, place_ids: Iterable[int]) -> int:
+        """Инвалидация после изменения мест и их одобренных отзывов."""
+        return self.invalidate(CATALOG, ALL_REVIEWS, *(place_tag(place_id) for place_id in place_ids))
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._by_tag.clear()
+            self.bytes = 0
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self.bytes -= len(entry.body)
+        for tag in entry.tags:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "not_modified": self.not_modified,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class ResponseCacheMiddleware:
+    """ASGI-middleware: кэш ответов CACHED_ROUTES и условные GET."""
+
+    def __init__(self, app, cache: Optional[ResponseCache] = None, routes: Optional[List[CachedRoute]] = None):
+        self.app = app
+        self.cache = cache or response_cache
+        self.routes = routes if routes is not None else CACHED_ROUTES
+
+    def match(self, path: str) -> Optional[Tuple[CachedRoute, "re.Match"]]:
+        for route in self.routes:
+            match = route.pattern.match(path)
+            if match:
+                return route, match
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET" or not RESPONSE_CACHE_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        matched = self.match(scope["path"])
+        if matched is None:
+            await self.app(scope, receive, send)
+            return
+
+        route, match = matched
+        headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]}
+        query_string, query = normalize_query(scope.get("query_string", b""))
+        key = f"{scope['path'].rstrip('/')}?{query_string}#{response_encoding(headers.get('accept-encoding', ''))}"
+        version = route.version() if route.version else None
+        if_none_match = headers.get("if-none-match", "")
+
+        entry = self.cache.get(key, version)
+        if entry is not None:
+            await self.send_entry(send, entry, if_none_match, b"HIT")
+            return
+
+        generation = self.cache.generation
+        start = None
+        chunks = []
+
+        async def capture(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, receive, capture)
+        body = b"".join(chunks)
+        response_headers = [(k, v) for k, v in start["headers"] if k.lower() not in (b"content-length", b"etag")]
+        entry = Entry(
+            status=start["status"], headers=response_headers, body=body,
+            etag=make_etag(body), tags=route.tags(match, query), version=version
+        )
+        if entry.status == 200:
+            self.cache.set(key, entry, generation)
+            await self.send_entry(send, entry, if_none_match, b"MISS")
+        else:
+            await send({"type": "http.response.start", "status": start["status"], "headers": start["headers"]})
+            await send({"type": "http.response.body", "body": body})
+
+    async def send_entry(self, send, entry: Entry, if_none_match: str, state: bytes) -> None:
+        headers = entry.headers + [
+            (b"etag", entry.etag.encode()),
+            (b"cache-control", CACHE_CONTROL.encode()),
+            (b"x-cache", state),
+        ]
+        if etag_matches(if_none_match, entry.etag):
+            self.cache.not_modified += 1
+            keep = {b"etag", b"cache-control", b"vary", b"x-cache"}
+            await send({"type": "http.response.start", "status": 304, "headers": [h for h in headers if h[0] in keep]})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        headers.append((b"content-length", str(len(entry.body)).encode()))
+        await send({"type": "http.response.start", "status": entry.status, "headers": headers})
+        await send({"type": "http.response.body", "body": entry.body})
+
+
+# Общий кэш ответов процесса
+response_cache = ResponseCache()
@@ -0,0 +1,332 @@
+"""
+Фоновая суммаризация одобренных отзывов о местах.
+
+- Водяной знак набора одобренных отзывов места (число, наибольший id,
+  время последнего изменения отзыва) считается одним GROUP BY; места,
+  у которых он не сдвинулся с прошлой сводки, пропускаются без чтения
+  отзывов.
+- Для остальных читаются отзывы и считается отпечаток - хэш
+  упорядоченных (id, оценка, текст). Совпал с отпечатком сводки -
+  сводка актуальна, LLM не вызывается.
+- Если с прошлой сводки отзывы только добавлялись (отпечаток отзывов
+  до last_review_id сходится), суммаризируется только дельта: новые
+  отзывы пачками по SUMMARY_BATCH_SIZE, затем старая сводка
+  сворачивается с промежуточными (скользящая сводка).
+- Иначе (отзыв удалён или одобрен задним числом) сводка строится заново
+  иерархически: сводки пачек отзывов, затем сводки сводок.
+
+Фоновый цикл при нескольких воркерах выполняет только ведущий процесс
+(LeaderLock); остальные периодически пытаются перехватить лидерство.
+
+Каждый вызов LLM попадает в отчёт: число отзывов/текстов, оценка
+токенов запроса и ответа, задержка.
+Запуск вручную: python summarize_reviews.py.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from app.database import DATABASE_URL, AsyncSessionLocal, async_engine
+from app.models.review import Review, ReviewStatus
+from app.models.summary import PlaceSummary
+from app.services.chat_history import estimate_tokens
+from app.services.llm import LLMClient, llm_client
+from app.services.metrics import observe_llm
+from app.services.response_cache import place_tag, response_cache
+
+try:
+    import fcntl
+except ImportError:  # Windows: flock нет, файл блокируется через msvcrt
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+# Число текстов в одном вызове LLM
+SUMMARY_BATCH_SIZE = int(os.getenv("SUMMARY_BATCH_SIZE", "20"))
+# Период фонового прохода в секундах (0 - фоновая суммаризация выключена)
+SUMMARY_INTERVAL = float(os.getenv("SUMMARY_INTERVAL", "300"))
+# Запас водяного знака сводки: отзыв, изменённый в ещё не завершённой
+# на момент чтения транзакции, получает время раньше её фиксации
+WATERMARK_MARGIN = timedelta(seconds=60)
+# Ключ advisory-блокировки ведущего процесса (PostgreSQL)
+LEADER_LOCK_KEY = int.from_bytes(hashlib.blake2b(b"review_summary", digest_size=8).digest(), "big", signed=True)
+
+
+@dataclass
+class BatchReport:
+    """Отчёт об одном вызове LLM."""
+    place_id: int
+    mode: str  # delta | full | merge
+    texts: int
+    prompt_tokens: int
+    completion_tokens: int
+    latency_ms: float
+
+
+def fingerprint(reviews: Iterable) -> str:
+    """Отпечаток набора отзывов: хэш упорядоченных по id (id, оценка, текст)."""
+    digest = hashlib.blake2b(digest_size=16)
+    for review in reviews:
+        digest.update(f"{review.id}\0{review.rating}\0{review.text}\0".encode())
+    return digest.hexdigest()
+
+
+def chunks(items: List, size: int) -> List[List]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+class ReviewSummarizer:
+    """Инкрементальная пакетная суммаризация отзывов через LLMClient."""
+
+    def __init__(self, llm: LLMClient, batch_size: int = SUMMARY_BATCH_SIZE):
+        self.llm = llm
+        self.batch_size = batch_size
+
+    async def _call(self, place_id: int, mode: str, texts: List[str], reports: List[BatchReport]) -> str:
+        start = time.perf_counter()
+        summary = await self.llm.summarize(texts)
+        report = BatchReport(
+            place_id=place_id,
+            mode=mode,
+            texts=len(texts),
+            prompt_tokens=sum(estimate_tokens(t) for t in texts),
+            completion_tokens=estimate_tokens(summary),
+            latency_ms=(time.perf_counter() - start) * 1000
+        )
+        reports.append(report)
+        observe_llm("summarize", report.latency_ms / 1000, report.prompt_tokens, report.completion_tokens)
+        return summary
+
+    async def _reduce(self, place_id: int, summaries: List[str], reports: List[BatchReport]) -> str:
+        """Иерархическое сворачивание сводок до одной."""
+        while len(summaries) > 1:
+            summaries = [
+                await self._call(place_id, "merge", batch, reports)
+                for batch in chunks(summaries, self.batch_size)
+            ]
+        return summaries[0]
+
+    async def summarize_place(
+        self,
+        db: AsyncSession,
+        place_id: int,
+        summary: Optional[PlaceSummary],
+        reports: List[BatchReport]
+    ) -> bool:
+        """Обновление сводки места (без commit). False - набор отзывов не изменился."""
+        # Время БД до чтения отзывов: изменения позже него попадут в следующий проход
+        watermark = (await db.execute(select(func.now()))).scalar_one() - WATERMARK_MARGIN
+        rows = (await db.execute(
+            select(Review.id, Review.rating, Review.text).where(
+                Review.place_id == place_id,
+                Review.status == ReviewStatus.APPROVED
+            ).order_by(Review.id)
+        )).all()
+        content_hash = fingerprint(rows)
+        if summary is not None and summary.content_hash == content_hash:
+            summary.updated_at = watermark
+            return False
+
+        delta = None
+        if summary is not None:
+            old = [r for r in rows if r.id <= summary.last_review_id]
+            if fingerprint(old) == summary.content_hash:
+                delta = rows[len(old):]
+
+        if delta is not None:
+            partials = [
+                await self._call(place_id, "delta", [r.text for r in batch], reports)
+                for batch in chunks(delta, self.batch_size)
+            ]
+            # Скользящая сводка: прежняя сводка сворачивается с дельтой
+            summary_text = await self._reduce(place_id, [summary.text] + partials, reports)
+        else:
+            partials = [
+                await self._call(place_id, "full", [r.text for r in batch], reports)
+                for batch in chunks(rows, self.batch_size)
+            ]
+            summary_text = await self._reduce(place_id, partials, reports)
+
+        if summary is None:
+            summary = PlaceSummary(place_id=place_id)
+            db.add(summary)
+        summary.text = summary_text
+        summary.content_hash = content_hash
+        summary.last_review_id = rows[-1].id
+        summary.reviews_count = len(rows)
+        summary.updated_at = watermark
+        return True
+
+    async def run_once(self, db: AsyncSession) -> List[BatchReport]:
+        """Один проход по всем местам с изменившимися отзывами."""
+        approved = Review.status == ReviewStatus.APPROVED
+        rows = (await db.execute(
+            select(
+                Review.place_id,
+                func.count(Review.id),
+                func.max(Review.id),
+                func.max(func.coalesce(Review.updated_at, Review.created_at))
+            ).where(approved).group_by(Review.place_id)
+        )).all()
+        summaries = {
+            s.place_id: s
+            for s in (await db.execute(select(PlaceSummary))).scalars()
+        }
+
+        reports: List[BatchReport] = []
+        for place_id, count, max_id, changed_at in rows:
+            summary = summaries.get(place_id)
+            if (summary is not None
+                    and summary.reviews_count == count
+                    and summary.last_review_id == max_id
+                    and changed_at is not None and summary.updated_at is not None
+                    and changed_at < summary.updated_at):
+                continue
+            changed = await self.summarize_place(db, place_id, summary, reports)
+            await db.commit()
+            if changed:
+                response_cache.invalidate(place_tag(place_id))
+
+        # Сводки мест, у которых не осталось одобренных отзывов
+        dropped = (await db.execute(
+            delete(PlaceSummary).where(
+                PlaceSummary.place_id.not_in(select(Review.place_id).where(approved))
+            ).returning(PlaceSummary.place_id)
+        )).scalars().all()
+        await db.commit()
+        if dropped:
+            response_cache.invalidate(*(place_tag(place_id) for place_id in dropped))
+        return reports
+
+    async def run_forever(self, interval: float = SUMMARY_INTERVAL) -> None:
+        """
+        Фоновый цикл: проход раз в interval секунд, пока процесс - ведущий.
+        Не ведущий процесс раз в interval пытается им стать.
+        """
+        lock = LeaderLock()
+        try:
+            while True:
+                if await lock.acquire():
+                    await self._run_passes(lock, interval)
+                await asyncio.sleep(interval)
+        finally:
+            await lock.release()
+
+    async def _run_passes(self, lock: "LeaderLock", interval: float) -> None:
+        logger.info("Фоновая суммаризация отзывов выполняется в этом процессе")
+        while await lock.held():
+            try:
+                async with AsyncSessionLocal() as db:
+                    reports = await self.run_once(db)
+                if reports:
+                    logger.info(
+                        "Суммаризация отзывов: мест %d, вызовов LLM %d, токенов %d",
+                        len({r.place_id for r in reports}), len(reports),
+                        sum(r.prompt_tokens + r.completion_tokens for r in reports)
+                    )
+            except Exception:
+                logger.exception("Ошибка фоновой суммаризации отзывов")
+            await asyncio.sleep(interval)
+        logger.warning("Лидерство фоновой суммаризации потеряно")
+        await lock.release()
+
+
+def lock_file(fd: int) -> bool:
+    """Неблокирующая эксклюзивная блокировка открытого файла; False - занят."""
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+class LeaderLock:
+    """
+    Блокировка ведущего процесса фоновой суммаризации.
+    PostgreSQL - сессионная advisory-блокировка на отдельном соединении,
+    SQLite - блокировка файла рядом с БД (flock, на Windows - msvcrt). Обе снимаются и при падении процесса.
+    """
+
+    def __init__(self, url: str = DATABASE_URL):
+        self._url = make_url(url)
+        self._connection: Optional[AsyncConnection] = None
+        self._file: Optional[int] = None
+
+    def _lock_path(self) -> Optional[Path]:
+        database = self._url.database
+        if not database or database == ":memory:":
+            return None
+        return Path(database).with_name(Path(database).name + ".summary.lock")
+
+    async def acquire(self) -> bool:
+        if self._url.get_backend_name() == "postgresql":
+            if self._connection is None:
+                connection = await async_engine.connect()
+                # Без открытой транзакции: соединение только держит блокировку
+                await connection.execution_options(isolation_level="AUTOCOMMIT")
+                locked = (await connection.execute(
+                    text("SELECT pg_try_advisory_lock(:key)"), {"key": LEADER_LOCK_KEY}
+                )).scalar_one()
+                if locked:
+                    self._connection = connection
+                else:
+                    await connection.close()
+            return self._connection is not None
+
+        path = self._lock_path()
+        if path is None:
+            return True
+        if self._file is None:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            if not lock_file(fd):
+                os.close(fd)
+                return False
+            self._file = fd
+        return True
+
+    async def held(self) -> bool:
+        """Блокировка всё ещё у процесса (соединение PostgreSQL живо)."""
+        if self._connection is None:
+            return self._file is not None or self._lock_path() is None
+        try:
+            await self._connection.execute(text("SELECT 1"))
+            return True
+        except Exception:
+            return False
+
+    async def release(self) -> None:
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            try:
+                # Соединение не возвращается в пул: его закрытие снимает блокировку
+                await connection.invalidate()
+                await connection.close()
+            except Exception:
+                logger.exception("Ошибка закрытия соединения блокировки суммаризации")
+        if self._file is not None:
+            fd, self._file = self._file, None
+            os.close(fd)
+
+
+async def get_summary(db: AsyncSession, place_id: int) -> Optional[str]:
+    summary = await db.get(PlaceSummary, place_id)
+    return summary.text if summary is not None else None
+
+
+# Общий суммаризатор процесса
+review_summarizer = ReviewSummarizer(llm_client)
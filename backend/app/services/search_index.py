@@ -0,0 +1,264 @@
+"""
+Полнотекстовый поиск мест на SQLite FTS5.
+
+Две виртуальные таблицы, rowid = id места:
+- places_fts: название, описание, теги (unicode61) и категория
+  (UNINDEXED, в нижнем регистре) - основной поиск с ранжированием BM25;
+- places_trigram: название и теги (триграммный токенизатор) - нечёткий
+  поиск с опечатками, если основной ничего не нашёл.
+
+Морфология русского языка учитывается на стороне запроса: слова
+приводятся к основе (отсечение окончаний) и ищутся как префиксы,
+так что "музеи" находит "музей" и "музеем".
+
+Индекс обновляется из create/update/delete роутера мест в той же
+транзакции, что и таблица places. На других СУБД (PostgreSQL) индекс
+отключён, и поиск выполняется по in-memory каталогу.
+"""
+
+import html
+import json
+import re
+from dataclasses import dataclass
+from typing import Collection, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models.place import Place
+
+# Веса колонок places_fts для bm25: name, description, tags, category
+BM25_WEIGHTS = (10.0, 2.0, 5.0, 0.0)
+SNIPPET_TOKENS = 12
+# Границы совпадений во фрагменте от snippet(): управляющие символы, которых
+# нет в тексте мест; заменяются на <b>/</b> после экранирования текста
+MATCH_START, MATCH_END = "\x02", "\x03"
+INDEX_TABLES = ("places_fts", "places_trigram")
+# Буфер FTS5 перед записью сегмента: по умолчанию и при полной переиндексации
+DEFAULT_HASH_SIZE = 1024 * 1024
+REBUILD_HASH_SIZE = 64 * 1024 * 1024
+
+# Окончания для отсечения, от длинных к коротким
+RU_ENDINGS = sorted({
+    "иями", "ями", "ами", "иям", "иях", "ией", "ого", "его", "ому", "ему",
+    "ыми", "ими", "ях", "ах", "ям", "ам", "ов", "ев", "ей",
+    "ой", "ий", "ый", "ая", "яя", "ое", "ее", "ые", "ие", "ию", "ия", "ии",
+    "ом", "ем", "ью", "ми", "а", "я", "о", "е", "ы", "и", "у", "ю", "й", "ь",
+}, key=len, reverse=True)
+MIN_STEM = 3
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+CREATE_STATEMENTS = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS places_fts USING fts5("
+    "name, description, tags, category UNINDEXED, "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS places_trigram USING fts5("
+    "name, tags, tokenize = 'trigram')",
+)
+
+
+@dataclass
+class SearchHit:
+    place_id: int
+    snippet: str
+    rank: float
+
+
+def stem(word: str) -> str:
+    """Грубое приведение русского слова к основе."""
+    word = word.lower().replace("ё", "е")
+    for ending in RU_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM:
+            return word[:-len(ending)]
+    return word
+
+
+def words(query: str) -> List[str]:
+    return [w.lower() for w in WORD_RE.findall(query)]
+
+
+def fts_query(query: str) -> Optional[str]:
+    """Запрос к places_fts: все слова по основе, как префиксы."""
+    terms = [f'"{stem(w)}"*' for w in words(query)]
+    return " ".join(terms) or None
+
+
+def trigram_query(query: str) -> Optional[str]:
+    """Запрос к places_trigram: любые триграммы слов (допускает опечатки)."""
+    grams = {
+        w[i:i + 3]
+        for w in words(query) if len(w) >= 3
+        for i in range(len(w) - 2)
+    }
+    return " OR ".join(f'"{g}"' for g in sorted(grams)) or None
+
+
+def highlight(snippet: str) -> str:
+    """HTML фрагмента: текст места экранируется, совпадения - в <b>."""
+    return html.escape(snippet).replace(MATCH_START, "<b>").replace(MATCH_END, "</b>")
+
+
+def is_supported(db) -> bool:
+    return db.get_bind().dialect.name == "sqlite"
+
+
+def ensure_search_index(db: Session) -> None:
+    """Создание таблиц индекса и полная переиндексация, если он рассинхронизирован."""
+    if not is_supported(db):
+        return
+    for statement in CREATE_STATEMENTS:
+        db.execute(text(statement))
+    indexed = db.execute(text("SELECT count(*) FROM places_fts")).scalar_one()
+    total = db.query(Place).count()
+    if indexed != total:
+        rebuild_search_index(db)
+    db.commit()
+
+
+def rebuild_search_index(db: Session) -> None:
+    """
+    Полная переиндексация всех мест (без commit) одним INSERT ... SELECT
+    на таблицу индекса: строки не проходят через Python, кроме категории
+    (lower() SQLite не знает кириллицы - её приводит функция index_category).
+    На время вставки буфер FTS5 (hashsize) увеличивается, чтобы индекс
+    реже сбрасывался на диск мелкими сегментами.
+    Используется после массовой загрузки, которая индекс по ходу записи
+    не обновляет.
+    """
+    if not is_supported(db):
+        return
+    for statement in CREATE_STATEMENTS:
+        db.execute(text(statement))
+    db.execute(text("DELETE FROM places_fts"))
+    db.execute(text("DELETE FROM places_trigram"))
+    db.connection().connection.driver_connection.create_function(
+        "index_category", 1, index_category, deterministic=True
+    )
+    set_hash_size(db, REBUILD_HASH_SIZE)
+    db.execute(FTS_REBUILD)
+    db.execute(TRIGRAM_REBUILD)
+    set_hash_size(db, DEFAULT_HASH_SIZE)
+
+
+def set_hash_size(db: Session, size: int) -> None:
+    for table in INDEX_TABLES:
+        db.execute(text(f"INSERT INTO {table} ({table}, rank) VALUES ('hashsize', :size)"), {"size": size})
+
+
+FTS_INSERT = text(
+    "INSERT INTO places_fts (rowid, name, description, tags, category) "
+    "VALUES (:id, :name, :description, :tags, :category)"
+)
+TRIGRAM_INSERT = text("INSERT INTO places_trigram (rowid, name, tags) VALUES (:id, :name, :tags)")
+FTS_DELETE = text("DELETE FROM places_fts WHERE rowid = :id")
+TRIGRAM_DELETE = text("DELETE FROM places_trigram WHERE rowid = :id")
+# Теги (JSON-массив) - через пробел, как в index_params
+INDEX_TAGS = "coalesce((SELECT group_concat(value, ' ') FROM json_each(places.tags)), '')"
+FTS_REBUILD = text(
+    "INSERT INTO places_fts (rowid, name, description, tags, category) "
+    f"SELECT id, name, description, {INDEX_TAGS}, index_category(category) FROM places"
+)
+TRIGRAM_REBUILD = text(f"INSERT INTO places_trigram (rowid, name, tags) SELECT id, name, {INDEX_TAGS} FROM places")
+
+
+def index_category(category: str) -> str:
+    return category.strip().lower()
+
+
+def index_params(place) -> dict:
+    """
+    Параметры строк индекса для места или строки с теми же колонками
+    (подходят и для executemany).
+    """
+    return {
+        "id": place.id,
+        "name": place.name,
+        "description": place.description,
+        "tags": " ".join(place.tags or []),
+        "category": index_category(place.category),
+    }
+
+
+def index_place(db: Session, place: Place) -> None:
+    """Добавление или обновление места в индексе (без commit)."""
+    if not is_supported(db):
+        return
+    params = index_params(place)
+    unindex_place(db, place.id)
+    db.execute(FTS_INSERT, params)
+    db.execute(TRIGRAM_INSERT, params)
+
+
+def unindex_place(db: Session, place_id: int) -> None:
+    """Удаление места из индекса (без commit)."""
+    if not is_supported(db):
+        return
+    db.execute(FTS_DELETE, {"id": place_id})
+    db.execute(TRIGRAM_DELETE, {"id": place_id})
+
+
+async def search_places(
+    db: AsyncSession,
+    query: str,
+    category: Optional[str] = None,
+    limit: Optional[int] = 50,
+    offset: int = 0,
+    place_ids: Optional[Collection[int]] = None
+) -> List[SearchHit]:
+    """
+    Поиск по основам слов с ранжированием BM25 и подсветкой фрагментов
+    (HTML: текст экранирован, совпадения в <b>); если по основам не
+    найдено ни одного места (на любой странице) - нечёткий поиск по
+    триграммам, так что страницы не смешивают два набора результатов.
+    Фильтры по категории и по списку id мест place_ids (тег, область)
+    применяются в том же запросе, до LIMIT/OFFSET. limit=None - все
+    совпадения.
+    """
+    if (limit is not None and limit < 1) or offset < 0:
+        raise ValueError("limit должен быть положительным, offset - неотрицательным")
+    if place_ids is not None and not place_ids:
+        return []
+    params = {
+        "category": category.strip().lower() if category else None,
+        "ids": json.dumps(list(place_ids)) if place_ids is not None else None,
+        # LIMIT -1 в SQLite - без ограничения
+        "limit": -1 if limit is None else limit,
+        "offset": offset,
+    }
+    weights = ", ".join(str(w) for w in BM25_WEIGHTS)
+    in_ids = "(:ids IS NULL OR {rowid} IN (SELECT value FROM json_each(:ids)))"
+
+    match = fts_query(query)
+    if match:
+        fts_filter = (
+            "FROM places_fts "
+            "WHERE places_fts MATCH :match AND (:category IS NULL OR category = :category) "
+            f"AND {in_ids.format(rowid='rowid')} "
+        )
+        rows = (await db.execute(text(
+            f"SELECT rowid, snippet(places_fts, -1, '{MATCH_START}', '{MATCH_END}', '…', {SNIPPET_TOKENS}), "
+            f"bm25(places_fts, {weights}) AS rank "
+            f"{fts_filter}"
+            "ORDER BY rank LIMIT :limit OFFSET :offset"
+        ), {**params, "match": match})).all()
+        if rows:
+            return [SearchHit(place_id=r[0], snippet=highlight(r[1]), rank=r[2]) for r in rows]
+        # Пустая страница после последнего совпадения - конец выдачи, а не повод для нечёткого поиска
+        if offset and (await db.execute(text(f"SELECT 1 {fts_filter}LIMIT 1"), {**params, "match": match})).first():
+            return []
+
+    # highlight() по пересекающимся триграммам дублирует текст,
+    # поэтому нечёткие совпадения возвращаются без подсветки
+    match = trigram_query(query)
+    if not match:
+        return []
+    rows = (await db.execute(text(
+        "SELECT t.rowid, t.name, bm25(places_trigram) AS rank "
+        "FROM places_trigram t JOIN places_fts f ON f.rowid = t.rowid "
+        "WHERE places_trigram MATCH :match AND (:category IS NULL OR f.category = :category) "
+        f"AND {in_ids.format(rowid='t.rowid')} "
+        "ORDER BY rank LIMIT :limit OFFSET :offset"
+    ), {**params, "match": match})).all()
+    return [SearchHit(place_id=r[0], snippet=html.escape(r[1]), rank=r[2]) for r in rows]
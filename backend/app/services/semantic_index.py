@@ -0,0 +1,394 @@
+"""
+Семантический поиск мест для RAG в чате.
+
+- Embedder: интерфейс векторизации текста. По умолчанию HashingEmbedder -
+  hashing trick по основам слов и символьным триграммам (работает офлайн
+  на CPU, без обучения, устойчив к словоформам и опечаткам).
+- VectorStore: матрица float32, строка на место (после старта -
+  copy-on-write отображение сохранённого файла); удалённые строки
+  помечаются id = -1 и переиспользуются.
+- IVFIndex: приближённый поиск ближайших соседей - сферический k-means
+  по выборке векторов, списки строк по центроидам; запрос просматривает
+  nprobe ближайших списков, кандидаты переранжируются точным скалярным
+  произведением.
+
+Индекс обновляется инкрементально из create/update/delete роутера мест.
+Снимки индекса лежат в SEMANTIC_INDEX_DIR/<эмбеддер>-<хэш текстов мест>/,
+meta.json указывает на текущий. При старте снимок переиспользуется, если
+хэш текстов каталога совпал. Снимок пишется во временный каталог и
+публикуется переименованием, поэтому несколько процессов (uvicorn
+--workers) не пишут в один файл: при одинаковом содержимом первый
+переименовавший побеждает, остальные свою копию удаляют.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import zlib
+from dataclasses import dataclass
+from itertools import chain
+from pathlib import Path
+from threading import RLock
+from typing import BinaryIO, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.database import BASE_DIR
+from app.schemas.places import PlaceResponse
+from app.services.search_index import stem, words
+
+SEMANTIC_INDEX_DIR = BASE_DIR / "semantic_index"
+EMBEDDING_DIM = 512
+# IVF включается, когда мест больше этого числа; меньше - точный перебор
+IVF_MIN_SIZE = 5000
+IVF_NPROBE = 16
+IVF_TRAIN_SAMPLE = 20_000
+IVF_ITERATIONS = 10
+INITIAL_CAPACITY = 1024
+WORD_CACHE_SIZE = 200_000
+
+
+def place_text(place: PlaceResponse) -> str:
+    return " ".join([place.name, place.category, " ".join(place.tags or []), place.description])
+
+
+def content_version(places: List[PlaceResponse]) -> str:
+    """Хэш текстов мест в порядке id - от него зависят только векторы."""
+    digest = hashlib.blake2b(digest_size=8)
+    for place in sorted(places, key=lambda p: p.id):
+        digest.update(f"{place.id}\0{place_text(place)}\0".encode())
+    return digest.hexdigest()
+
+
+def write_atomic(path: Path, write: Callable[[BinaryIO], None]) -> None:
+    """Запись через временный файл в том же каталоге и атомарное переименование."""
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+class Embedder:
+    """Интерфейс векторизации: тексты -> L2-нормированные векторы float32."""
+
+    name = "base"
+    dim = EMBEDDING_DIM
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+
+class HashingEmbedder(Embedder):
+    """Hashing trick по основам слов (вес 1) и триграммам слов (вес 0.5)."""
+
+    name = "hashing-v1"
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+        # Словарь каталога ограничен, поэтому вклад слова кэшируется
+        self._word_cache: Dict[str, List[Tuple[int, float]]] = {}
+
+    def _bucket(self, feature: str, weight: float) -> Tuple[int, float]:
+        h = zlib.crc32(feature.encode())
+        # Старший бит хэша задаёт знак, чтобы коллизии гасили друг друга
+        return h % self.dim, weight if h & 0x80000000 else -weight
+
+    def _word_features(self, word: str) -> List[Tuple[int, float]]:
+        features = self._word_cache.get(word)
+        if features is None:
+            padded = f"#{word}#"
+            features = [self._bucket(stem(word), 1.0)]
+            features.extend(self._bucket(padded[i:i + 3], 0.5) for i in range(len(padded) - 2))
+            if len(self._word_cache) < WORD_CACHE_SIZE:
+                self._word_cache[word] = features
+        return features
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        result = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            vector = result[row]
+            for word in words(text):
+                for column, weight in self._word_features(word):
+                    vector[column] += weight
+        norms = np.linalg.norm(result, axis=1, keepdims=True)
+        np.divide(result, norms, out=result, where=norms > 0)
+        return result
+
+
+class VectorStore:
+    """
+    Векторы мест с переиспользованием свободных строк. Матрица - массив
+    в памяти процесса или copy-on-write отображение сохранённого файла
+    (load): изменения остаются в процессе и не пишутся в файл, который
+    могут читать другие процессы.
+    """
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.count = 0
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.row_of: Dict[int, int] = {}
+        self._free: List[int] = []
+        self.vectors: np.ndarray = np.zeros((0, dim), dtype=np.float32)
+
+    def reserve(self, capacity: int) -> None:
+        """Расширение матрицы до capacity строк (копия в памяти процесса)."""
+        if capacity <= len(self.ids):
+            return
+        vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+        vectors[:self.count] = self.vectors[:self.count]
+        ids = np.full(capacity, -1, dtype=np.int64)
+        ids[:self.count] = self.ids[:self.count]
+        self.vectors, self.ids = vectors, ids
+
+    def load(self, path: Path, ids: np.ndarray) -> None:
+        """Открытие сохранённого файла векторов (copy-on-write)."""
+        self.ids = ids
+        self.count = len(ids)
+        if self.count:
+            self.vectors = np.memmap(path, dtype=np.float32, mode="c", shape=(self.count, self.dim))
+        self.row_of = {int(place_id): row for row, place_id in enumerate(ids) if place_id >= 0}
+        self._free = [row for row in range(self.count) if ids[row] < 0]
+
+    def upsert(self, place_id: int, vector: np.ndarray) -> int:
+        row = self.row_of.get(place_id)
+        if row is None:
+            if self._free:
+                row = self._free.pop()
+            else:
+                if self.count == len(self.ids):
+                    self.reserve(max(INITIAL_CAPACITY, 2 * len(self.ids)))
+                row = self.count
+                self.count += 1
+            self.row_of[place_id] = row
+            self.ids[row] = place_id
+        self.vectors[row] = vector
+        return row
+
+    def remove(self, place_id: int) -> Optional[int]:
+        row = self.row_of.pop(place_id, None)
+        if row is not None:
+            self.ids[row] = -1
+            self.vectors[row] = 0.0
+            self._free.append(row)
+        return row
+
+    def live_rows(self) -> np.ndarray:
+        return np.flatnonzero(self.ids[:self.count] >= 0)
+
+    def save(self, directory: Path) -> None:
+        """
+        Запись занятых строк в directory. Файлы пишутся во временные и
+        подменяются переименованием: процессы, отобразившие прежний файл,
+        продолжают читать его содержимое.
+        """
+        directory.mkdir(parents=True, exist_ok=True)
+        write_atomic(directory / "vectors.f32", lambda f: self.vectors[:self.count].tofile(f))
+        write_atomic(directory / "ids.npy", lambda f: np.save(f, self.ids[:self.count]))
+
+
+class IVFIndex:
+    """Инвертированные списки строк по центроидам сферического k-means."""
+
+    def __init__(self):
+        self.centroids: Optional[np.ndarray] = None
+        self.lists: List[set] = []
+        self.list_of: Dict[int, int] = {}
+        self.trained_size = 0
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def train(self, vectors: np.ndarray, rows: np.ndarray, seed: int = 0) -> None:
+        rng = np.random.default_rng(seed)
+        nlist = max(1, int(np.sqrt(len(rows))))
+        sample = rows if len(rows) <= IVF_TRAIN_SAMPLE else rng.choice(rows, IVF_TRAIN_SAMPLE, replace=False)
+        data = np.asarray(vectors[np.sort(sample)])
+        centroids = data[rng.choice(len(data), nlist, replace=False)].copy()
+        for _ in range(IVF_ITERATIONS):
+            assign = np.argmax(data @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = data[assign == c]
+                if len(members):
+                    centroids[c] = members.sum(axis=0)
+            centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+
+        self.centroids = centroids
+        self.lists = [set() for _ in range(nlist)]
+        self.list_of = {}
+        for start in range(0, len(rows), 10_000):
+            chunk = rows[start:start + 10_000]
+            assign = np.argmax(np.asarray(vectors[chunk]) @ centroids.T, axis=1)
+            for row, c in zip(chunk.tolist(), assign.tolist()):
+                self.lists[c].add(row)
+                self.list_of[row] = c
+        self.trained_size = len(rows)
+
+    def add(self, row: int, vector: np.ndarray) -> None:
+        self.remove(row)
+        c = int(np.argmax(self.centroids @ vector))
+        self.lists[c].add(row)
+        self.list_of[row] = c
+
+    def remove(self, row: int) -> None:
+        c = self.list_of.pop(row, None)
+        if c is not None:
+            self.lists[c].discard(row)
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        nprobe = min(nprobe, len(self.lists))
+        probes = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.fromiter(chain.from_iterable(self.lists[c] for c in probes), dtype=np.int64)
+
+
+def trained_ivf(store: VectorStore) -> IVFIndex:
+    """IVF по живым строкам хранилища; для малого каталога - пустой (точный перебор)."""
+    ivf = IVFIndex()
+    rows = store.live_rows()
+    if len(rows) >= IVF_MIN_SIZE:
+        ivf.train(store.vectors, rows)
+    return ivf
+
+
+@dataclass
+class SemanticHit:
+    place_id: int
+    score: float
+
+
+class SemanticIndex:
+    """Векторный индекс мест: эмбеддер + хранилище векторов + IVF."""
+
+    def __init__(self, directory: Path = SEMANTIC_INDEX_DIR, embedder: Optional[Embedder] = None):
+        self.directory = directory
+        self.embedder = embedder or HashingEmbedder()
+        self._lock = RLock()
+        self.store = VectorStore(self.embedder.dim)
+        self.ivf = IVFIndex()
+
+    def _meta_path(self) -> Path:
+        return self.directory / "meta.json"
+
+    def open(self, places: List[PlaceResponse]) -> None:
+        """
+        Загрузка сохранённого снимка или полное построение по каталогу.
+        Новые хранилище и IVF готовятся в стороне и подменяются под
+        блокировкой, поиск в это время работает по прежнему индексу.
+        """
+        version = content_version(places)
+        meta_path = self._meta_path()
+        if meta_path.exists():
+            meta = json.loads(meta_path.read_text())
+            if (meta.get("content_version") == version
+                    and meta.get("embedder") == self.embedder.name
+                    and meta.get("dim") == self.embedder.dim):
+                snapshot = self.directory / meta["snapshot"]
+                try:
+                    store = VectorStore(self.embedder.dim)
+                    store.load(snapshot / "vectors.f32", np.load(snapshot / "ids.npy"))
+                except FileNotFoundError:
+                    # Снимок удалён другим процессом, успевшим сохранить более новый
+                    pass
+                else:
+                    self._swap(store)
+                    return
+        self.build(places)
+        self.save(places)
+
+    def build(self, places: List[PlaceResponse], batch_size: int = 1000) -> None:
+        store = VectorStore(self.embedder.dim)
+        store.reserve(len(places))
+        for start in range(0, len(places), batch_size):
+            batch = places[start:start + batch_size]
+            vectors = self.embedder.embed([place_text(p) for p in batch])
+            for place, vector in zip(batch, vectors):
+                store.upsert(place.id, vector)
+        self._swap(store)
+
+    def _swap(self, store: VectorStore) -> None:
+        ivf = trained_ivf(store)
+        with self._lock:
+            self.store, self.ivf = store, ivf
+
+    def save(self, places: List[PlaceResponse]) -> None:
+        """Сохранение снимка индекса для каталога places (тексты мест в индексе - их)."""
+        version = content_version(places)
+        name = f"{self.embedder.name}-{version}"
+        snapshot = self.directory / name
+        if not (snapshot / "ids.npy").exists():
+            self.directory.mkdir(parents=True, exist_ok=True)
+            tmp = Path(tempfile.mkdtemp(dir=self.directory, prefix=".tmp-"))
+            with self._lock:
+                self.store.save(tmp)
+            try:
+                os.rename(tmp, snapshot)
+            except OSError:
+                # Снимок того же содержимого уже опубликован другим процессом
+                shutil.rmtree(tmp, ignore_errors=True)
+
+        meta = json.dumps({
+            "snapshot": name,
+            "content_version": version,
+            "embedder": self.embedder.name,
+            "dim": self.embedder.dim,
+        })
+        write_atomic(self._meta_path(), lambda f: f.write(meta.encode()))
+
+        # Прежние снимки не нужны: процессы, которые их отобразили,
+        # читают удалённые файлы до закрытия
+        for path in self.directory.iterdir():
+            if path.is_dir() and path.name != name and not path.name.startswith(".tmp-"):
+                shutil.rmtree(path, ignore_errors=True)
+
+    def upsert(self, place: PlaceResponse) -> None:
+        vector = self.embedder.embed([place_text(place)])[0]
+        with self._lock:
+            row = self.store.upsert(place.id, vector)
+            if self.ivf.trained:
+                self.ivf.add(row, vector)
+            # Список центроидов устаревает по мере роста каталога
+            live = len(self.store.row_of)
+            if live >= IVF_MIN_SIZE and live >= 2 * max(self.ivf.trained_size, IVF_MIN_SIZE // 2):
+                self.ivf = trained_ivf(self.store)
+
+    def remove(self, place_id: int) -> None:
+        with self._lock:
+            row = self.store.remove(place_id)
+            if row is not None:
+                self.ivf.remove(row)
+
+    def search(self, text: str, k: int = 10, nprobe: int = IVF_NPROBE, exact: bool = False) -> List[SemanticHit]:
+        """k ближайших мест к тексту по косинусной близости."""
+        query = self.embedder.embed([text])[0]
+        if not query.any():
+            return []
+        with self._lock:
+            store = self.store
+            if not store.row_of:
+                return []
+            if self.ivf.trained and not exact:
+                # Точное переранжирование кандидатов из nprobe списков
+                rows = self.ivf.candidates(query, nprobe)
+                scores = np.asarray(store.vectors[rows]) @ query
+            else:
+                # Полный перебор без копирования матрицы
+                rows = np.arange(store.count)
+                scores = store.vectors[:store.count] @ query
+                scores[store.ids[:store.count] < 0] = -np.inf
+            k = min(k, len(store.row_of), len(rows))
+            if k <= 0:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            return [SemanticHit(place_id=int(store.ids[rows[i]]), score=float(scores[i])) for i in top]
+
+
+# Общий индекс процесса
+semantic_index = SemanticIndex()
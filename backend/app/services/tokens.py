@@ -0,0 +1,140 @@
+"""
+Подписанные токены доступа и кэш принципалов.
+
+Токен - JWT (HS256) с id пользователя, ролью и сроком действия.
+Проверка подписи не требует обращения к БД, а данные пользователя
+(в первую очередь актуальная роль) берутся из in-process кэша с TTL.
+Кэш сбрасывается при изменении или удалении пользователя, поэтому
+смена роли и удаление действуют сразу.
+
+Ключ подписи задаётся через SECRET_KEY. Без него процесс подписывает
+токены случайным ключом: токены не переживают перезапуск и не
+принимаются другими воркерами - годится только для разработки.
+"""
+
+import logging
+import os
+import secrets
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+from typing import Dict, Optional, Tuple
+
+from jose import jwt, JWTError
+
+from app.schemas.auth import Role
+
+logger = logging.getLogger(__name__)
+
+SECRET_KEY = os.getenv("SECRET_KEY")
+if not SECRET_KEY:
+    SECRET_KEY = secrets.token_urlsafe(32)
+    logger.warning("SECRET_KEY не задан: токены подписываются случайным ключом этого процесса")
+ALGORITHM = "HS256"
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", str(24 * 60)))
+
+PRINCIPAL_TTL_SECONDS = 60
+PRINCIPAL_CACHE_SIZE = 100_000
+
+
+class InvalidTokenError(Exception):
+    """Токен повреждён, подделан или истёк."""
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Аутентифицированный пользователь, как его видят dependency роутеров."""
+    id: int
+    email: str
+    name: str
+    role: Role
+
+
+def create_access_token(user_id: int, role: Role) -> str:
+    expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    payload = {"sub": str(user_id), "role": role.value, "exp": expire}
+    return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
+
+
+def decode_access_token(token: str) -> int:
+    """Проверка подписи и срока действия, возвращает id пользователя."""
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        return int(payload["sub"])
+    except (JWTError, KeyError, ValueError):
+        raise InvalidTokenError()
+
+
+class PrincipalCache:
+    """
+    Кэш id -> Principal с TTL.
+    Загрузка пользователя из БД и set() не атомарны: если между ними
+    пользователь изменён (invalidate), в кэш попала бы старая роль.
+    Поэтому перед загрузкой берётся generation(), и set() с устаревшим
+    поколением ничего не кладёт. Счётчики инвалидаций ограничены
+    max_size: при переполнении они сбрасываются вместе с увеличением
+    эпохи, и все незавершённые загрузки считаются устаревшими.
+    """
+
+    def __init__(self, ttl_seconds: float = PRINCIPAL_TTL_SECONDS, max_size: int = PRINCIPAL_CACHE_SIZE):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._lock = Lock()
+        self._entries: Dict[int, Tuple[float, Principal]] = {}
+        # Число инвалидаций по id; clear() увеличивает общую эпоху
+        self._generations: Dict[int, int] = {}
+        self._epoch = 0
+
+    def get(self, user_id: int) -> Optional[Principal]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        expires_at, principal = entry
+        if expires_at < time.monotonic():
+            with self._lock:
+                if self._entries.get(user_id) is entry:
+                    del self._entries[user_id]
+            return None
+        return principal
+
+    def generation(self, user_id: int) -> Tuple[int, int]:
+        """Поколение записи id: берётся до загрузки пользователя из БД."""
+        with self._lock:
+            return self._epoch, self._generations.get(user_id, 0)
+
+    def set(self, principal: Principal, generation: Tuple[int, int]) -> bool:
+        """Сохранение, если с generation() пользователь не инвалидировался."""
+        with self._lock:
+            if generation != (self._epoch, self._generations.get(principal.id, 0)):
+                return False
+            if len(self._entries) >= self.max_size:
+                self._evict_expired()
+            self._entries[principal.id] = (time.monotonic() + self.ttl_seconds, principal)
+            return True
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+            if user_id not in self._generations and len(self._generations) >= self.max_size:
+                self._generations.clear()
+                self._epoch += 1
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+            self._epoch += 1
+
+    def _evict_expired(self) -> None:
+        now = time.monotonic()
+        for user_id in [k for k, (expires_at, _) in self._entries.items() if expires_at < now]:
+            del self._entries[user_id]
+        # Если все записи живые - освобождаем место под новую
+        while len(self._entries) >= self.max_size:
+            del self._entries[next(iter(self._entries))]
+
+
+# Общий кэш процесса
+principal_cache = PrincipalCache()
@@ -0,0 +1,111 @@
+"""
+Бенчмарк массовой загрузки (app.services.bulk): синтетические места,
+пользователи (с готовыми хэшами паролей, без bcrypt) и отзывы в JSON
+Lines загружаются во временную БД SQLite; для каждой сущности - время
+записи пачек и отложенных пересчётов (finalize).
+Запуск: python -m benchmarks.bench_bulk --places 200000 --reviews 1000000
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+_tmp = tempfile.TemporaryDirectory()
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{Path(_tmp.name) / 'bench.db'}"
+
+from app.database import SessionLocal, init_db  # noqa: E402
+from app.services import bulk  # noqa: E402
+from app.services.passwords import password_hasher  # noqa: E402
+from benchmarks.bench_catalog_index import CATEGORIES, TAGS  # noqa: E402
+from benchmarks.bench_semantic_index import WORDS  # noqa: E402
+
+USERS = 10_000
+# Хэш bcrypt-формата: пароли в бенчмарке не проверяются
+HASH = "$2b$12$" + "x" * 53
+
+
+def generate(path: Path, entity: str, count: int, places: int, rnd: random.Random) -> None:
+    with open(path, "w", encoding="utf-8") as out:
+        for i in range(1, count + 1):
+            if entity == "places":
+                row = {
+                    "id": i,
+                    "name": f"{rnd.choice(WORDS).capitalize()} {rnd.choice(WORDS)} {i}",
+                    "category": rnd.choice(CATEGORIES),
+                    "description": " ".join(rnd.choices(WORDS, k=12)),
+                    "image": "",
+                    "tags": rnd.sample(TAGS, 3),
+                    "latitude": rnd.uniform(41, 70),
+                    "longitude": rnd.uniform(20, 180),
+                }
+            elif entity == "users":
+                row = {"id": i, "email": f"user{i}@example.com", "name": f"Пользователь {i}", "hashed_password": HASH}
+            else:
+                row = {
+                    "user_id": rnd.randint(1, USERS),
+                    "place_id": rnd.randint(1, places),
+                    "rating": rnd.randint(1, 5),
+                    "text": " ".join(rnd.choices(WORDS, k=15)),
+                    "status": rnd.choice(("approved", "approved", "approved", "pending")),
+                }
+            out.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+def load(entity: str, path: Path, chunk_size: int) -> None:
+    """Загрузка с раздельным замером записи и пересчётов."""
+    finalize = bulk.finalize
+    timings = {}
+
+    def timed_finalize(db, names):
+        started = time.perf_counter()
+        finalize(db, names)
+        timings["finalize"] = time.perf_counter() - started
+
+    bulk.finalize = timed_finalize
+    db = SessionLocal()
+    try:
+        with open(path, encoding="utf-8") as stream:
+            report = bulk.import_rows(db, entity, stream, "jsonl", chunk_size=chunk_size)
+    finally:
+        db.close()
+        bulk.finalize = finalize
+    assert not report.invalid and not report.failed_chunks, report.errors[:3]
+    print(
+        f"{entity}: {report.written} строк за {report.seconds:.1f} с "
+        f"({report.written / report.seconds:.0f} строк/с), "
+        f"из них пересчёты {timings['finalize']:.1f} с"
+    )
+
+
+def run(args) -> None:
+    rnd = random.Random(args.seed)
+    data = Path(_tmp.name)
+    counts = {"places": args.places, "users": USERS, "reviews": args.reviews}
+    for entity, count in counts.items():
+        generate(data / f"{entity}.jsonl", entity, count, args.places, rnd)
+    print(f"Сгенерировано: мест {args.places}, пользователей {USERS}, отзывов {args.reviews}")
+
+    init_db()
+    try:
+        for entity in counts:
+            load(entity, data / f"{entity}.jsonl", args.chunk_size)
+    finally:
+        password_hasher.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--places", type=int, default=200_000)
+    parser.add_argument("--reviews", type=int, default=1_000_000)
+    parser.add_argument("--chunk-size", type=int, default=bulk.CHUNK_SIZE)
+    parser.add_argument("--seed", type=int, default=42)
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
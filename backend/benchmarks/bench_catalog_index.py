@@ -0,0 +1,100 @@
+"""
+Бенчмарк in-memory индекса каталога против запроса SQLAlchemy.
+Запуск: python -m benchmarks.bench_catalog_index --places 100000
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models.place import Place
+from app.services.catalog_index import CatalogIndex, place_to_response
+
+CATEGORIES = ["парк", "музей", "ресторан", "кафе", "театр", "пляж", "отель", "галерея"]
+TAGS = ["с детьми", "бесплатно", "вечером", "на выходные", "романтика", "активный отдых",
+        "у воды", "исторический центр", "веганское меню", "с животными"]
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def measure(fn, queries):
+    samples = []
+    for args in queries:
+        start = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - start) * 1000)
+    return percentile(samples, 0.5), percentile(samples, 0.99)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--places", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    tmp = tempfile.TemporaryDirectory()
+    engine = create_engine(f"sqlite:///{Path(tmp.name) / 'bench.db'}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+
+    db = Session()
+    db.bulk_insert_mappings(Place, [
+        {
+            "name": f"Место {i}",
+            "category": rnd.choice(CATEGORIES),
+            "description": "Описание места",
+            "image": "",
+            "tags": rnd.sample(TAGS, 3),
+            "rating": round(rnd.uniform(1, 5), 2),
+            "reviews_count": rnd.randint(0, 500)
+        } for i in range(args.places)
+    ])
+    db.commit()
+
+    start = time.perf_counter()
+    index = CatalogIndex()
+    index.rebuild(db)
+    print(f"Индекс построен за {(time.perf_counter() - start):.2f} с, мест: {len(index)}")
+
+    queries = [
+        (rnd.choice(CATEGORIES), rnd.choice(TAGS + [None]))
+        for _ in range(args.queries)
+    ]
+
+    def sql_query(category, tag):
+        # Теги хранятся в JSON, поэтому фильтр по тегу выполняется в Python
+        rows = db.query(Place).filter(Place.category == category).order_by(Place.rating.desc())
+        result = []
+        for place in rows:
+            if tag is None or tag in (place.tags or []):
+                result.append(place_to_response(place))
+                if len(result) >= args.limit:
+                    break
+        return result
+
+    def index_query(category, tag):
+        return index.query(category=category, tag=tag, limit=args.limit)
+
+    for name, fn in (("sqlalchemy", sql_query), ("catalog_index", index_query)):
+        p50, p99 = measure(fn, queries)
+        print(f"{name:>14}: p50={p50:.3f} мс  p99={p99:.3f} мс")
+
+    db.close()
+    engine.dispose()
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Бенчмарк конвейера загрузки мест: N синтетических записей в JSON Lines
+(несколько файлов, часть записей - почти дубли) загружаются во временную
+БД SQLite.
+Запуск: python -m benchmarks.bench_ingestion --records 100000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+from pathlib import Path
+
+_tmp = tempfile.TemporaryDirectory()
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{Path(_tmp.name) / 'bench.db'}"
+
+from app.database import AsyncSessionLocal, SessionLocal, init_db  # noqa: E402
+from app.services.ingestion import ingest  # noqa: E402
+from app.services.ingestion_sources import JsonFileSource  # noqa: E402
+from app.services.search_index import ensure_search_index  # noqa: E402
+from benchmarks.bench_catalog_index import CATEGORIES, TAGS  # noqa: E402
+from benchmarks.bench_semantic_index import WORDS  # noqa: E402
+
+
+def generate(directory: Path, records: int, files: int, duplicates: float, rnd: random.Random) -> int:
+    """Запись синтетических карточек; возвращает число вставленных почти дублей."""
+    per_file = (records + files - 1) // files
+    made = []
+    dups = 0
+    for f in range(files):
+        with open(directory / f"part-{f:03d}.jsonl", "w", encoding="utf-8") as out:
+            for i in range(f * per_file, min(records, (f + 1) * per_file)):
+                if made and rnd.random() < duplicates:
+                    # Почти дубль: та же карточка с другим id и лишним пробелом
+                    record = dict(rnd.choice(made), id=f"dup-{i}")
+                    record["description"] += " "
+                    dups += 1
+                else:
+                    record = {
+                        "id": f"rec-{i}",
+                        "name": f"{rnd.choice(WORDS).capitalize()} {rnd.choice(WORDS)} {i}",
+                        "category": rnd.choice(CATEGORIES),
+                        "description": " ".join(rnd.choices(WORDS, k=12)),
+                        "image": "",
+                        "tags": rnd.sample(TAGS, 3),
+                    }
+                    if len(made) < 10_000:
+                        made.append(record)
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return dups
+
+
+async def run(args) -> None:
+    rnd = random.Random(args.seed)
+    data = Path(_tmp.name) / "source"
+    data.mkdir()
+    dups = generate(data, args.records, args.files, args.duplicates, rnd)
+    print(f"Сгенерировано {args.records} записей в {args.files} файлах, почти дублей: {dups}")
+
+    init_db()
+    db = SessionLocal()
+    try:
+        ensure_search_index(db)
+    finally:
+        db.close()
+
+    async with AsyncSessionLocal() as db:
+        report = await ingest(db, JsonFileSource(data), batch_size=args.batch_size, concurrency=args.concurrency)
+    print(f"Добавлено: {report.inserted}, дублей: {report.duplicates}, пачек: {report.batches}")
+    print(f"Время: {report.seconds:.1f} с, {report.records / report.seconds:.0f} записей/с")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=100_000)
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--duplicates", type=float, default=0.05)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=42)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Бенчмарк векторной оценки мест движком рекомендаций.
+Запуск: python -m benchmarks.bench_recommender --places 100000
+"""
+
+import argparse
+import random
+import time
+
+from app.schemas.places import PlaceResponse
+from app.services.catalog_index import CatalogIndex
+from app.services.recommender import Recommender, Preferences
+from benchmarks.bench_catalog_index import CATEGORIES, TAGS, percentile
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--places", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=256)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    catalog = CatalogIndex()
+    catalog.load(
+        PlaceResponse(
+            id=i,
+            name=f"Место {i}",
+            category=rnd.choice(CATEGORIES),
+            rating=round(rnd.uniform(1, 5), 2),
+            reviewsCount=rnd.randint(0, 500),
+            description="",
+            image="",
+            tags=rnd.sample(TAGS, 3)
+        ) for i in range(1, args.places + 1)
+    )
+    recommender = Recommender(catalog)
+
+    start = time.perf_counter()
+    recommender.refresh()
+    print(f"Признаки {recommender.features.shape} построены за {time.perf_counter() - start:.2f} с")
+
+    # Одобренный отзыв: меняется рейтинг одного места
+    samples = []
+    for _ in range(args.queries):
+        place = catalog.get(rnd.randint(1, args.places))
+        catalog.upsert(place.model_copy(update={"reviewsCount": place.reviewsCount + 1}))
+        start = time.perf_counter()
+        recommender.refresh()
+        samples.append((time.perf_counter() - start) * 1000)
+    print(f"refresh после изменения места: p50={percentile(samples, 0.5):.2f} мс  p99={percentile(samples, 0.99):.2f} мс")
+
+    def random_preferences():
+        return Preferences(
+            categories={rnd.choice(CATEGORIES): 2.0},
+            tags={tag: 1.0 for tag in rnd.sample(TAGS, 2)}
+        )
+
+    samples = []
+    for _ in range(args.queries):
+        preferences = random_preferences()
+        start = time.perf_counter()
+        recommender.recommend(preferences, k=args.k)
+        samples.append((time.perf_counter() - start) * 1000)
+    print(f"recommend: p50={percentile(samples, 0.5):.2f} мс  p99={percentile(samples, 0.99):.2f} мс")
+
+    batch = [random_preferences() for _ in range(args.batch)]
+    start = time.perf_counter()
+    recommender.recommend_batch(batch, k=args.k)
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"recommend_batch({args.batch}): {elapsed:.1f} мс, {elapsed / args.batch:.3f} мс на пользователя")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Бенчмарк семантического индекса: recall@k и задержка IVF при разных
+nprobe против точного перебора.
+Запуск: python -m benchmarks.bench_semantic_index --places 100000
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from app.schemas.places import PlaceResponse
+from app.services.semantic_index import SemanticIndex
+from benchmarks.bench_catalog_index import CATEGORIES, TAGS, percentile
+
+WORDS = [
+    "старинный", "уютный", "вид", "набережная", "озеро", "лес", "горы", "история",
+    "семья", "дети", "экскурсия", "кухня", "кофе", "вечер", "прогулка", "собор",
+    "выставка", "картины", "пляж", "тишина", "фестиваль", "музыка", "парк", "река",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--places", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    places = [
+        PlaceResponse(
+            id=i,
+            name=f"{rnd.choice(CATEGORIES)} {rnd.choice(WORDS)}",
+            category=rnd.choice(CATEGORIES),
+            rating=0.0,
+            reviewsCount=0,
+            description=" ".join(rnd.sample(WORDS, 8)),
+            image="",
+            tags=rnd.sample(TAGS, 3)
+        ) for i in range(1, args.places + 1)
+    ]
+    queries = [" ".join(rnd.sample(WORDS + TAGS, 4)) for _ in range(args.queries)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        index = SemanticIndex(Path(directory))
+        start = time.perf_counter()
+        index.build(places)
+        print(f"Индекс {args.places} мест построен за {time.perf_counter() - start:.2f} с, "
+              f"списков IVF: {len(index.ivf.lists)}")
+
+        exact, samples = [], []
+        for query in queries:
+            start = time.perf_counter()
+            exact.append({h.place_id for h in index.search(query, k=args.k, exact=True)})
+            samples.append((time.perf_counter() - start) * 1000)
+        print(f"точный перебор: p50={percentile(samples, 0.5):.2f} мс  p99={percentile(samples, 0.99):.2f} мс")
+
+        for nprobe in args.nprobe:
+            samples, recall = [], 0.0
+            for query, truth in zip(queries, exact):
+                start = time.perf_counter()
+                hits = index.search(query, k=args.k, nprobe=nprobe)
+                samples.append((time.perf_counter() - start) * 1000)
+                recall += len(truth & {h.place_id for h in hits}) / max(len(truth), 1)
+            print(f"IVF nprobe={nprobe:<3} recall@{args.k}={recall / len(queries):.3f}  "
+                  f"p50={percentile(samples, 0.5):.2f} мс  p99={percentile(samples, 0.99):.2f} мс")
+
+
+if __name__ == "__main__":
+    main()
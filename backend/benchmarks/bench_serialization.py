@@ -0,0 +1,153 @@
+"""
+Бенчмарк сериализации ответов /api/admin/users и /api/places.
+
+Сравниваются два пути для N строк из БД:
+- прежний: схемы строятся конструктором (валидация), FastAPI повторно
+  проверяет их по response_model и кодирует JSON через json.dumps;
+- быстрый: trusted()/model_construct без валидации и
+  TypeAdapter.dump_json (app.responses.model_response).
+Отдельно - время и размер ответа со сжатием gzip (и brotli, если установлен).
+Запуск: python -m benchmarks.bench_serialization --rows 10000
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models.place import Place
+from app.models.user import User
+from app.responses import brotli, compress, trusted
+from app.routers.admin import USER_COLUMNS, USER_LIST
+from app.routers.places import PLACE_LIST
+from app.schemas.auth import Role, UserListResponse, UserResponse
+from app.schemas.places import PlaceResponse
+from app.services.catalog_index import place_to_response
+from benchmarks.bench_catalog_index import CATEGORIES, TAGS
+
+
+def timed(fn, repeat: int) -> float:
+    """Медиана времени вызова, мс."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def fastapi_render(field, content) -> bytes:
+    """Путь FastAPI для ответа с response_model: валидация, jsonable, json.dumps."""
+    data = asyncio.run(serialize_response(field=field, response_content=content))
+    return JSONResponse(data).body
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    tmp = tempfile.TemporaryDirectory()
+    engine = create_engine(f"sqlite:///{Path(tmp.name) / 'bench.db'}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    db.bulk_insert_mappings(User, [
+        {
+            "email": f"user{i}@example.com",
+            "name": f"Пользователь {i}",
+            "hashed_password": "x",
+            "role": rnd.choice(list(Role)),
+        } for i in range(args.rows)
+    ])
+    db.bulk_insert_mappings(Place, [
+        {
+            "name": f"Место {i}",
+            "category": rnd.choice(CATEGORIES),
+            "description": "Описание места в несколько слов для реалистичного размера ответа",
+            "image": f"/images/{i}.jpg",
+            "tags": rnd.sample(TAGS, 3),
+            "rating": round(rnd.uniform(1, 5), 2),
+            "reviews_count": rnd.randint(0, 500),
+        } for i in range(args.rows)
+    ])
+    db.commit()
+
+    user_rows = db.execute(select(*USER_COLUMNS).order_by(User.id)).all()
+    places = db.query(Place).all()
+    user_field = create_response_field(name="users", type_=UserListResponse)
+    place_field = create_response_field(name="places", type_=List[PlaceResponse])
+
+    def users_legacy():
+        page = UserListResponse(
+            users=[UserResponse(id=r.id, email=r.email, name=r.name, role=r.role) for r in user_rows],
+            total=len(user_rows)
+        )
+        return fastapi_render(user_field, page)
+
+    def users_fast():
+        page = UserListResponse.model_construct(
+            users=[trusted(UserResponse, r) for r in user_rows], total=len(user_rows), next_after_id=None
+        )
+        return USER_LIST.dump_json(page)
+
+    def places_legacy():
+        cards = [
+            PlaceResponse(
+                id=p.id, name=p.name, category=p.category, rating=p.rating or 0.0,
+                reviewsCount=p.reviews_count or 0, description=p.description, image=p.image, tags=p.tags
+            ) for p in places
+        ]
+        return fastapi_render(place_field, cards)
+
+    # Карточки мест в API берутся из индекса каталога, построенного заранее
+    cards = [place_to_response(p) for p in places]
+
+    def places_fast():
+        return PLACE_LIST.dump_json(cards)
+
+    def places_fast_with_build():
+        return PLACE_LIST.dump_json([place_to_response(p) for p in places])
+
+    print(f"Строк: {args.rows}, повторов: {args.repeat}")
+    cases = (
+        ("users: прежний путь", users_legacy),
+        ("users: быстрый путь", users_fast),
+        ("places: прежний путь", places_legacy),
+        ("places: быстрый, из ORM", places_fast_with_build),
+        ("places: быстрый, из индекса", places_fast),
+    )
+    for name, fn in cases:
+        body = fn()
+        print(f"{name:>30}: {timed(fn, args.repeat):8.2f} мс, {len(body) / 1024:.0f} КиБ")
+
+    encodings = ["gzip"] + (["br"] if brotli is not None else [])
+    for name, fn in (("users", users_fast), ("places", places_fast)):
+        body = fn()
+        for encoding in encodings:
+            packed = compress(body, encoding)
+            ms = timed(lambda: compress(body, encoding), args.repeat)
+            print(f"{name + ' ' + encoding:>30}: {ms:8.2f} мс, {len(packed) / 1024:.0f} КиБ")
+
+    db.close()
+    engine.dispose()
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
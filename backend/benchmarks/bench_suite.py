@@ -0,0 +1,437 @@
+"""
+Набор нагрузочных бенчмарков API с проверкой регрессий.
+
+Сценарии SCENARIOS выполняются по очереди, каждый - N запросов с заданной
+параллельностью после короткого прогрева: вход, список и поиск мест,
+карточка места, список пользователей (админ), очередь модерации и жалобы
+(модератор), сообщение в чат.
+
+Режимы:
+- по умолчанию приложение вызывается в процессе через ASGI-транспорт
+  httpx; события startup/shutdown выполняются явно, как при запуске
+  под uvicorn (индексы каталога и поиска строятся до замеров);
+- --processes N - N процессов, у каждого свой экземпляр приложения над
+  той же БД; сценарий стартует во всех процессах одновременно;
+- --url - нагрузка на уже запущенный сервер (например, uvicorn
+  --workers 4), DATABASE_URL должна указывать на ту же БД.
+
+Данные - набор generate_dataset.py: из DATABASE_URL, а без неё набор
+генерируется во временную SQLite в масштабе --scale.
+
+Результат - JSON (--output, по умолчанию benchmarks/results/<время>.json):
+параметры прогона, объёмы данных и по каждому сценарию rps, p50/p95/p99,
+доля ошибок и коды ответов. Пороги берутся из --thresholds (по умолчанию
+benchmarks/thresholds.json: p95_ms, min_rps, max_error_rate по
+сценариям и "default", подобраны с запасом для прогона по умолчанию
+на машине разработчика); с --baseline прошлый результат сравнивается
+с текущим: p95 не должен вырасти, а rps - упасть больше чем на
+--tolerance. При нарушении код выхода 1.
+
+    python -m benchmarks.bench_suite --scale 0.01
+    python -m benchmarks.bench_suite --only places_list,places_search --requests 2000
+    DATABASE_URL=sqlite:///big.db python -m benchmarks.bench_suite --processes 4 \\
+        --baseline benchmarks/results/prev.json
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+BENCH_DIR = Path(__file__).resolve().parent
+RESULTS_DIR = BENCH_DIR / "results"
+THRESHOLDS_FILE = BENCH_DIR / "thresholds.json"
+
+SEARCH_WORDS = ["парк", "музей", "театр", "пляж", "кофейня", "усадьба", "маяк", "набережная",
+                "с детьми", "москва", "казань", "сочи", "галерея", "ресторан"]
+CHAT_PROMPTS = ["Куда сходить с детьми", "Посоветуй ресторан", "Где погулять вечером",
+                "Что посмотреть на выходных", "Куда пойти на свидание", "Найди музей"]
+CHAT_CITIES = ["в Москве", "в Казани", "в Сочи", "в Томске", "в Пскове", "в Суздале"]
+# Сообщений на пользователя чата: меньше запаса его token bucket
+CHAT_MESSAGES_PER_USER = 4
+
+
+@dataclass
+class Context:
+    """Данные, общие для сценариев процесса: объёмы набора и заголовки с токенами."""
+    users: int
+    places: int
+    categories: List[str]
+    admin: Dict[str, str] = field(default_factory=dict)
+    moderator: Dict[str, str] = field(default_factory=dict)
+    chat_users: List[Dict[str, str]] = field(default_factory=list)
+
+
+# (method, path, json, headers)
+Request = Tuple[str, str, Optional[dict], Optional[Dict[str, str]]]
+
+
+@dataclass
+class Scenario:
+    name: str
+    make_request: Callable[[int, random.Random, Context], Request]
+    # Число запросов по умолчанию (--requests задаёт его для всех сценариев)
+    requests: int = 500
+    # Запрос проверяет пароль: параллельность не больше ёмкости пула bcrypt,
+    # иначе лишние запросы сразу получают 503
+    bcrypt: bool = False
+
+
+def login_request(i, rnd, ctx):
+    from generate_dataset import PASSWORD, email
+    return "POST", "/api/auth/login", {"email": email(rnd.randrange(ctx.users)), "password": PASSWORD}, None
+
+
+def places_list_request(i, rnd, ctx):
+    category = rnd.choice(ctx.categories)
+    return "GET", f"/api/places/?category={category}&limit=50&offset={50 * rnd.randrange(10)}", None, None
+
+
+def places_search_request(i, rnd, ctx):
+    return "GET", f"/api/places/?search={rnd.choice(SEARCH_WORDS)}&limit=20", None, None
+
+
+def places_nearby_request(i, rnd, ctx):
+    from generate_dataset import CITIES
+    latitude, longitude = CITIES[rnd.choice(list(CITIES))]
+    category = rnd.choice(ctx.categories)
+    return "GET", f"/api/places/?near={latitude},{longitude}&radius=5&category={category}&limit=20", None, None
+
+
+def place_detail_request(i, rnd, ctx):
+    return "GET", f"/api/places/{rnd.randint(1, ctx.places)}", None, None
+
+
+def admin_users_request(i, rnd, ctx):
+    return "GET", f"/api/admin/users?limit=100&after_id={rnd.randrange(ctx.users)}", None, ctx.admin
+
+
+def moderation_queue_request(i, rnd, ctx):
+    return "GET", "/api/moderation/queue?limit=50", None, ctx.moderator
+
+
+def moderation_reports_request(i, rnd, ctx):
+    return "GET", "/api/moderation/reports?limit=50", None, ctx.moderator
+
+
+def chat_request(i, rnd, ctx):
+    message = f"{rnd.choice(CHAT_PROMPTS)} {rnd.choice(CHAT_CITIES)}"
+    headers = ctx.chat_users[i % len(ctx.chat_users)]
+    return "POST", "/api/chat/message", {"message": message}, headers
+
+
+SCENARIOS = [
+    Scenario("login", login_request, requests=100, bcrypt=True),
+    Scenario("places_list", places_list_request),
+    Scenario("places_search", places_search_request),
+    Scenario("places_nearby", places_nearby_request),
+    Scenario("place_detail", place_detail_request),
+    Scenario("admin_users", admin_users_request),
+    Scenario("moderation_queue", moderation_queue_request),
+    Scenario("moderation_reports", moderation_reports_request),
+    Scenario("chat_message", chat_request, requests=200),
+]
+
+
+@dataclass
+class Raw:
+    """Замеры сценария в одном процессе."""
+    latencies: List[float]
+    statuses: Dict[int, int]
+    elapsed: float
+
+
+async def run_scenario(client, scenario: Scenario, ctx: Context, requests: int, concurrency: int, seed: int) -> Raw:
+    rnd = random.Random(f"{seed}:{scenario.name}")
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+
+    async def one(i: int, record: bool):
+        method, path, body, headers = scenario.make_request(i, rnd, ctx)
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body, headers=headers)
+                status = response.status_code
+            except httpx.HTTPError:
+                status = 0
+            if record:
+                latencies.append((time.perf_counter() - start) * 1000)
+                statuses[status] += 1
+
+    warmup = min(20, max(1, requests // 10))
+    await asyncio.gather(*(one(i, False) for i in range(warmup)))
+    start = time.perf_counter()
+    await asyncio.gather(*(one(warmup + i, True) for i in range(requests)))
+    return Raw(latencies, dict(statuses), time.perf_counter() - start)
+
+
+async def login(client, index: int) -> Dict[str, str]:
+    from generate_dataset import PASSWORD, email
+    response = await client.post("/api/auth/login", json={"email": email(index), "password": PASSWORD})
+    response.raise_for_status()
+    token = response.json().get("token")
+    if not token:
+        raise SystemExit(f"Не удалось войти как {email(index)}: набор создан generate_dataset.py?")
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def prepare_context(client, args, worker: int) -> Context:
+    from generate_dataset import MODERATORS
+    ctx = Context(users=args.dataset["users"], places=args.dataset["places"], categories=args.dataset["categories"])
+    ctx.admin = await login(client, 0)
+    ctx.moderator = await login(client, 1 + worker % MODERATORS)
+    # У каждого процесса свои пользователи чата, чтобы не делить их token bucket
+    chat_users = max(1, -(-args.requests_for["chat_message"] // (CHAT_MESSAGES_PER_USER * args.processes)))
+    first = MODERATORS + 1 + worker * chat_users
+    # Последовательно: пул bcrypt ограничен и отвечает 503 при переполнении
+    ctx.chat_users = [await login(client, (first + k) % ctx.users) for k in range(chat_users)]
+    return ctx
+
+
+async def run_worker_async(args, worker: int, barrier=None) -> Dict[str, Raw]:
+    from app.services.passwords import password_hasher
+    if args.url:
+        app = None
+        transport = httpx.AsyncHTTPTransport(retries=0)
+        base_url = args.url
+    else:
+        from main import app
+        await app.router.startup()
+        transport = httpx.ASGITransport(app=app)
+        base_url = "http://bench"
+
+    results = {}
+    limits = httpx.Limits(max_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=60, limits=limits) as client:
+            ctx = await prepare_context(client, args, worker)
+            for scenario in args.scenarios:
+                if barrier is not None:
+                    # Сценарий стартует во всех процессах одновременно
+                    await asyncio.to_thread(barrier.wait)
+                concurrency = args.concurrency
+                if scenario.bcrypt:
+                    concurrency = min(concurrency, password_hasher.capacity)
+                results[scenario.name] = await run_scenario(
+                    client, scenario, ctx, args.requests_for[scenario.name] // args.processes,
+                    concurrency, args.seed + worker
+                )
+    finally:
+        if app is not None:
+            await app.router.shutdown()
+    return results
+
+
+def worker_process(args, worker: int, barrier, queue) -> None:
+    """Процесс нагрузки: результат или текст ошибки уходит в очередь."""
+    try:
+        queue.put((worker, asyncio.run(run_worker_async(args, worker, barrier))))
+    except BaseException as exc:
+        queue.put((worker, f"{type(exc).__name__}: {exc}"))
+        raise
+
+
+def run_processes(args) -> List[Dict[str, Raw]]:
+    # Не Pool: его процессы-демоны не могут запустить свой пул bcrypt
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(args.processes)
+    queue = context.Queue()
+    processes = [
+        context.Process(target=worker_process, args=(args, worker, barrier, queue))
+        for worker in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    results = dict(queue.get() for _ in processes)
+    for process in processes:
+        process.join()
+    failed = {worker: result for worker, result in results.items() if isinstance(result, str)}
+    if failed:
+        raise SystemExit(f"Ошибки процессов нагрузки: {failed}")
+    return [results[worker] for worker in range(args.processes)]
+
+
+def percentile(ordered: List[float], p: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))] if ordered else 0.0
+
+
+def summarize(raws: List[Raw]) -> Dict:
+    """Сводка сценария по всем процессам: rps - по самому долгому процессу."""
+    latencies = sorted(x for raw in raws for x in raw.latencies)
+    statuses: Counter = Counter()
+    for raw in raws:
+        statuses.update(raw.statuses)
+    count = len(latencies)
+    errors = sum(n for status, n in statuses.items() if status == 0 or status >= 400)
+    elapsed = max(raw.elapsed for raw in raws)
+    return {
+        "requests": count,
+        "errors": errors,
+        "error_rate": round(errors / count, 4) if count else 0.0,
+        "rps": round(count / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(sum(latencies) / count, 2) if count else 0.0,
+        "p50_ms": round(percentile(latencies, 0.5), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "max_ms": round(latencies[-1], 2) if latencies else 0.0,
+        "statuses": {str(status): n for status, n in sorted(statuses.items())},
+    }
+
+
+def check_thresholds(scenarios: Dict[str, Dict], thresholds: Dict[str, Dict]) -> List[str]:
+    violations = []
+    default = thresholds.get("default", {})
+    for name, result in scenarios.items():
+        limits = {**default, **thresholds.get(name, {})}
+        if "p95_ms" in limits and result["p95_ms"] > limits["p95_ms"]:
+            violations.append(f"{name}: p95 {result['p95_ms']} мс > {limits['p95_ms']} мс")
+        if "min_rps" in limits and result["rps"] < limits["min_rps"]:
+            violations.append(f"{name}: {result['rps']} rps < {limits['min_rps']} rps")
+        if "max_error_rate" in limits and result["error_rate"] > limits["max_error_rate"]:
+            violations.append(f"{name}: доля ошибок {result['error_rate']} > {limits['max_error_rate']}")
+    return violations
+
+
+def check_baseline(scenarios: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float) -> List[str]:
+    violations = []
+    for name, result in scenarios.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if base["p95_ms"] and result["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            violations.append(f"{name}: p95 {result['p95_ms']} мс, было {base['p95_ms']} мс")
+        if result["rps"] < base["rps"] * (1 - tolerance):
+            violations.append(f"{name}: {result['rps']} rps, было {base['rps']} rps")
+    return violations
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def prepare_dataset(args) -> Dict:
+    """Генерация набора во временную БД (без DATABASE_URL) и его объёмы."""
+    from sqlalchemy import func, select
+
+    from app.database import SessionLocal, init_db
+    from app.models.place import Place
+    from app.models.review import Review
+    from app.models.user import User
+    from generate_dataset import Volumes, generate
+
+    init_db()
+    if args.generate:
+        generate(Volumes().scaled(args.scale), seed=args.seed)
+    db = SessionLocal()
+    try:
+        return {
+            "users": db.scalar(select(func.count(User.id))),
+            "places": db.scalar(select(func.count(Place.id))),
+            "reviews": db.scalar(select(func.count(Review.id))),
+            "categories": sorted(db.scalars(select(Place.category).distinct())),
+        }
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=float, default=0.01, help="масштаб набора для временной БД")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--requests", type=int, help="запросов на сценарий (по умолчанию - свои у сценариев)")
+    parser.add_argument("--concurrency", type=int, default=32, help="параллельных запросов в процессе")
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--url", help="адрес запущенного сервера вместо приложения в процессе")
+    parser.add_argument("--only", help="сценарии через запятую")
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--thresholds", type=Path, default=THRESHOLDS_FILE)
+    parser.add_argument("--baseline", type=Path, help="прошлый JSON-результат для сравнения")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="допустимое ухудшение относительно --baseline")
+    args = parser.parse_args()
+
+    # Фоновая суммаризация отзывов искажает замеры, а в нескольких
+    # процессах дублируется; включается явным SUMMARY_INTERVAL
+    os.environ.setdefault("SUMMARY_INTERVAL", "0")
+    tmp = None
+    args.generate = "DATABASE_URL" not in os.environ
+    if args.generate:
+        # Переменная читается при импорте app.database - до импорта приложения
+        tmp = tempfile.TemporaryDirectory()
+        os.environ["DATABASE_URL"] = f"sqlite:///{Path(tmp.name) / 'bench.db'}"
+
+    names = args.only.split(",") if args.only else [s.name for s in SCENARIOS]
+    unknown = set(names) - {s.name for s in SCENARIOS}
+    if unknown:
+        parser.error(f"Неизвестные сценарии: {', '.join(sorted(unknown))}")
+    args.scenarios = [s for s in SCENARIOS if s.name in names]
+    args.requests_for = {s.name: args.requests or s.requests for s in SCENARIOS}
+
+    args.dataset = prepare_dataset(args)
+    print(f"БД: {os.environ['DATABASE_URL']}, набор: {args.dataset['users']} пользователей, "
+          f"{args.dataset['places']} мест, {args.dataset['reviews']} отзывов")
+
+    if args.processes > 1:
+        per_worker = run_processes(args)
+    else:
+        per_worker = [asyncio.run(run_worker_async(args, 0))]
+
+    scenarios = {s.name: summarize([results[s.name] for results in per_worker]) for s in args.scenarios}
+    for name, result in scenarios.items():
+        print(f"{name:>20}: {result['rps']:8.1f} rps  p50={result['p50_ms']:.1f} мс  "
+              f"p95={result['p95_ms']:.1f} мс  p99={result['p99_ms']:.1f} мс  ошибок={result['errors']}")
+
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "mode": "url" if args.url else "asgi",
+        "processes": args.processes,
+        "concurrency": args.concurrency,
+        "seed": args.seed,
+        "dataset": {k: v for k, v in args.dataset.items() if k != "categories"},
+        "scenarios": scenarios,
+    }
+    output = args.output or RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"Результат: {output}")
+
+    violations = []
+    if args.thresholds and args.thresholds.exists():
+        violations += check_thresholds(scenarios, json.loads(args.thresholds.read_text(encoding="utf-8")))
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))["scenarios"]
+        violations += check_baseline(scenarios, baseline, args.tolerance)
+    if tmp is not None:
+        tmp.cleanup()
+    if violations:
+        print("\nРегрессии:")
+        for violation in violations:
+            print(f"  ! {violation}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Скрипт массовой загрузки и выгрузки мест, отзывов и пользователей.
+Запуск:
+    python bulk_data.py import places places.jsonl
+    python bulk_data.py import reviews reviews.csv --chunk-size 100000
+    python bulk_data.py import users users.csv
+    python bulk_data.py export places places.csv
+    python bulk_data.py export users - --with-password-hashes > users.jsonl
+
+Формат - по расширению файла (.csv - CSV, иначе JSONL) или --format;
+"-" - стандартный ввод или вывод. Строки с id обновляют существующие
+записи, пользователи сопоставляются по email. Индексы каталога в памяти
+перестраиваются при следующем запуске приложения.
+"""
+
+import argparse
+import sys
+
+from app.database import SessionLocal, engine, init_db
+from app.services.bulk import CHUNK_SIZE, ENTITIES, FORMATS, export_rows, import_rows
+from app.services.passwords import password_hasher
+
+
+def detect_format(path: str, fmt: str) -> str:
+    if fmt:
+        return fmt
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def run_import(args, fmt: str) -> None:
+    def progress(report):
+        print(f"\r  строк: {report.rows}, записано: {report.written}", end="", file=sys.stderr, flush=True)
+
+    stream = sys.stdin if args.path == "-" else open(args.path, encoding="utf-8-sig", newline="")
+    db = SessionLocal()
+    try:
+        with stream:
+            report = import_rows(db, args.entity, stream, fmt, chunk_size=args.chunk_size, on_chunk=progress)
+    finally:
+        db.close()
+        password_hasher.shutdown()
+
+    print(file=sys.stderr)
+    print(f"{report.entity}: строк {report.rows}, записано {report.written}, "
+          f"некорректных {report.invalid}, пачек с ошибкой {report.failed_chunks}")
+    rate = report.rows / report.seconds if report.seconds else 0
+    print(f"  время: {report.seconds:.1f} с ({rate:.0f} строк/с)")
+    for error in report.errors:
+        print(f"  ! {error}")
+    if report.invalid or report.failed_chunks:
+        raise SystemExit(1)
+
+
+def run_export(args, fmt: str) -> None:
+    out = sys.stdout if args.path == "-" else open(args.path, "w", encoding="utf-8", newline="")
+    db = SessionLocal()
+    try:
+        with out:
+            count = export_rows(db, args.entity, out, fmt, with_hashes=args.with_password_hashes)
+    finally:
+        db.close()
+    print(f"{args.entity}: выгружено строк {count}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("action", choices=["import", "export"])
+    parser.add_argument("entity", choices=sorted(ENTITIES))
+    parser.add_argument("path", help="файл или - для stdin/stdout")
+    parser.add_argument("--format", choices=FORMATS)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="строк в одной транзакции")
+    parser.add_argument("--with-password-hashes", action="store_true",
+                        help="выгрузить хэши паролей пользователей (для переноса между БД)")
+    args = parser.parse_args()
+
+    init_db()
+    print(f"БД: {engine.url.render_as_string(hide_password=True)}", file=sys.stderr)
+    fmt = detect_format(args.path, args.format)
+    if args.action == "import":
+        run_import(args, fmt)
+    else:
+        run_export(args, fmt)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,9 +6,7 @@
 from app.database import SessionLocal, init_db
 from app.models.user import User
 from app.schemas.auth import Role
-from passlib.context import CryptContext
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.services.passwords import password_hasher
 
 
 def create_test_users():
@@ -40,18 +38,24 @@ def create_test_users():
         }
     ]
 
-    for user_data in test_users:
-        # Проверяем, существует ли пользователь
-        existing = db.query(User).filter(User.email == user_data["email"]).first()
-        if existing:
-            print(f"✓ Пользователь {user_data['email']} уже существует")
-            continue
+    # Проверяем, какие пользователи уже существуют
+    existing = {
+        email for (email,) in db.query(User.email).filter(
+            User.email.in_([u["email"] for u in test_users])
+        )
+    }
+    for email in sorted(existing):
+        print(f"✓ Пользователь {email} уже существует")
+    new_users = [u for u in test_users if u["email"] not in existing]
+
+    # Пароли хэшируются пакетом в общем пуле процессов
+    hashes = password_hasher.hash_many(u["password"] for u in new_users)
 
-        # Создаём нового пользователя
+    for user_data, hashed_password in zip(new_users, hashes):
         user = User(
             email=user_data["email"],
             name=user_data["name"],
-            hashed_password=pwd_context.hash(user_data["password"]),
+            hashed_password=hashed_password,
             role=user_data["role"]
         )
         db.add(user)
@@ -59,6 +63,7 @@ def create_test_users():
 
     db.commit()
     db.close()
+    password_hasher.shutdown()
 
     print("\nГотово! Тестовые пользователи созданы.")
     print("Пароль для всех: 123456")
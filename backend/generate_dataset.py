@@ -0,0 +1,359 @@
+"""
+Генератор синтетического набора данных для нагрузочных тестов.
+
+Детерминирован: одинаковые --seed и объёмы дают одинаковые данные
+(у каждой сущности свой поток случайных чисел, поэтому, например,
+другое число отзывов не меняет пользователей и места). Тексты - на
+русском, распределения близки к реальным: популярность мест и
+активность авторов неравномерны, оценка зависит от «качества» места,
+большая часть отзывов одобрена, часть ждёт модерации, на часть
+поданы жалобы.
+
+Пользователи: user<i>@example.com с паролем PASSWORD (один хэш bcrypt
+на всех), user0 - администратор, user1..user<MODERATORS> - модераторы.
+
+Запись - executemany пачками по --batch строк, агрегаты мест и счётчики
+модерации считаются по ходу генерации, индекс поиска строится в конце,
+поэтому запуск приложения на готовой БД не пересчитывает ничего заново.
+Строки вставляются с явными id, поэтому на PostgreSQL в конце
+последовательности id переводятся на максимальный id таблиц.
+
+Запуск:
+    python generate_dataset.py                  # 1M пользователей, 100k мест, 5M отзывов
+    python generate_dataset.py --scale 0.01     # то же в масштабе 1:100
+    python generate_dataset.py --reset          # пересоздать таблицы перед генерацией
+БД выбирается через DATABASE_URL, как и у приложения.
+"""
+
+import argparse
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate, islice
+from typing import Dict, Iterable, Iterator, List
+
+from sqlalchemy import bindparam, func, insert, select, update
+from sqlalchemy.engine import Engine
+
+from app.database import Base, SessionLocal, engine, init_db
+from app.models.place import Place
+from app.models.report import ReportStatus, ReviewReport, ReviewReportAuthor
+from app.models.review import Review, ReviewStatus
+from app.models.user import User
+from app.schemas.auth import Role
+from app.services.bulk import sync_sequence
+from app.services.moderation_stats import rebuild_counters
+from app.services.passwords import hash_password
+from app.services.place_stats import bulk_review_delta, review_delta_params
+from app.services.search_index import ensure_search_index
+
+PASSWORD = "123456"
+MODERATORS = 20
+BATCH_SIZE = 10_000
+# Отзывы и регистрации распределены по двум годам до этой даты
+EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc)
+PERIOD_SECONDS = 2 * 365 * 24 * 3600
+
+# Доли статусов отзывов
+STATUS_WEIGHTS = {ReviewStatus.APPROVED: 0.9, ReviewStatus.PENDING: 0.07, ReviewStatus.REJECTED: 0.03}
+# Доля жалоб, уже рассмотренных модераторами
+RESOLVED_REPORTS = 0.2
+
+MALE_NAMES = ["Александр", "Дмитрий", "Максим", "Сергей", "Андрей", "Алексей", "Иван", "Михаил",
+              "Никита", "Егор", "Артём", "Павел", "Роман", "Олег", "Владимир", "Кирилл"]
+FEMALE_NAMES = ["Анна", "Мария", "Елена", "Ольга", "Наталья", "Татьяна", "Ирина", "Екатерина",
+                "Светлана", "Юлия", "Дарья", "Полина", "Ксения", "Алина", "Вера", "София"]
+SURNAMES = ["Иванов", "Смирнов", "Кузнецов", "Попов", "Васильев", "Петров", "Соколов", "Михайлов",
+            "Новиков", "Фёдоров", "Морозов", "Волков", "Алексеев", "Лебедев", "Семёнов", "Егоров",
+            "Павлов", "Козлов", "Степанов", "Николаев", "Орлов", "Андреев", "Макаров", "Никитин"]
+
+CATEGORIES = {
+    "парк": ["Парк", "Сквер", "Сад", "Лесопарк"],
+    "музей": ["Музей", "Дом-музей", "Краеведческий музей", "Музей-заповедник"],
+    "ресторан": ["Ресторан", "Бистро", "Гастробар", "Трактир"],
+    "кафе": ["Кафе", "Кофейня", "Пекарня", "Чайная"],
+    "театр": ["Театр", "Драматический театр", "Театр кукол", "Камерная сцена"],
+    "пляж": ["Пляж", "Городской пляж", "Дикий пляж", "Набережная"],
+    "отель": ["Отель", "Гостиница", "Гостевой дом", "Хостел"],
+    "галерея": ["Галерея", "Арт-пространство", "Выставочный зал", "Арт-центр"],
+}
+NAME_WORDS = ["Берёзка", "Северное сияние", "Старый город", "Волна", "Рассвет", "Ласточка", "Парус",
+              "Белые ночи", "Сосновый бор", "Золотая осень", "Маяк", "Родник", "Усадьба", "Причал",
+              "Созвездие", "Тёплый дом", "Вишнёвый сад", "Ветер", "Полярная звезда", "Жемчужина"]
+# Город -> координаты центра; места разбросаны вокруг центра
+CITIES = {
+    "Москва": (55.7558, 37.6173), "Санкт-Петербург": (59.9386, 30.3141), "Казань": (55.7961, 49.1064),
+    "Нижний Новгород": (56.3269, 44.0059), "Екатеринбург": (56.8389, 60.6057),
+    "Калининград": (54.7104, 20.4522), "Сочи": (43.5855, 39.7231), "Ярославль": (57.6261, 39.8845),
+    "Владимир": (56.1290, 40.4066), "Суздаль": (56.4197, 40.4493), "Псков": (57.8194, 28.3318),
+    "Иркутск": (52.2870, 104.3050), "Владивосток": (43.1155, 131.8855), "Томск": (56.4847, 84.9482),
+}
+# Разброс мест вокруг центра города, градусы (~10 км)
+CITY_SPREAD = 0.09
+TAGS = ["с детьми", "бесплатно", "вечером", "на выходные", "романтика", "активный отдых",
+        "у воды", "исторический центр", "веганское меню", "с животными", "панорамный вид",
+        "доступная среда", "wi-fi", "парковка", "круглосуточно"]
+DESCRIPTION_PARTS = [
+    "Уютное место в самом центре города.",
+    "Отличный выбор для прогулки всей семьёй.",
+    "Здесь часто проходят концерты и мастер-классы.",
+    "Рядом остановка общественного транспорта.",
+    "Летом работает открытая веранда.",
+    "Популярно у туристов и местных жителей.",
+    "Красивые виды, особенно на закате.",
+    "В выходные бывает многолюдно, лучше приходить с утра.",
+    "Есть экскурсии с гидом по предварительной записи.",
+    "Цены средние, обслуживание быстрое.",
+]
+REVIEW_PHRASES = {
+    1: ["Очень разочарован, не рекомендую.", "Грязно и шумно.", "Персонал был груб.",
+        "Потраченное время жалко.", "Цены завышены, качество низкое."],
+    2: ["Ожидал большего.", "Есть серьёзные недостатки.", "Долго ждали обслуживания.",
+        "Вид хороший, но всё остальное так себе.", "Вряд ли вернусь снова."],
+    3: ["Неплохо, но без восторга.", "Средне, на один раз.", "Есть плюсы и минусы.",
+        "Нормальное место, если рядом.", "Обычный уровень для города."],
+    4: ["Хорошее место, понравилось.", "Приятная атмосфера.", "Вежливый персонал.",
+        "Было интересно, рекомендую.", "Хорошо провели время с друзьями."],
+    5: ["Потрясающе, обязательно вернёмся!", "Лучшее место в городе.", "Всё было идеально.",
+        "Очень красиво и уютно.", "Рекомендую всем, кто приезжает в город."],
+}
+REVIEW_DETAILS = ["Были с детьми.", "Приезжали в выходные.", "Заходили вечером после работы.",
+                  "Отмечали день рождения.", "Гуляли здесь в отпуске.", "Пришли по совету друзей."]
+REPORT_REASONS = ["Спам", "Оскорбления", "Реклама", "Не по теме", "Недостоверная информация",
+                  "Нецензурная лексика", "Отзыв не о месте"]
+
+
+@dataclass
+class Volumes:
+    users: int = 1_000_000
+    places: int = 100_000
+    reviews: int = 5_000_000
+    reports: int = 50_000
+
+    def scaled(self, scale: float) -> "Volumes":
+        return Volumes(
+            users=max(MODERATORS + 2, int(self.users * scale)),
+            places=max(1, int(self.places * scale)),
+            reviews=int(self.reviews * scale),
+            reports=int(self.reports * scale),
+        )
+
+
+def email(index: int) -> str:
+    return f"user{index}@example.com"
+
+
+def role(index: int) -> Role:
+    if index == 0:
+        return Role.ADMIN
+    return Role.MODERATOR if index <= MODERATORS else Role.USER
+
+
+def timestamp(rnd: random.Random) -> datetime:
+    return EPOCH - timedelta(seconds=rnd.randrange(PERIOD_SECONDS))
+
+
+def batches(rows: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def insert_rows(bind: Engine, table, rows: Iterable[dict], total: int, size: int, label: str) -> None:
+    """executemany пачками, транзакция на пачку."""
+    done = 0
+    started = time.perf_counter()
+    for batch in batches(rows, size):
+        with bind.begin() as conn:
+            conn.execute(insert(table), batch)
+        done += len(batch)
+        print(f"\r  {label}: {done}/{total}", end="", flush=True)
+    print(f"\r  {label}: {done} за {time.perf_counter() - started:.1f} с")
+
+
+def user_rows(count: int, seed: int) -> Iterator[dict]:
+    rnd = random.Random(f"{seed}:users")
+    hashed = hash_password(PASSWORD)
+    for i in range(count):
+        if rnd.random() < 0.5:
+            name = f"{rnd.choice(MALE_NAMES)} {rnd.choice(SURNAMES)}"
+        else:
+            name = f"{rnd.choice(FEMALE_NAMES)} {rnd.choice(SURNAMES)}а"
+        yield {
+            "id": i + 1,
+            "email": email(i),
+            "name": name,
+            "hashed_password": hashed,
+            "role": role(i),
+            "created_at": timestamp(rnd),
+        }
+
+
+def place_rows(count: int, seed: int) -> Iterator[dict]:
+    rnd = random.Random(f"{seed}:places")
+    categories = list(CATEGORIES)
+    cities = list(CITIES)
+    for i in range(count):
+        category = rnd.choice(categories)
+        city = rnd.choice(cities)
+        latitude, longitude = CITIES[city]
+        yield {
+            "id": i + 1,
+            "name": f"{rnd.choice(CATEGORIES[category])} «{rnd.choice(NAME_WORDS)}», {city}",
+            "category": category,
+            "description": f"{city}. " + " ".join(rnd.sample(DESCRIPTION_PARTS, rnd.randint(2, 4))),
+            "image": f"/images/places/{i + 1}.jpg",
+            "tags": rnd.sample(TAGS, rnd.randint(1, 4)),
+            "created_at": timestamp(rnd),
+            "latitude": round(rnd.gauss(latitude, CITY_SPREAD), 6),
+            "longitude": round(rnd.gauss(longitude, CITY_SPREAD * 1.8), 6),
+        }
+
+
+def popularity(count: int, rnd: random.Random) -> List[float]:
+    """Накопленные веса с тяжёлым хвостом: немногие места (авторы) собирают большую часть отзывов."""
+    return list(accumulate(rnd.lognormvariate(0.0, 1.0) for _ in range(count)))
+
+
+def review_rows(volumes: Volumes, seed: int, histograms: Dict[int, List[int]]) -> Iterator[dict]:
+    """Отзывы; в histograms накапливаются оценки одобренных отзывов по местам."""
+    rnd = random.Random(f"{seed}:reviews")
+    place_ids = range(1, volumes.places + 1)
+    user_ids = range(1, volumes.users + 1)
+    place_weights = popularity(volumes.places, rnd)
+    user_weights = popularity(volumes.users, rnd)
+    # Средняя оценка места
+    quality = [rnd.uniform(2.5, 4.8) for _ in place_ids]
+    statuses = list(STATUS_WEIGHTS)
+    status_weights = list(accumulate(STATUS_WEIGHTS.values()))
+
+    chunk = 10_000
+    for start in range(0, volumes.reviews, chunk):
+        n = min(chunk, volumes.reviews - start)
+        places = rnd.choices(place_ids, cum_weights=place_weights, k=n)
+        users = rnd.choices(user_ids, cum_weights=user_weights, k=n)
+        picked = rnd.choices(statuses, cum_weights=status_weights, k=n)
+        for i in range(n):
+            place_id = places[i]
+            rating = min(5, max(1, round(rnd.gauss(quality[place_id - 1], 1.0))))
+            status = picked[i]
+            if status == ReviewStatus.APPROVED:
+                histograms.setdefault(place_id, [0] * 6)[rating] += 1
+            parts = rnd.sample(REVIEW_PHRASES[rating], rnd.randint(1, 3))
+            if rnd.random() < 0.4:
+                parts.append(rnd.choice(REVIEW_DETAILS))
+            yield {
+                "id": start + i + 1,
+                "user_id": users[i],
+                "place_id": place_id,
+                "rating": rating,
+                "text": " ".join(parts),
+                "status": status,
+                "reports_count": 0,
+                "created_at": timestamp(rnd),
+            }
+
+
+def report_plan(volumes: Volumes, seed: int) -> List[tuple]:
+    """Жалобы: (review_id, авторы, причины, статус) на разные отзывы."""
+    rnd = random.Random(f"{seed}:reports")
+    count = min(volumes.reports, volumes.reviews)
+    plan = []
+    for review_id in sorted(rnd.sample(range(1, volumes.reviews + 1), count)):
+        # Обычно одна-две жалобы, изредка - десятки
+        reporters = min(volumes.users, int(rnd.paretovariate(1.5)))
+        authors = rnd.sample(range(1, volumes.users + 1), reporters)
+        reasons = [rnd.choice(REPORT_REASONS) for _ in authors]
+        status = ReportStatus.RESOLVED if rnd.random() < RESOLVED_REPORTS else ReportStatus.OPEN
+        plan.append((review_id, authors, reasons, status, timestamp(rnd)))
+    return plan
+
+
+def write_reports(bind: Engine, plan: List[tuple], size: int) -> None:
+    insert_rows(bind, ReviewReport.__table__, (
+        {
+            "id": i + 1, "review_id": review_id, "count": len(authors), "reasons": reasons[:20],
+            "status": status, "first_reporter_id": authors[0], "created_at": created, "updated_at": created,
+        } for i, (review_id, authors, reasons, status, created) in enumerate(plan)
+    ), len(plan), size, "жалобы")
+    authors_total = sum(len(authors) for _, authors, *_ in plan)
+    insert_rows(bind, ReviewReportAuthor.__table__, (
+        {"review_id": review_id, "user_id": user_id}
+        for review_id, authors, *_ in plan for user_id in authors
+    ), authors_total, size, "авторы жалоб")
+
+    reviews = Review.__table__
+    statement = (
+        update(reviews)
+        .where(reviews.c.id == bindparam("review_id"))
+        .values(reports_count=bindparam("count"))
+    )
+    for batch in batches(({"review_id": r, "count": len(a)} for r, a, *_ in plan), size):
+        with bind.begin() as conn:
+            conn.execute(statement, batch)
+
+
+def write_place_stats(bind: Engine, histograms: Dict[int, List[int]], size: int) -> None:
+    """Агрегаты мест одним executemany по накопленным гистограммам."""
+    params = (
+        review_delta_params(place_id, {star: counts[star] for star in range(1, 6)})
+        for place_id, counts in sorted(histograms.items())
+    )
+    for batch in batches(params, size):
+        with bind.begin() as conn:
+            conn.execute(bulk_review_delta(), batch)
+
+
+def generate(volumes: Volumes, seed: int = 42, batch: int = BATCH_SIZE, bind: Engine = engine) -> None:
+    """Заполнение пустой БД набором volumes."""
+    with bind.connect() as conn:
+        existing = conn.execute(select(func.count()).select_from(User.__table__)).scalar_one()
+    if existing:
+        raise SystemExit("БД не пуста: запустите с --reset или укажите другую DATABASE_URL")
+
+    started = time.perf_counter()
+    insert_rows(bind, User.__table__, user_rows(volumes.users, seed), volumes.users, batch, "пользователи")
+    insert_rows(bind, Place.__table__, place_rows(volumes.places, seed), volumes.places, batch, "места")
+    histograms: Dict[int, List[int]] = {}
+    insert_rows(bind, Review.__table__, review_rows(volumes, seed, histograms), volumes.reviews, batch, "отзывы")
+    write_place_stats(bind, histograms, batch)
+    write_reports(bind, report_plan(volumes, seed), batch)
+
+    db = SessionLocal(bind=bind)
+    try:
+        rebuild_counters(db)
+        ensure_search_index(db)
+        if db.get_bind().dialect.name == "postgresql":
+            for model in (User, Place, Review, ReviewReport):
+                sync_sequence(db, model.__table__)
+            db.commit()
+    finally:
+        db.close()
+    print(f"Готово за {time.perf_counter() - started:.1f} с")
+
+
+def main():
+    defaults = Volumes()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=defaults.users)
+    parser.add_argument("--places", type=int, default=defaults.places)
+    parser.add_argument("--reviews", type=int, default=defaults.reviews)
+    parser.add_argument("--reports", type=int, default=defaults.reports)
+    parser.add_argument("--scale", type=float, default=1.0, help="множитель всех объёмов")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch", type=int, default=BATCH_SIZE)
+    parser.add_argument("--reset", action="store_true", help="удалить и создать таблицы заново")
+    args = parser.parse_args()
+
+    volumes = Volumes(args.users, args.places, args.reviews, args.reports).scaled(args.scale)
+    print(f"БД: {engine.url.render_as_string(hide_password=True)}")
+    print(f"Объёмы: {volumes}, seed={args.seed}")
+    if args.reset:
+        Base.metadata.drop_all(bind=engine)
+    init_db()
+    generate(volumes, args.seed, args.batch)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Скрипт загрузки мест из внешнего источника.
+Запуск:
+    python ingest_places.py json fixtures/ingestion/portal
+    python ingest_places.py html fixtures/ingestion/portal
+    python ingest_places.py telegram fixtures/ingestion/telegram
+    python ingest_places.py json export.jsonl --restart   # без контрольной точки
+
+Прерванная загрузка продолжается с контрольной точки. Индексы каталога
+в памяти перестраиваются при следующем запуске приложения.
+"""
+
+import argparse
+import asyncio
+
+from app.database import AsyncSessionLocal, SessionLocal, init_db
+from app.services.ingestion import ingest, BATCH_SIZE, FETCH_CONCURRENCY
+from app.services.ingestion_sources import SOURCES
+from app.services.search_index import ensure_search_index
+
+
+async def run(args):
+    init_db()
+    db = SessionLocal()
+    try:
+        ensure_search_index(db)
+    finally:
+        db.close()
+
+    source = SOURCES[args.source](args.path, name=args.name)
+    async with AsyncSessionLocal() as db:
+        report = await ingest(
+            db, source,
+            batch_size=args.batch_size,
+            concurrency=args.concurrency,
+            restart=args.restart
+        )
+
+    if report.resumed_from:
+        document, record = report.resumed_from
+        print(f"Продолжение с контрольной точки: {document}, запись {record}")
+    print(f"Источник: {report.source}")
+    print(f"  Документов: {report.documents}, записей: {report.records}")
+    print(f"  Добавлено: {report.inserted}, обновлено: {report.updated}")
+    print(f"  Дублей: {report.duplicates}, некорректных: {report.invalid}")
+    rate = report.records / report.seconds if report.seconds else 0
+    print(f"  Пачек: {report.batches}, время: {report.seconds:.1f} с ({rate:.0f} записей/с)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("source", choices=sorted(SOURCES))
+    parser.add_argument("path", help="файл или каталог с документами источника")
+    parser.add_argument("--name", help="имя источника для соответствий и контрольной точки")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=FETCH_CONCURRENCY)
+    parser.add_argument("--restart", action="store_true", help="игнорировать контрольную точку")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -5,18 +5,35 @@ TravelAI Backend - FastAPI Application
 Запуск: uvicorn main:app --reload --port 8000
 """
 
+import asyncio
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
-from app.routers import auth, chat, places, reviews, moderation, admin
-from app.database import init_db
+from app.routers import auth, chat, places, reviews, moderation, admin, metrics, media
+from app.database import init_db, SessionLocal, engine, async_engine
+from app.services.catalog_index import catalog_index
+from app.services.images import thumbnailer
+from app.services.metrics import MetricsMiddleware, install_sql_hooks
+from app.services.moderation_stats import rebuild_counters
+from app.services.passwords import password_hasher
+from app.services.response_cache import ResponseCacheMiddleware
+from app.services.review_summary import review_summarizer, SUMMARY_INTERVAL
+from app.services.search_index import ensure_search_index
+from app.services.semantic_index import semantic_index
 
 app = FastAPI(
     title="TravelAI API",
     description="API для диалоговой системы персонализированных рекомендаций мест отдыха",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
+# Кэш ответов чтения; CORS добавляется после и оборачивает его,
+# поэтому заголовки CORS есть и у ответов из кэша
+app.add_middleware(ResponseCacheMiddleware)
+
 # CORS для работы с frontend
 app.add_middleware(
     CORSMiddleware,
@@ -26,6 +43,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Метрики - внешний слой: учитываются и ответы из кэша, и ответы CORS
+app.add_middleware(MetricsMiddleware)
+install_sql_hooks(engine, async_engine.sync_engine)
+
 # Подключение роутеров
 app.include_router(auth.router)
 app.include_router(chat.router)
@@ -33,13 +54,51 @@ app.include_router(places.router)
 app.include_router(reviews.router)
 app.include_router(moderation.router)
 app.include_router(admin.router)
+app.include_router(metrics.router)
+app.include_router(media.router)
 
 
 @app.on_event("startup")
 def on_startup():
-    """Инициализация БД при запуске приложения."""
+    """Инициализация БД, счётчиков модерации и in-memory индексов при запуске приложения."""
     init_db()
 
+    db = SessionLocal()
+    try:
+        catalog_index.rebuild(db)
+        ensure_search_index(db)
+        rebuild_counters(db)
+    finally:
+        db.close()
+    semantic_index.open(catalog_index.all())
+
+
+# Фоновые задачи, работающие всё время жизни приложения
+background_tasks = []
+
+
+@app.on_event("startup")
+async def start_background_tasks():
+    """Запуск фоновой суммаризации отзывов."""
+    if SUMMARY_INTERVAL > 0:
+        background_tasks.append(asyncio.create_task(review_summarizer.run_forever(SUMMARY_INTERVAL)))
+
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    """Остановка пулов процессов (пароли, превью), сохранение векторного индекса."""
+    password_hasher.shutdown()
+    thumbnailer.shutdown()
+    semantic_index.save(catalog_index.all())
+
 
 @app.get("/")
 async def root():
@@ -0,0 +1,85 @@
+"""
+Скрипт загрузки изображений мест и построения превью.
+Запуск:
+    python place_images.py ingest photos/           # файлы <id места>.<расширение>
+    python place_images.py ingest 42.jpg 43.png
+    python place_images.py thumbnails               # достроить недостающие превью
+
+Оригиналы сохраняются по хэшу содержимого (одинаковые файлы - один раз),
+превью строятся в пуле процессов. Индекс каталога в памяти обновится
+при следующем запуске приложения.
+"""
+
+import argparse
+from concurrent.futures import wait
+from pathlib import Path
+from typing import List
+
+from sqlalchemy import select
+
+from app.database import SessionLocal, init_db
+from app.models.place import Place
+from app.services.images import InvalidImage, MEDIA_DIR, store_original, thumbnailer
+
+
+def image_files(paths: List[str]) -> List[Path]:
+    files = []
+    for path in map(Path, paths):
+        files.extend(sorted(p for p in path.iterdir() if p.is_file()) if path.is_dir() else [path])
+    return files
+
+
+def ingest(db, paths: List[str]) -> List[str]:
+    """Привязка файлов к местам по имени файла; возвращает имена оригиналов."""
+    names = []
+    for path in image_files(paths):
+        if not path.stem.isdigit():
+            print(f"! {path}: имя файла должно быть id места")
+            continue
+        place = db.get(Place, int(path.stem))
+        if place is None:
+            print(f"! {path}: место {path.stem} не найдено")
+            continue
+        try:
+            place.image_file = store_original(path.read_bytes())
+        except InvalidImage as exc:
+            print(f"! {path}: {exc}")
+            continue
+        names.append(place.image_file)
+    db.commit()
+    print(f"Загружено изображений: {len(names)}")
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("action", choices=["ingest", "thumbnails"])
+    parser.add_argument("paths", nargs="*", help="файлы или каталоги с файлами <id места>.<расширение>")
+    args = parser.parse_args()
+
+    init_db()
+    print(f"Каталог файлов: {MEDIA_DIR}")
+    db = SessionLocal()
+    try:
+        if args.action == "ingest":
+            names = ingest(db, args.paths)
+        else:
+            names = list(db.scalars(select(Place.image_file).where(Place.image_file.is_not(None)).distinct()))
+    finally:
+        db.close()
+
+    try:
+        futures = [thumbnailer.submit(name) for name in set(names)]
+        wait(futures)
+        built = sum(1 for future in futures if future.exception() is None and future.result())
+        failed = [future.exception() for future in futures if future.exception() is not None]
+    finally:
+        thumbnailer.shutdown(wait=True)
+
+    print(f"Построены превью для изображений: {built}")
+    for exc in failed:
+        print(f"! {exc}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Скрипт пакетной премодерации отзывов.
+Запуск:
+    python premoderate_reviews.py rescore           # оценить очередь, записать решения
+    python premoderate_reviews.py rescore --apply   # и применить approve/reject
+    python premoderate_reviews.py report            # точность и полнота по решениям модераторов
+    python premoderate_reviews.py train             # обучить классификатор на решениях модераторов
+"""
+
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import delete, insert, select
+
+from app.database import AsyncSessionLocal, init_db
+from app.models.premoderation import PremoderationDecision
+from app.models.review import Review, ReviewStatus
+from app.services import moderation_queue
+from app.services.premoderation import (
+    MODEL_PATH, NaiveBayesClassifier, Submission, evaluate, premoderator
+)
+
+# Отзывы очереди обрабатываются без аренды - как системный модератор
+SYSTEM_MODERATOR_ID = 0
+STATUSES = {"approve": ReviewStatus.APPROVED, "reject": ReviewStatus.REJECTED}
+
+
+async def rescore(db, batch_size: int, apply: bool) -> None:
+    totals = {"approve": 0, "reject": 0, "escalate": 0}
+    micros = []
+    started = time.perf_counter()
+    after_id = 0
+    while True:
+        rows = (await db.execute(
+            select(Review.id, Review.user_id, Review.text)
+            .where(Review.status == ReviewStatus.PENDING, Review.id > after_id)
+            .order_by(Review.id)
+            .limit(batch_size)
+        )).all()
+        if not rows:
+            break
+        after_id = rows[-1].id
+
+        decisions = premoderator.score_batch(Submission(user_id=r.user_id, text=r.text, review_id=r.id) for r in rows)
+        ids = [r.id for r in rows]
+        await db.execute(delete(PremoderationDecision).where(PremoderationDecision.review_id.in_(ids)))
+        await db.execute(insert(PremoderationDecision), [
+            {
+                "review_id": r.id, "action": d.action, "score": d.score, "reasons": d.reasons or None,
+                "mode": premoderator.mode, "version": premoderator.version,
+            }
+            for r, d in zip(rows, decisions)
+        ])
+        await db.commit()
+
+        for action, status in STATUSES.items():
+            chosen = [r.id for r, d in zip(rows, decisions) if d.action == action]
+            if apply and chosen:
+                await moderation_queue.decide(db, SYSTEM_MODERATOR_ID, chosen, status, human=False)
+        for d in decisions:
+            totals[d.action] += 1
+            micros.append(d.micros)
+
+    elapsed = time.perf_counter() - started
+    if not micros:
+        print("Очередь модерации пуста.")
+        return
+    micros.sort()
+    print(f"Оценено отзывов: {len(micros)} за {elapsed:.2f} с")
+    print(f"  approve: {totals['approve']}, reject: {totals['reject']}, escalate: {totals['escalate']}")
+    print(f"  оценка: p50={micros[len(micros) // 2]:.1f} мкс, p99={micros[int(len(micros) * 0.99)]:.1f} мкс")
+    if not apply:
+        print("Решения записаны, статусы не менялись (--apply, чтобы применить).")
+
+
+async def report(db) -> None:
+    metrics = await evaluate(db)
+    for action in ("approve", "reject"):
+        m = metrics[action]
+        print(
+            f"{action}: решений {m['predicted']}, по мнению модераторов {m['actual']}, "
+            f"точность {m['precision']:.3f}, полнота {m['recall']:.3f}"
+        )
+    print(f"escalate: {metrics['escalate']['count']}")
+
+
+async def train(db) -> None:
+    rows = (await db.execute(
+        select(Review.text, PremoderationDecision.human_status)
+        .join(PremoderationDecision, PremoderationDecision.review_id == Review.id)
+        .where(PremoderationDecision.human_status.in_([s.value for s in STATUSES.values()]))
+    )).all()
+    if not rows:
+        print("Нет решений модераторов для обучения.")
+        return
+    classifier = NaiveBayesClassifier.train(
+        [r.text for r in rows],
+        [r.human_status == ReviewStatus.REJECTED.value for r in rows]
+    )
+    classifier.save(MODEL_PATH)
+    print(f"Классификатор обучен на {len(rows)} отзывах: {MODEL_PATH}")
+
+
+async def run(args):
+    init_db()
+    async with AsyncSessionLocal() as db:
+        if args.command == "rescore":
+            await rescore(db, args.batch_size, args.apply)
+        elif args.command == "report":
+            await report(db)
+        else:
+            await train(db)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["rescore", "report", "train"])
+    parser.add_argument("--apply", action="store_true", help="применить approve/reject к очереди")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
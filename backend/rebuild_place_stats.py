@@ -0,0 +1,39 @@
+"""
+Скрипт пересчёта агрегатов рейтинга мест по одобренным отзывам.
+Запуск:
+    python rebuild_place_stats.py           # найти и исправить расхождения
+    python rebuild_place_stats.py --verify  # только проверить
+"""
+
+import argparse
+
+from app.database import SessionLocal, init_db
+from app.services.place_stats import rebuild_place_stats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--verify", action="store_true", help="только проверить, не исправлять")
+    args = parser.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    try:
+        drift = rebuild_place_stats(db, fix=not args.verify)
+    finally:
+        db.close()
+
+    for place_id, stored, expected in drift:
+        print(f"! Место {place_id}: хранится {stored}, по отзывам {expected}")
+
+    if not drift:
+        print("Агрегаты мест совпадают с отзывами.")
+    elif args.verify:
+        print(f"\nНайдено расхождений: {len(drift)}")
+        raise SystemExit(1)
+    else:
+        print(f"\nИсправлено мест: {len(drift)}")
+
+
+if __name__ == "__main__":
+    main()
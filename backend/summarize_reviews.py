@@ -0,0 +1,36 @@
+"""
+Скрипт суммаризации отзывов о местах (один проход фонового конвейера).
+Печатает по каждому вызову LLM число текстов, токены и задержку.
+Запуск: python summarize_reviews.py
+"""
+
+import asyncio
+
+from app.database import AsyncSessionLocal, init_db
+from app.services.review_summary import review_summarizer
+
+
+async def run():
+    init_db()
+    async with AsyncSessionLocal() as db:
+        reports = await review_summarizer.run_once(db)
+
+    for r in reports:
+        print(
+            f"  Место {r.place_id} [{r.mode}]: текстов {r.texts}, "
+            f"токенов {r.prompt_tokens}+{r.completion_tokens}, {r.latency_ms:.2f} мс"
+        )
+
+    if not reports:
+        print("Сводки всех мест актуальны.")
+        return
+    tokens = sum(r.prompt_tokens + r.completion_tokens for r in reports)
+    latency = sum(r.latency_ms for r in reports)
+    print(
+        f"\nОбновлено мест: {len({r.place_id for r in reports})}, вызовов LLM: {len(reports)}, "
+        f"токенов: {tokens}, суммарная задержка: {latency:.1f} мс"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(run())